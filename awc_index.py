@@ -0,0 +1,173 @@
+import os
+import struct
+import zlib
+from array import array
+from itertools import accumulate
+from pathlib import Path
+from time import perf_counter
+
+import instrument
+import xml_utils as xml
+from cache_utils import source_cache_path, write_atomic
+from marker_format import _column_bytes, _int_column, _read_column
+from utils import delta_time_ms
+
+AWC_INDEX_MAGIC = b"AWI2"
+AWC_SUFFIX = ".awc.xml"
+
+# size, mtime (ns), markers, sample rate
+AwcIndexEntry = tuple[int, int, list[xml.AwcMarker] | None, str | None]
+
+class AwcMarkerIndex:
+    """Markers and sample rate of every `<tracklist>/<track>.awc.xml` file in a tracks folder.
+
+    The whole folder is extracted with a thread pool (lxml releases the GIL while parsing) and stored in a single index file.
+    Later updates only extract files whose size or modification time changed.
+
+    The index file is laid out in columns, like `marker_format.py`, with every string (tracklist, track, sample rate, marker type and value)
+    as an index into a string table and -1 for None:
+
+        b"AWI2" | zlib(string table length (u32) | concatenated UTF-8 strings | string lengths column
+                       | tracklist, track, size, mtime, sample rate and marker count columns (one value per file)
+                       | marker type, sample offset (float64) and value columns (the markers of every file, in file order))"""
+    def __init__(self, tracks_path: Path | str, index_path: Path | str | None = None):
+        self.tracks_path = Path(tracks_path)
+        self.index_path = Path(index_path) if index_path != None else None
+        self.entries: dict[tuple[str, str], AwcIndexEntry] = {}
+
+    def load(self):
+        """Loads the index file, returns False if it is missing or unreadable (a corrupt file is rebuilt by the next `update`)"""
+        if self.index_path == None or not self.index_path.is_file():
+            return False
+
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        if data[:4] != AWC_INDEX_MAGIC:
+            return False
+
+        try:
+            self.entries = _decode_entries(memoryview(zlib.decompress(data[4:])))
+        except Exception: # truncated or corrupt
+            self.entries = {}
+            return False
+        return True
+
+    def save(self):
+        if self.index_path == None:
+            return
+        write_atomic(self.index_path, AWC_INDEX_MAGIC, zlib.compress(_encode_entries(self.entries), 1))
+
+    def scan(self) -> dict[tuple[str, str], os.stat_result]:
+        """Lists every AWC file in the tracks folder"""
+        files = {}
+        if not self.tracks_path.is_dir():
+            return files
+
+        with os.scandir(self.tracks_path) as tracklists:
+            for tracklist in tracklists:
+                if not tracklist.is_dir():
+                    continue
+
+                with os.scandir(tracklist.path) as tracks:
+                    for track in tracks:
+                        if track.name.endswith(AWC_SUFFIX) and track.is_file():
+                            files[(tracklist.name, track.name[:-len(AWC_SUFFIX)])] = track.stat()
+        return files
+
+    def update(self, jobs: int | None = None):
+        """Loads the index file, then re-extracts the AWC files that were added or changed and drops removed ones.
+        The index file is only rewritten if something changed"""
+        time_start = perf_counter()
+        self.load()
+
+        files = self.scan()
+        stale = [key for key, stat in files.items() if (entry := self.entries.get(key)) == None or entry[:2] != (stat.st_size, stat.st_mtime_ns)]
+        removed = [key for key in self.entries if key not in files]
+
+        for key in removed:
+            del self.entries[key]
+
+        if stale:
+            from concurrent.futures import ThreadPoolExecutor
+
+            def extract(key: tuple[str, str]):
+                return xml.stream_awc_markers(self.tracks_path / key[0] / (key[1] + AWC_SUFFIX))
+
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                for key, (markers, sample_rate) in zip(stale, executor.map(extract, stale)):
+                    stat = files[key]
+                    self.entries[key] = (stat.st_size, stat.st_mtime_ns, markers, sample_rate)
+
+        instrument.count("AwcFilesExtracted", len(stale))
+        if stale or removed:
+            self.save()
+
+        print(f"[{delta_time_ms(time_start)}ms] Updated AWC marker index ({len(self.entries)} files, {len(stale)} extracted, {len(removed)} removed)")
+        return self
+
+    def get(self, tracklist_id: str, track_name: str) -> tuple[list[xml.AwcMarker] | None, str | None] | None:
+        """Returns the markers and sample rate of a track, or None if it has no AWC file"""
+        entry = self.entries.get((tracklist_id, track_name))
+        if entry == None:
+            return None
+        return entry[2], entry[3]
+
+def _encode_entries(entries: dict[tuple[str, str], AwcIndexEntry]) -> bytes:
+    strings: dict[str, int] = {}
+    def string_index(value: str | None) -> int:
+        return -1 if value == None else strings.setdefault(value, len(strings))
+
+    file_columns = [[] for _ in range(6)] # tracklist, track, size, mtime, sample rate, marker count
+    marker_columns = [[] for _ in range(2)] # type, value
+    offsets = array("d")
+    for (tracklist, track), (size, mtime_ns, markers, sample_rate) in entries.items():
+        for column, value in zip(file_columns, (string_index(tracklist), string_index(track), size, mtime_ns, string_index(sample_rate),
+                                                -1 if markers == None else len(markers))):
+            column.append(value)
+        for marker_type, sample_offset, value in markers or ():
+            marker_columns[0].append(string_index(marker_type))
+            offsets.append(sample_offset)
+            marker_columns[1].append(string_index(value))
+
+    encoded = [string.encode("utf-8") for string in strings]
+    string_table = b"".join(encoded)
+    columns = [_int_column(column) for column in file_columns] + [_int_column(marker_columns[0]), offsets, _int_column(marker_columns[1])]
+    return b"".join([struct.pack("<I", len(string_table)), string_table, _column_bytes(_int_column(list(map(len, encoded))))]
+                    + [_column_bytes(column) for column in columns])
+
+def _decode_entries(payload: memoryview) -> dict[tuple[str, str], AwcIndexEntry]:
+    strings_length = struct.unpack_from("<I", payload)[0]
+    offset = 4
+    string_table = bytes(payload[offset:offset + strings_length])
+    offset += strings_length
+    string_lengths, offset = _read_column(payload, offset)
+    strings = [string_table[start:end].decode("utf-8") for start, end in zip(accumulate(string_lengths, initial=0), accumulate(string_lengths))]
+
+    columns = []
+    for _ in range(9):
+        column, offset = _read_column(payload, offset)
+        columns.append(column)
+    tracklists, tracks, sizes, mtimes, sample_rates, marker_counts, marker_types, sample_offsets, values = columns
+    if offset != len(payload) or len({len(column) for column in columns[:6]}) != 1 or len({len(column) for column in columns[6:]}) != 1:
+        raise ValueError("AWC index columns do not match")
+
+    entries = {}
+    marker_start = 0
+    for tracklist, track, size, mtime_ns, sample_rate, marker_count in zip(*columns[:6]):
+        markers = None
+        if marker_count >= 0:
+            marker_end = marker_start + marker_count
+            markers = [(strings[marker_types[index]], sample_offsets[index], strings[values[index]]) for index in range(marker_start, marker_end)]
+            marker_start = marker_end
+        entries[(strings[tracklist], strings[track])] = (size, mtime_ns, markers, None if sample_rate < 0 else strings[sample_rate])
+    if marker_start != len(marker_types):
+        raise ValueError("AWC index marker counts do not match")
+    return entries
+
+def load_awc_index(tracks_path: Path | str, cache_dir: Path | None, jobs: int | None = None) -> AwcMarkerIndex:
+    """Returns an up to date marker index for `tracks_path`, stored in `cache_dir` if it is set"""
+    tracks_path = Path(tracks_path)
+    index_path = None
+    if cache_dir != None:
+        index_path = source_cache_path(cache_dir, tracks_path, ".awcindex")
+    return AwcMarkerIndex(tracks_path, index_path).update(jobs)
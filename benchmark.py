@@ -0,0 +1,384 @@
+"""Benchmarks for the export pipeline, run on synthetic dumps that are 1x/10x/100x the size of `/raw`.
+
+    python benchmark.py --scales 1 10 --out before.json
+    python benchmark.py --scales 1 10 --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import struct
+import subprocess
+import tempfile
+from copy import deepcopy
+from pathlib import Path
+from time import perf_counter
+from typing import Callable
+
+from lxml import etree
+
+import radio_export
+import rel_schema
+import resources
+import xml_utils as xml
+from awc_index import AwcMarkerIndex
+from hash_utils import joaat, joaat_many, parse_hash_string, gxt2_binary, HashMap
+from radio_database import RadioDatabase
+from station_timeline import StationTimeline, DAY_MS
+from utils import delta_time_ms, ANSI, script_dir, data_dir, cache_dir, save_json
+
+SCALES = (1, 10, 100)
+DUMP_INFO_FILE = "dump.json"
+
+def _copy_suffix(copy: int) -> str:
+    return f"_s{copy}"
+
+def _clone_name(name: str, copy: int, track_names: dict[str, str]) -> str:
+    """Name of an item in copy number `copy`. Track text ids (`rtt_`/`rtb_` + track hash) follow their renamed track"""
+    prefix = name[:4]
+    if prefix in ("rtt_", "rtb_") and name[4:] in track_names:
+        return f"{prefix}{joaat(track_names[name[4:]] + _copy_suffix(copy)):08x}"
+    return name + _copy_suffix(copy)
+
+def _write_scaled_rel(src_path: Path, dst_path: Path, scale: int, names: set[str], track_names: dict[str, str]):
+    """Writes a rel.xml with `scale` copies of every named item. References between items are renamed along with them"""
+    root = etree.parse(str(src_path)).getroot()
+    items = root.find("Items")
+
+    with etree.xmlfile(str(dst_path), encoding="UTF-8") as xf:
+        xf.write_declaration()
+        with xf.element(root.tag, root.attrib):
+            for child in root:
+                if child is not items:
+                    xf.write(child)
+
+            with xf.element("Items"):
+                for item in items:
+                    xf.write(item)
+
+                for copy in range(1, scale):
+                    renamed = {name: _clone_name(name, copy, track_names) for name in names}
+                    for item in items:
+                        if item.findtext("Name") not in renamed:
+                            continue
+                        clone = deepcopy(item)
+                        for el in clone.iter():
+                            if el.text in renamed:
+                                el.text = renamed[el.text]
+                        xf.write(clone)
+
+def _write_scaled_nametable(src_path: Path, dst_path: Path, scale: int):
+    with open(src_path, "rb") as f:
+        names = [name for name in f.read().split(b"\x00") if name]
+
+    with open(dst_path, "wb") as f:
+        for copy in range(scale):
+            suffix = _copy_suffix(copy).encode("utf-8") if copy else b""
+            f.write(b"".join(name + suffix + b"\x00" for name in names))
+
+def write_gxt2(file_path: Path, entries: dict[int, str]):
+    """Writes a `.gxt2` text table in the layout `gxt2_binary` reads"""
+    hashes = sorted(entries)
+    strings_start = 8 + 8 * len(hashes) + 8
+
+    blob = bytearray()
+    table = []
+    for hash in hashes:
+        table += (hash, strings_start + len(blob))
+        blob += entries[hash].encode("utf-8") + b"\x00"
+
+    with open(file_path, "wb") as f:
+        f.write(struct.pack("<4sI", b"2TXG", len(hashes)))
+        f.write(struct.pack(f"<{len(table)}I", *table))
+        f.write(struct.pack("<4sI", b"2TXG", strings_start + len(blob)))
+        f.write(blob)
+
+def _write_scaled_gxt2(src_path: Path, dst_path: Path, scale: int):
+    table = gxt2_binary(src_path)
+    originals = {hash: table.get(hash) for hash in table.index}
+    entries = dict(originals)
+    for copy in range(1, scale):
+        entries |= {joaat(f"{hash:08x}{_copy_suffix(copy)}"): text for hash, text in originals.items()}
+    write_gxt2(dst_path, entries)
+
+def generate_synthetic_dump(out_path: Path | str, scale: int, source_path: Path = data_dir, dlc_names: list[str] = radio_export.all_radio_dlc,
+                            station_list: list[str] = radio_export.all_stations) -> dict:
+    """Generates a copy of `source_path` with every rel.xml item, nametable entry, text table entry and AWC tracklist folder repeated `scale` times.
+    Returns the dump info (also saved to `dump.json`), which lists the station ids of every copy"""
+    out_path = Path(out_path)
+    time_start = perf_counter()
+    if out_path.exists():
+        shutil.rmtree(out_path)
+    out_path.mkdir(parents=True)
+
+    for dlc in dlc_names:
+        rel_paths = [source_path / radio_export.dlc_file(dlc, filename) for filename in ("game.dat151.rel.xml", "sounds.dat54.rel.xml", "speech.dat4.rel.xml")]
+        rel_paths = [path for path in rel_paths if path.is_file()]
+
+        names = set()
+        for path in rel_paths:
+            for _, name in etree.iterparse(str(path), tag="Name"):
+                if name.text and not parse_hash_string(name.text):
+                    names.add(name.text)
+        track_names = {f"{joaat(name):08x}": name for name in names}
+
+        for path in rel_paths:
+            _write_scaled_rel(path, out_path / path.name, scale, names, track_names)
+
+    for path in source_path.glob("*.nametable"):
+        _write_scaled_nametable(path, out_path / path.name, scale)
+
+    for path in source_path.glob("*.gxt2"):
+        _write_scaled_gxt2(path, out_path / path.name, scale)
+
+    tracks_path = source_path / "tracks"
+    if tracks_path.is_dir():
+        for tracklist in tracks_path.iterdir():
+            for copy in range(scale):
+                shutil.copytree(tracklist, out_path / "tracks" / (tracklist.name + (_copy_suffix(copy) if copy else "")))
+
+    dump_info = {
+        "Scale": scale,
+        "Source": str(source_path),
+        "Dlcs": list(dlc_names),
+        "Stations": [station + (_copy_suffix(copy) if copy else "") for copy in range(scale) for station in station_list],
+        "Size": sum(path.stat().st_size for path in out_path.rglob("*") if path.is_file())
+    }
+    save_json(out_path / DUMP_INFO_FILE, dump_info)
+
+    print(f"[{delta_time_ms(time_start)}ms] Generated {scale}x synthetic dump in '{out_path}' ({dump_info['Size'] / (1 << 20):.1f} MiB)")
+    return dump_info
+
+def load_synthetic_dump(out_path: Path | str, scale: int, source_path: Path = data_dir) -> dict:
+    """Returns the info of a previously generated dump, generating it first if it is missing or was made with another scale"""
+    info_path = Path(out_path) / DUMP_INFO_FILE
+    if info_path.is_file():
+        with open(info_path, "r", encoding="utf-8") as f:
+            dump_info = json.load(f)
+        if dump_info.get("Scale") == scale and dump_info.get("Source") == str(source_path):
+            return dump_info
+    return generate_synthetic_dump(out_path, scale, source_path)
+
+
+# Every benchmark does its setup and returns the function that is timed
+Benchmark = Callable[[Path, dict, str, Path], Callable[[], object]]
+
+def bench_joaat(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    names = [name.decode("utf-8") for name in (dump_path / "sounds.dat54.nametable").read_bytes().split(b"\x00") if name]
+    def run():
+        joaat.cache_clear()
+        for name in names:
+            joaat(name)
+    return run
+
+def bench_joaat_many(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    names = [name.decode("utf-8") for name in (dump_path / "sounds.dat54.nametable").read_bytes().split(b"\x00") if name]
+    return lambda: joaat_many(names)
+
+def bench_load_nametable(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    return lambda: HashMap().load_nametable(dump_path / "sounds.dat54.nametable", cache_dir=None)
+
+def bench_load_nametable_compiled(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    HashMap().load_nametable(dump_path / "sounds.dat54.nametable", cache_dir=tmp_path)
+    return lambda: HashMap().load_nametable(dump_path / "sounds.dat54.nametable", cache_dir=tmp_path)
+
+def bench_gxt2_binary(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    hashes = list(gxt2_binary(dump_path / "global.gxt2").index)
+    def run():
+        table = gxt2_binary(dump_path / "global.gxt2")
+        for hash in hashes:
+            table.get(hash)
+    return run
+
+def bench_stream_rel_items(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    return lambda: xml.stream_rel_items(dump_path / radio_export.dlc_file(dlcname, "game.dat151.rel.xml"), radio_export.GAME_ITEM_TYPES)
+
+def bench_load_rel_items_cached(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    file_path = dump_path / radio_export.dlc_file(dlcname, "sounds.dat54.rel.xml")
+    radio_export.load_rel_items(file_path, radio_export.SOUND_ITEM_TYPES, cache_dir=tmp_path) # fills the cache
+    return lambda: radio_export.load_rel_items(file_path, radio_export.SOUND_ITEM_TYPES, cache_dir=tmp_path)
+
+def bench_type_index(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    items = radio_export.load_rel_items(dump_path / radio_export.dlc_file(dlcname, "game.dat151.rel.xml"), radio_export.GAME_ITEM_TYPES, cache_dir=None)
+    return lambda: xml.TypeIndex(items, radio_export.GAME_ITEM_TYPES)
+
+def bench_awc_index(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    return lambda: AwcMarkerIndex(dump_path / "tracks").update()
+
+def bench_get_awc_markers(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    context = radio_export.ExportContext(awc_index=AwcMarkerIndex(dump_path / "tracks").update())
+    tracks = list(context.awc_index.entries)
+    def run():
+        for tracklist_id, track_name in tracks:
+            radio_export.GetAwcMarkers(context, tracklist_id, track_name)
+    return run
+
+def bench_marker_dict_xml(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    items = radio_export.load_rel_items(dump_path / radio_export.dlc_file(dlcname, "game.dat151.rel.xml"), ["RadioTrackTextIDs"], cache_dir=None)
+    items = [(item, item[1].startswith("rtt_")) for item in items]
+    trackid_table = resources.get_trackid_table(dump_path)
+    def run():
+        for item, is_track in items:
+            xml.marker_dict_xml(rel_schema.text_id_events(item), is_track, trackid_table)
+    return run
+
+def bench_export_dlc(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path) # fills the caches
+    def run():
+        resources.start_session() # only the on-disk caches are warm
+        radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path)
+    return run
+
+def bench_export_dlc_uncached(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    def run():
+        resources.start_session()
+        radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=None)
+    return run
+
+def bench_export_dlc_session(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    resources.start_session(memory_budget=None)
+    radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path) # loads the session resources
+    return lambda: radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path)
+
+def bench_radio_database(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path)
+    database = RadioDatabase(tmp_path / f"{dlcname}_info.json")
+    tracks = [(track_list_id, track["Id"]) for track_list_id, track_list in database.data["TrackLists"].items() for track in track_list.get("Tracks", [])]
+    offsets = list(range(0, 600_000, 600)) # every 0.6s over 10 minutes
+    def run():
+        for track_list_id, track_id in tracks:
+            database.markers_at_many(track_list_id, track_id, "Track", offsets)
+            database.next_markers_many(track_list_id, track_id, "Beat", offsets)
+    return run
+
+def bench_radio_server(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    import http.client
+    import threading
+    from radio_server import RadioServer, RadioService
+
+    radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path)
+    service = RadioService(tmp_path / f"{dlcname}_info.json")
+    server = RadioServer(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    data = service.index.database.data
+    paths = ["/stations"] + [f"/stations/{station_id}" for station_id in data["Stations"]] + [f"/tracklists/{track_list_id}" for track_list_id in data["TrackLists"]]
+    paths += [f"/tracks/{track['Id']}/markers?from=0&to=60000" for track_list in data["TrackLists"].values() for track in track_list.get("Tracks", [])[:5]]
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    def run(): # 1000 requests over one keep-alive connection
+        for index in range(1000):
+            connection.request("GET", paths[index % len(paths)], headers={"Accept-Encoding": "gzip"})
+            connection.getresponse().read()
+    return run
+
+def bench_station_timeline(dump_path: Path, dump_info: dict, dlcname: str, tmp_path: Path):
+    radio_export.export_dlc_radio_info(dump_info["Stations"], dlcname, dump_path, tmp_path, cache_dir=tmp_path)
+    database = RadioDatabase(tmp_path / f"{dlcname}_info.json")
+    stations = [StationTimeline(database, station_id) for station_id in database.data["Stations"]]
+    def run():
+        for station in stations:
+            station.generate(DAY_MS, seed=1)
+    return run
+
+BENCHMARKS: dict[str, Benchmark] = {
+    "joaat": bench_joaat,
+    "joaat_many": bench_joaat_many,
+    "load_nametable": bench_load_nametable,
+    "load_nametable_compiled": bench_load_nametable_compiled,
+    "gxt2_binary": bench_gxt2_binary,
+    "stream_rel_items": bench_stream_rel_items,
+    "load_rel_items_cached": bench_load_rel_items_cached,
+    "TypeIndex": bench_type_index,
+    "AwcMarkerIndex": bench_awc_index,
+    "GetAwcMarkers": bench_get_awc_markers,
+    "marker_dict_xml": bench_marker_dict_xml,
+    "export_dlc_radio_info": bench_export_dlc,
+    "export_dlc_radio_info_uncached": bench_export_dlc_uncached,
+    "export_dlc_radio_info_session": bench_export_dlc_session,
+    "RadioDatabase": bench_radio_database,
+    "StationTimeline": bench_station_timeline,
+    "RadioServer": bench_radio_server,
+}
+
+def time_benchmark(run: Callable[[], object], repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        time_start = perf_counter()
+        run()
+        times.append((perf_counter() - time_start) * 1000)
+    return {"Min": round(min(times), 3), "Median": round(statistics.median(times), 3), "Mean": round(statistics.fmean(times), 3), "Runs": [round(t, 3) for t in times]}
+
+def run_benchmarks(scales: list[int], names: list[str] = None, dlcname: str = "dlchei4", repeat: int = 5, dump_root: Path = cache_dir / "bench") -> dict:
+    """Runs the benchmarks in `names` (all if None) on the synthetic dump of each scale, the pipeline's own output is silenced"""
+    results = {
+        "Commit": _git_commit(),
+        "Python": platform.python_version(),
+        "Platform": platform.platform(),
+        "Dlc": dlcname,
+        "Repeat": repeat,
+        "Scales": {}
+    }
+
+    for scale in scales:
+        dump_path = dump_root / f"x{scale}"
+        dump_info = load_synthetic_dump(dump_path, scale)
+        scale_results = results["Scales"][str(scale)] = {"Size": dump_info["Size"], "Results": {}}
+
+        for name in names or BENCHMARKS:
+            with tempfile.TemporaryDirectory() as tmp_dir, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                run = BENCHMARKS[name](dump_path, dump_info, dlcname, Path(tmp_dir))
+                timing = time_benchmark(run, repeat)
+
+            scale_results["Results"][name] = timing
+            print(f"[{timing['Median']:.1f}ms] {ANSI(name).bold()} ({scale}x, median of {repeat})")
+
+    return results
+
+def compare_results(old: dict, new: dict, threshold: float = 0.1) -> list[tuple[str, str, float]]:
+    """Prints the median time of every benchmark in `new` relative to `old`, returns the ones that got slower by more than `threshold`"""
+    regressions = []
+    print(ANSI(f"\nCompared to '{old.get('Commit')}'").bold())
+    for scale, scale_results in new["Scales"].items():
+        old_results = old.get("Scales", {}).get(scale, {}).get("Results", {})
+        for name, timing in scale_results["Results"].items():
+            if name not in old_results:
+                continue
+
+            ratio = timing["Median"] / max(old_results[name]["Median"], 1e-6)
+            text = f"{name} ({scale}x): {old_results[name]['Median']:.1f}ms -> {timing['Median']:.1f}ms ({ratio:.2f}x)"
+            if ratio > 1 + threshold:
+                regressions.append((scale, name, ratio))
+                print(ANSI(text).red())
+            elif ratio < 1 - threshold:
+                print(ANSI(text).green())
+            else:
+                print(text)
+    return regressions
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=script_dir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the export pipeline on synthetic dumps")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help=f"dump sizes relative to /raw, e.g. {' '.join(map(str, SCALES))}")
+    parser.add_argument("--bench", nargs="+", choices=BENCHMARKS, help="benchmarks to run (default: all)")
+    parser.add_argument("--dlc", default="dlchei4", help="DLC used by the per-file benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=Path, default=cache_dir / "benchmark.json", help="where the JSON results are written")
+    parser.add_argument("--compare", type=Path, help="earlier results to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.bench, args.dlc, args.repeat)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    save_json(args.out, results)
+    print(ANSI(f"Saved benchmark results to '{args.out}'").green())
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare_results(json.load(f), results)
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import struct
+import tempfile
+import zlib
+from pathlib import Path
+
+CACHE_MAGIC = b"RDC1"
+# magic, source size, source mtime (ns), source content digest
+cache_header = struct.Struct("<4sQQ16s")
+
+def file_digest(file_path: Path | str) -> bytes:
+    """Content hash of a file, used to validate cache entries when the modification time changed"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.digest()
+
+def cache_key(*parts: str) -> str:
+    """Short stable key built from a list of strings (e.g. saved item types)"""
+    return hashlib.blake2b("\x00".join(parts).encode("utf-8"), digest_size=4).hexdigest()
+
+def source_cache_path(cache_dir: Path, source_path: Path | str, suffix: str, *parts: str) -> Path:
+    """Cache file of `source_path` in `cache_dir`, named after the file and keyed by its resolved path and `parts`,
+    so files with the same name in different data folders get their own entries"""
+    source_path = Path(source_path)
+    return cache_dir / f"{source_path.name}.{cache_key(str(source_path.resolve()), *parts)}{suffix}"
+
+def source_fingerprint(source_path: Path | str) -> tuple[int, int, bytes]:
+    """Returns the size, mtime (ns) and content hash of a file"""
+    stat = os.stat(source_path)
+    return stat.st_size, stat.st_mtime_ns, file_digest(source_path)
+
+def source_matches(source_path: Path | str, size: int, mtime_ns: int, digest: bytes) -> bool:
+    """Checks whether a file still matches a stored fingerprint, the content is only hashed if the mtime changed"""
+    stat = os.stat(source_path)
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime_ns == mtime_ns:
+        return True
+    return file_digest(source_path) == digest
+
+# mkstemp creates files readable by the owner only, written files get the usual permissions instead
+_umask = os.umask(0)
+os.umask(_umask)
+
+def write_atomic(file_path: Path | str, *chunks: bytes):
+    """Writes `chunks` to a temporary file and moves it into place, so other processes never see a partial file.
+    Every call gets its own temporary file, so threads of the same process can write the same file at once"""
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{file_path.name}.", suffix=".tmp", dir=file_path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp_path, 0o666 & ~_umask)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_cache(cache_path: Path | str, source_path: Path | str, payload: bytes):
+    """Writes `payload` compressed to `cache_path`, keyed by the size, mtime and content hash of `source_path`"""
+    header = cache_header.pack(CACHE_MAGIC, *source_fingerprint(source_path))
+    write_atomic(cache_path, header, zlib.compress(payload, 1))
+
+def read_cache(cache_path: Path | str, source_path: Path | str) -> bytes | None:
+    """Returns the cached payload for `source_path`, or None if there is no entry or the source has changed since it was written"""
+    cache_path = Path(cache_path)
+    if not cache_path.is_file():
+        return None
+
+    with open(cache_path, "rb") as f:
+        data = f.read()
+
+    if len(data) < cache_header.size:
+        return None
+
+    magic, size, mtime_ns, digest = cache_header.unpack_from(data)
+    if magic != CACHE_MAGIC:
+        return None
+
+    if not source_matches(source_path, size, mtime_ns, digest):
+        return None
+
+    try:
+        payload = zlib.decompress(data[cache_header.size:])
+    except zlib.error:
+        return None
+
+    stat = os.stat(source_path)
+    if stat.st_mtime_ns != mtime_ns: # remember the new mtime so the content is not hashed again next time
+        write_atomic(cache_path, cache_header.pack(magic, size, stat.st_mtime_ns, digest), data[cache_header.size:])
+    return payload
@@ -0,0 +1,128 @@
+import json
+import os
+from pathlib import Path
+
+from awc_index import AwcMarkerIndex
+from cache_utils import source_fingerprint, source_matches, write_atomic
+
+MANIFEST_VERSION = 1
+
+def _fingerprint(file_path: Path) -> list | None:
+    if not file_path.is_file():
+        return None
+    size, mtime_ns, digest = source_fingerprint(file_path)
+    return [size, mtime_ns, digest.hex()]
+
+def _fingerprint_matches(file_path: Path, fingerprint: list | None) -> bool:
+    if fingerprint == None or not file_path.is_file():
+        return fingerprint == None and not file_path.is_file()
+    size, mtime_ns, digest = fingerprint
+    return source_matches(file_path, size, mtime_ns, bytes.fromhex(digest))
+
+def fingerprint_inputs(data_path: Path, input_files: list[Path]) -> dict[str, list | None]:
+    """Fingerprints of the inputs of an export by path relative to `data_path`, taken before the export reads them so that
+    a file that changes while it runs no longer matches on the next run"""
+    return {os.path.relpath(path, data_path): _fingerprint(path) for path in input_files}
+
+def _awc_fingerprint(awc_index: AwcMarkerIndex, key: str) -> list | None:
+    entry = awc_index.entries.get(tuple(key.split("/", 1)))
+    return None if entry == None else [entry[0], entry[1]]
+
+class ExportManifest:
+    """Records which inputs each `processed/<dlc>_info.json` was built from: rel.xml files, nametables, text tables,
+    the AWC files it looked up and the sound refs it took from earlier DLCs.
+    An incremental export uses it to only rebuild DLCs whose inputs changed, and the merge to only redo affected entries.
+    The station list and the `reversed_names` nametable (see `radio_export.ExportContext`) apply to every DLC, changing either discards every entry"""
+    def __init__(self, manifest_path: Path | str, station_list: list[str], reversed_names: Path = None):
+        self.path = Path(manifest_path)
+        self.station_list = list(station_list)
+        # taken before the export reads it, like `fingerprint_inputs`
+        self.reversed_names = None if reversed_names == None else [str(Path(reversed_names).resolve()), _fingerprint(Path(reversed_names))]
+        self.dlcs: dict[str, dict] = {}
+
+        # filled in while exporting
+        self.changed: list[str] = []
+        self.affected: dict[str, set[str]] = {"Stations": set(), "TrackLists": set()}
+
+        if self.path.is_file():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # a different station list or reversed names table changes every export
+            if data.get("Version") == MANIFEST_VERSION and data.get("StationList") == self.station_list and self._reversed_names_match(data.get("ReversedNames")):
+                self.dlcs = data["Dlcs"]
+
+    def _reversed_names_match(self, recorded: list | None) -> bool:
+        if recorded == None or self.reversed_names == None:
+            return recorded == self.reversed_names
+        return recorded[0] == self.reversed_names[0] and _fingerprint_matches(Path(recorded[0]), recorded[1])
+
+    def save(self):
+        data = {"Version": MANIFEST_VERSION, "StationList": self.station_list, "ReversedNames": self.reversed_names, "Dlcs": self.dlcs}
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def is_current(self, dlcname: str, data_path: Path, out_file: Path, awc_index: AwcMarkerIndex) -> bool:
+        """Checks whether the recorded inputs and output of a DLC are unchanged"""
+        entry = self.dlcs.get(dlcname)
+        if entry == None:
+            return False
+
+        if not _fingerprint_matches(out_file, entry["Output"]):
+            return False
+
+        for name, fingerprint in entry["Inputs"].items():
+            if not _fingerprint_matches(data_path / name, fingerprint):
+                return False
+
+        for key, fingerprint in entry["AwcFiles"].items():
+            if _awc_fingerprint(awc_index, key) != fingerprint:
+                return False
+
+        return True
+
+    def external_sounds_match(self, dlcname: str, solved_sounds: dict[str, str]) -> bool:
+        """Checks whether the sound refs a DLC took from earlier DLCs still resolve the same way"""
+        return all(solved_sounds.get(sound_id) == track_list for sound_id, track_list in self.dlcs[dlcname]["ExternalSounds"].items())
+
+    def solved_sounds(self, dlcname: str) -> dict[str, str]:
+        return self.dlcs[dlcname]["SolvedSounds"]
+
+    def record(self, dlcname: str, inputs: dict[str, list | None], out_file: Path, awc_index: AwcMarkerIndex, awc_files: set[tuple[str, str]],
+               external_sounds: dict[str, str | None], solved_sounds: dict[str, str], export_info: dict | None):
+        """Records the inputs of a DLC that was just exported (`export_info` is None if nothing was written), `inputs` as `fingerprint_inputs` took them.
+        The entries of both the previous and the new output are marked as affected for the merge"""
+        previous = self.dlcs.get(dlcname)
+        if previous:
+            for section in self.affected:
+                self.affected[section].update(previous["Ids"][section])
+
+        if export_info == None and out_file.is_file(): # an older export is kept as is
+            with open(out_file, "r", encoding="utf-8") as f:
+                export_info = json.load(f)
+
+        ids = {section: list((export_info or {}).get(section, {})) for section in self.affected}
+        for section in self.affected:
+            self.affected[section].update(ids[section])
+
+        awc_keys = sorted(f"{tracklist}/{track}" for tracklist, track in awc_files)
+        self.dlcs[dlcname] = {
+            "Inputs": inputs,
+            "AwcFiles": {key: _awc_fingerprint(awc_index, key) for key in awc_keys},
+            "ExternalSounds": external_sounds,
+            "SolvedSounds": solved_sounds,
+            "Output": _fingerprint(out_file),
+            "Ids": ids
+        }
+        self.changed.append(dlcname)
+
+    def contains_any(self, dlcname: str, ids: dict[str, set[str]]) -> bool:
+        entry = self.dlcs.get(dlcname)
+        return entry == None or any(not ids[section].isdisjoint(entry["Ids"][section]) for section in ids)
+
+    def merge_order(self, dlc_names: list[str], section: str) -> list[str] | None:
+        """Ids of a section in the order a full merge of `dlc_names` would produce them, None if a DLC was never recorded"""
+        order = {}
+        for dlcname in dlc_names:
+            if dlcname not in self.dlcs:
+                return None
+            order.update(dict.fromkeys(self.dlcs[dlcname]["Ids"][section]))
+        return list(order)
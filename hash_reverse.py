@@ -0,0 +1,244 @@
+"""Reverses unresolved `hash_XXXXXXXX` names by hashing candidates built from templates and wordlists.
+
+    python hash_reverse.py                                                       # default templates, words from the export and nametables
+    python hash_reverse.py --template "dj_{station}_{token}" --words token=words.txt --out candidates.txt
+
+A template is a name with `{slot}` placeholders, each filled from the wordlist of that name. Prefixes shared by candidates are only
+hashed once (`joaat_partial`) and the last slot is hashed for every word at once (`JoaatSuffixes`), split over a process pool.
+Matches are written for review as a `.txt` nametable that `HashMap.load_nametable` loads, by default `reversed_candidates.txt`.
+The export only uses it when asked to (`python main.py --reversed-names reversed_candidates.txt`).
+
+JOAAT is only 32 bits: searching millions of candidates for thousands of hashes also finds a few names that merely collide, check them before using them.
+Hashes matched by more than one candidate are only listed, never written"""
+import argparse
+import json
+import math
+import os
+import re
+import string
+from pathlib import Path
+from time import perf_counter
+from typing import Iterable
+
+from cache_utils import write_atomic
+from hash_utils import HashMap, JoaatSuffixes, joaat, joaat_partial, _load_numpy
+from resources import get_session
+from utils import delta_time_ms, ANSI, script_dir, data_dir, cache_dir
+
+DEFAULT_TEMPLATES = [
+    "{token}_{token}",
+    "{station}_{token}",
+    "{tracklist}_{token}",
+    "{track}_{token}",
+    "dj_{station}_{token}",
+    "{station}_{token}_{number}",
+    "rtt_{hex}",
+    "rtb_{hex}"
+]
+
+HASH_PATTERN = re.compile(rb"hash_([0-9A-Fa-f]{8})")
+
+def collect_unresolved_hashes(data_path: Path = data_dir, export_paths: list[Path] = None, nametables: HashMap = None) -> dict[int, set[str]]:
+    """Every `hash_XXXXXXXX` in the rel.xml files of `data_path` and in the exports (`info_merged.json` if None) that `nametables`
+    cannot resolve (the nametables in `data_path` if None), with the names of the files it appears in"""
+    if nametables == None:
+        nametables = HashMap()
+        for nametable_path in sorted(data_path.glob("*.nametable")):
+            nametables.load_table(get_session().nametable(nametable_path, cache_dir))
+
+    found: dict[int, set[str]] = {}
+    for path in sorted(data_path.glob("*.rel.xml")) + list(export_paths or [script_dir / "info_merged.json"]):
+        if not path.is_file():
+            continue
+        for match in set(HASH_PATTERN.findall(path.read_bytes())):
+            found.setdefault(int(match, 16), set()).add(path.name)
+
+    return {hash: files for hash, files in found.items() if nametables.resolve(hash) == None}
+
+def _name_tokens(names: Iterable[str]) -> set[str]:
+    return {token for name in names for token in name.lower().split("_") if token}
+
+def default_wordlists(export: dict, nametable_paths: list[Path] = ()) -> dict[str, list[str]]:
+    """Wordlists for the default templates, from the ids in an export and the names in nametables.
+    `token` is every `_` separated part of those names and `hex` is the hash of every track id as it appears in `rtt_`/`rtb_` names"""
+    is_name = lambda id: not id.startswith("hash_")
+    stations = [id.lower() for id in export.get("Stations", {}) if is_name(id)]
+    tracklists = [id.lower() for id in export.get("TrackLists", {}) if is_name(id)]
+    tracks = sorted({track["Id"].lower() for track_list in export.get("TrackLists", {}).values() for track in track_list.get("Tracks", []) if is_name(track["Id"])})
+    speech = sorted({context.lower() for station in export.get("Stations", {}).values() for category, entry in station.get("Speech", {}).items()
+                     for context in ([category] if "Variations" in entry else [category, *entry])})
+
+    names = stations + tracklists + tracks + speech
+    for nametable_path in nametable_paths:
+        with open(nametable_path, "rb") as f:
+            names += [s.decode("utf-8") for s in f.read().split(b"\x00") if s]
+
+    return {
+        "station": stations,
+        "tracklist": tracklists,
+        "track": tracks,
+        "speech": speech,
+        "token": sorted(_name_tokens(names)),
+        "number": [str(number) for number in range(100)] + [f"{number:02}" for number in range(10)],
+        "hex": [f"{joaat(track):08x}" for track in tracks]
+    }
+
+def parse_template(template: str) -> tuple[str, list[tuple[str, str]]]:
+    """Splits a template into its leading text and (slot, text following the slot) pairs"""
+    parts = [(literal, field) for literal, field, _, _ in string.Formatter().parse(template)]
+    slots = [(field, parts[index + 1][0] if index + 1 < len(parts) else "") for index, (_, field) in enumerate(parts) if field != None]
+    return parts[0][0] if parts else "", slots
+
+def candidate_count(template: str, wordlists: dict[str, list[str]]) -> int:
+    return math.prod(len(wordlists[slot]) for slot, _ in parse_template(template)[1])
+
+class _TemplateSearch:
+    """Hashes the candidates of a template whose first slot is limited to `start:end`, depth first from the shared prefix states"""
+    def __init__(self, template: str, wordlists: dict[str, list[str]], start: int, end: int):
+        self.prefix, slots = parse_template(template)
+        self.levels = [[word + literal for word in wordlists[slot]] for slot, literal in slots]
+        if self.levels:
+            self.levels[0] = self.levels[0][start:end]
+        self.suffixes = JoaatSuffixes(self.levels[-1]) if self.levels else None
+
+    def run(self, targets) -> list[str]:
+        matches = []
+        if not self.levels:
+            if joaat(self.prefix) in targets.set:
+                matches.append(self.prefix)
+            return matches
+
+        last = len(self.levels) - 1
+        def descend(depth: int, state: int, text: str):
+            if depth == last:
+                matches.extend(text + self.levels[last][index] for index in targets.matching(self.suffixes.hash(state)))
+                return
+            for word in self.levels[depth]:
+                descend(depth + 1, joaat_partial(word, state), text + word)
+
+        descend(0, joaat_partial(self.prefix), self.prefix)
+        return matches
+
+class _Targets:
+    """The hashes searched for, as a set and, with NumPy, a sorted array to match whole batches of hashes against"""
+    def __init__(self, hashes: Iterable[int]):
+        self.set = set(hashes)
+        np = _load_numpy()
+        self.array = None if np == None else np.array(sorted(self.set), dtype=np.uint32)
+
+    def matching(self, hashes) -> list[int]:
+        """Indexes of the hashes that are targets"""
+        if isinstance(hashes, list):
+            return [index for index, hash in enumerate(hashes) if hash in self.set]
+
+        np = _load_numpy()
+        if not len(self.array):
+            return []
+        positions = np.searchsorted(self.array, hashes)
+        positions[positions == len(self.array)] = 0
+        return np.nonzero(self.array[positions] == hashes)[0].tolist()
+
+_worker_state: tuple[dict[str, list[str]], _Targets] | None = None
+
+def _init_worker(wordlists: dict[str, list[str]], targets: list[int]):
+    global _worker_state
+    _worker_state = (wordlists, _Targets(targets))
+
+def _search_worker(template: str, start: int, end: int) -> list[str]:
+    wordlists, targets = _worker_state
+    return _TemplateSearch(template, wordlists, start, end).run(targets)
+
+def reverse_hashes(targets: Iterable[int], templates: list[str], wordlists: dict[str, list[str]], jobs: int = 1) -> dict[int, set[str]]:
+    """Candidate names of every target hash found by filling `templates` from `wordlists`, over `jobs` processes"""
+    targets = list(set(targets))
+    for template in templates:
+        unknown = [slot for slot, _ in parse_template(template)[1] if slot not in wordlists]
+        if unknown:
+            raise ValueError(f"Template '{template}' uses unknown wordlist(s) {', '.join(unknown)}")
+
+    # tasks split the first slot of every template, a few per process so they stay balanced
+    tasks = []
+    for template in templates:
+        slots = parse_template(template)[1]
+        first_count = len(wordlists[slots[0][0]]) if slots else 1
+        chunk = max(1, math.ceil(first_count / (jobs * 4)))
+        tasks += [(template, start, start + chunk) for start in range(0, first_count, chunk)]
+
+    if jobs <= 1:
+        _init_worker(wordlists, targets)
+        results = [_search_worker(*task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(wordlists, targets)) as executor:
+            results = list(executor.map(_search_worker, *zip(*tasks)))
+
+    found: dict[int, set[str]] = {}
+    for names in results:
+        for name in names:
+            found.setdefault(joaat(name), set()).add(name)
+    return found
+
+def write_nametable_txt(file_path: Path | str, names: Iterable[str]) -> int:
+    """Adds `names` to a `.txt` nametable (one name per line), keeping the names already in it. Returns the number of new names"""
+    file_path = Path(file_path)
+    existing = []
+    if file_path.is_file():
+        with open(file_path, "r", encoding="utf-8") as f:
+            existing = [line.strip() for line in f if line.strip()]
+
+    new_names = sorted(set(names) - set(existing))
+    write_atomic(file_path, "".join(f"{name}\n" for name in existing + new_names).encode("utf-8"))
+    return len(new_names)
+
+def _read_wordlist(file_path: Path) -> list[str]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Searches for names of unresolved hash_XXXXXXXX in /raw and info_merged.json")
+    parser.add_argument("--template", action="append", help="name template with {wordlist} slots, can be repeated (default: a built-in set)")
+    parser.add_argument("--words", action="append", default=[], metavar="NAME=FILE", help="wordlist with one word per line, replaces a built-in one of the same name")
+    parser.add_argument("--export", type=Path, default=script_dir / "info_merged.json", help="export to take ids for the built-in wordlists from")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--out", type=Path, default=script_dir / "reversed_candidates.txt", help="nametable to add the found names to, for review (default: %(default)s)")
+    args = parser.parse_args()
+
+    with open(args.export, "r", encoding="utf-8") as f:
+        export = json.load(f)
+    wordlists = default_wordlists(export, sorted(data_dir.glob("*.nametable")))
+    for entry in args.words:
+        name, _, file_path = entry.partition("=")
+        if not file_path:
+            parser.error(f"--words expects NAME=FILE, got '{entry}'")
+        wordlists[name] = _read_wordlist(Path(file_path))
+
+    templates = args.template or DEFAULT_TEMPLATES
+    time_start = perf_counter()
+    unresolved = collect_unresolved_hashes(data_dir, [args.export])
+    print(f"[{delta_time_ms(time_start)}ms] Found {len(unresolved)} unresolved hashes")
+
+    try:
+        candidates = sum(candidate_count(template, wordlists) for template in templates)
+    except KeyError as e:
+        parser.error(f"unknown wordlist {e}, expected one of {', '.join(wordlists)}")
+
+    time_start = perf_counter()
+    found = reverse_hashes(unresolved, templates, wordlists, args.jobs)
+    elapsed_ms = delta_time_ms(time_start)
+    print(f"[{elapsed_ms}ms] Searched {candidates} candidates ({candidates / max(elapsed_ms, 1) * 1000:.0f}/s), {len(found)} hashes matched")
+
+    for hash, names in sorted(found.items()):
+        files = ", ".join(sorted(unresolved[hash]))
+        print(f"- {ANSI(f'hash_{hash:08X}').bold()} = {' | '.join(sorted(names))} ({files})")
+
+    ambiguous = [hash for hash, names in found.items() if len(names) > 1]
+    if ambiguous:
+        print(ANSI(f"Skipped {len(ambiguous)} hash(es) with more than one candidate, add the right name by hand").yellow())
+
+    accepted = [names.pop() for names in found.values() if len(names) == 1]
+    if accepted:
+        added = write_nametable_txt(args.out, accepted)
+        print(ANSI(f"Added {added} name(s) to '{ANSI(str(args.out)).bold()}'").green())
+
+if __name__ == "__main__":
+    main()
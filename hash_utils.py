@@ -1,29 +1,112 @@
-from io import BufferedReader
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
 from pathlib import Path
 from time import perf_counter
+from typing import Iterable
+import mmap
 import struct
+import sys
 
-from utils import delta_time_ms, ANSI, data_dir
+from cache_utils import source_cache_path, source_fingerprint, source_matches, write_atomic
+import instrument
+from utils import delta_time_ms, ANSI, cache_dir
 
-def joaat(s: str) -> int:
-    k = s.lower()
-    h = 0
+np = None # NumPy is optional, only used to speed up joaat_many and imported on first use
+_numpy_checked = False
+
+def _load_numpy():
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    return np
 
-    for char in k:
+def joaat_partial(s: str, h: int = 0) -> int:
+    """JOAAT state after hashing `s` on top of state `h`, before finalization.
+    `joaat_finalize(joaat_partial(b, joaat_partial(a)))` equals `joaat(a + b)`, so a shared prefix only has to be hashed once"""
+    for char in s.lower():
         h += ord(char)
         h &= 0xFFFFFFFF  # Ensure 32-bit
         h += (h << 10)
         h &= 0xFFFFFFFF
         h ^= (h >> 6)
+    return h
 
+def joaat_finalize(h: int) -> int:
     h += (h << 3)
     h &= 0xFFFFFFFF
     h ^= (h >> 11)
     h += (h << 15)
     h &= 0xFFFFFFFF
-
     return h
 
+def _joaat(s: str) -> int:
+    return joaat_finalize(joaat_partial(s))
+
+@lru_cache(maxsize=1 << 16)
+def joaat(s: str) -> int:
+    """Hashes a string using JOAAT (case-insensitive). Results are memoized, since the same names are hashed many times per export"""
+    return _joaat(s)
+
+JOAAT_BATCH_SIZE = 1 << 16
+class JoaatSuffixes:
+    """Strings prepared to be hashed on top of any number of prefix states (see `joaat_partial`).
+    With NumPy, the strings are laid out as character columns once and every `hash` call is a few vectorized operations per column"""
+    def __init__(self, strings: list[str]):
+        self.strings = strings
+        self.lowered = [s.lower() for s in strings]
+        self.columns = None
+        if len(strings) < 64 or _load_numpy() is None:
+            return
+
+        lengths = np.fromiter(map(len, self.lowered), dtype=np.int64, count=len(self.lowered))
+        self.order = np.argsort(-lengths, kind="stable") # longest first, so the strings still being hashed are always a prefix
+        sorted_lengths = lengths[self.order]
+        max_len = int(sorted_lengths[0])
+
+        padded = "".join(self.lowered[i].ljust(max_len, "\0") for i in self.order.tolist())
+        self.columns = np.frombuffer(padded.encode("utf-32-le"), dtype="<u4").reshape(len(self.lowered), max_len).T.copy()
+        # number of strings longer than each column
+        self.active_counts = (len(self.lowered) - np.searchsorted(sorted_lengths[::-1], np.arange(max_len), side="right")).tolist()
+
+    def __len__(self):
+        return len(self.strings)
+
+    def hash(self, h: int = 0):
+        """JOAAT of every string with state `h` as prefix, in the order of `strings`. A NumPy uint32 array when vectorized"""
+        if self.columns is None:
+            return [joaat_finalize(joaat_partial(s, h)) for s in self.lowered]
+
+        hashes = np.full(len(self.lowered), h, dtype=np.uint32)
+        for column, active in zip(self.columns, self.active_counts):
+            hv = hashes[:active]
+            hv += column[:active]
+            hv += hv << np.uint32(10)
+            hv ^= hv >> np.uint32(6)
+
+        hashes += hashes << np.uint32(3)
+        hashes ^= hashes >> np.uint32(11)
+        hashes += hashes << np.uint32(15)
+
+        result = np.empty_like(hashes)
+        result[self.order] = hashes
+        return result
+
+def joaat_many(strings: Iterable[str]) -> list[int]:
+    """Hashes a list of strings in one call, vectorized with NumPy when it is installed. Same results as `joaat`"""
+    strings = list(strings)
+    if len(strings) < 64 or _load_numpy() is None:
+        return [_joaat(s) for s in strings]
+
+    hashes = []
+    for start in range(0, len(strings), JOAAT_BATCH_SIZE):
+        hashes.extend(JoaatSuffixes(strings[start:start + JOAAT_BATCH_SIZE]).hash().tolist())
+    return hashes
+
 hash_string_prefix = "hash_"
 def parse_hash_string(string: str) -> int | None:
     """Given `"hash_FFFFFFFF"` returns `FFFFFFFF` as an integer. Returns None if string is not a hash string"""
@@ -36,14 +119,8 @@ def format_hash(hash_val: int) -> str:
     return f"hash_{hash_val:08X}"
 
 class gxt2_binary:
-    def swap_endian(self, i: bytes):
-        if self.isBigEndian:
-            return struct.unpack("<L", i)[0]
-        return struct.unpack(">L", i)[0]
-    
-    def read_uint4(self):
-        return self.swap_endian(self.data.read(4))
-    
+    """Global text table reader. The file is memory-mapped, the entry table is parsed in bulk
+    and strings are only decoded when they are looked up"""
     def set_endian(self, header: bytes, error: str):
         if header == b"2TXG":
             self.isBigEndian = True
@@ -52,39 +129,172 @@ class gxt2_binary:
         else:
             raise ValueError(error)
 
-    def __init__(self, data: BufferedReader):
-        self.data = data
-        self.hash_map = {}
+    def read_uint4(self, offset: int) -> int:
+        return struct.unpack_from("<L" if self.isBigEndian else ">L", self.data, offset)[0]
+
+    def __init__(self, file_path: Path | str):
+        with open(file_path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.decoded: dict[int, str] = {}
+
+        self.set_endian(self.data[0:4], "GXT2 file format is invalid")
+        self.count = self.read_uint4(4)
+
+        entries_end = 8 + 8 * self.count
+        entries = _uint32_view(memoryview(self.data)[8:entries_end], little_endian=self.isBigEndian)
+        self.offsets = entries[1::2]
+        self.index = dict(zip(entries[0::2], range(self.count))) # later duplicates win
+
+        self.set_endian(self.data[entries_end:entries_end + 4], "Incorrect GXT2 header after entries, file may be corrupted")
+        self.data_length = self.read_uint4(entries_end + 4)
+
+    def __len__(self):
+        return self.count
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held, including the mapped file"""
+        return len(self.data) + sys.getsizeof(self.index) + sys.getsizeof(self.decoded) + sum(map(sys.getsizeof, self.decoded.values()))
+
+    def get(self, hash: int) -> str | None:
+        if hash in self.decoded:
+            return self.decoded[hash]
+
+        index = self.index.get(hash)
+        if index == None:
+            return None
+
+        next_offset = self.data_length
+        if index + 1 < self.count:
+            next_offset = self.offsets[index + 1]
+
+        value = self.data[self.offsets[index]:next_offset].rstrip(b"\x00").decode(encoding="utf-8")
+        self.decoded[hash] = value
+        return value
+
+    @property
+    def hash_map(self) -> dict[int, str]:
+        """Decodes every entry into a dict"""
+        return {hash: self.get(hash) for hash in self.index}
+
+def _uint32_view(buffer: memoryview, little_endian: bool = True) -> memoryview | array:
+    """uint32 view over a buffer without copying, unless its byte order differs from the host's"""
+    if (sys.byteorder == "little") == little_endian:
+        return buffer.cast("I")
+    values = array("I", buffer)
+    values.byteswap()
+    return values
+
+class CompiledNametable:
+    """Read-only nametable stored as a sorted uint32 hash array, a string offset array and a UTF-8 blob.
+    The file is memory-mapped, lookups are a binary search and strings are only decoded when requested"""
+    MAGIC = b"NTC1"
+    # magic, entry count, source size, source mtime (ns), source content digest
+    header = struct.Struct("<4sIQQ16s")
+
+    @staticmethod
+    def compile(names: list[str], out_path: Path | str, source_path: Path | str) -> bool:
+        """Writes `names` as a compiled nametable, tagged with the fingerprint of the file they were read from.
+        The file is written next to `out_path` and swapped in, tables that still map the previous version keep it until they are released.
+        Returns False if it could not be swapped in (Windows does not replace a file that is mapped)"""
+        table = dict(zip(joaat_many(names), names))
+        hashes = array("I", sorted(table))
+        offsets = array("I", [0])
+        blob = bytearray()
+        for hash in hashes:
+            blob += table[hash].encode("utf-8")
+            offsets.append(len(blob))
+
+        if sys.byteorder != "little":
+            hashes.byteswap()
+            offsets.byteswap()
+
+        header = CompiledNametable.header.pack(CompiledNametable.MAGIC, len(hashes), *source_fingerprint(source_path))
+        try:
+            write_atomic(out_path, header, hashes.tobytes(), offsets.tobytes(), blob)
+        except PermissionError:
+            return False
+        return True
+
+    @staticmethod
+    def is_current(compiled_path: Path | str, source_path: Path | str) -> bool:
+        """Checks whether a compiled nametable exists and was built from the current version of `source_path`"""
+        compiled_path = Path(compiled_path)
+        if not compiled_path.is_file():
+            return False
+
+        with open(compiled_path, "rb") as f:
+            header = f.read(CompiledNametable.header.size)
+        if len(header) != CompiledNametable.header.size:
+            return False
+
+        magic, _, size, mtime_ns, digest = CompiledNametable.header.unpack(header)
+        return magic == CompiledNametable.MAGIC and source_matches(source_path, size, mtime_ns, digest)
+
+    def __init__(self, file_path: Path | str):
+        with open(file_path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, *_ = self.header.unpack_from(self.data)
+        if magic != self.MAGIC:
+            self.data.close()
+            raise ValueError(f"Compiled nametable format is invalid ({file_path})")
+
+        self.view = memoryview(self.data)
+        hashes_start = self.header.size
+        offsets_start = hashes_start + 4 * self.count
+        self.blob_start = offsets_start + 4 * (self.count + 1)
+
+        self.hashes = _uint32_view(self.view[hashes_start:offsets_start])
+        self.offsets = _uint32_view(self.view[offsets_start:self.blob_start])
+
+    def close(self):
+        """Unmaps the file. The table is empty afterwards"""
+        if self.data.closed:
+            return
+        for view in (self.hashes, self.offsets, self.view):
+            if isinstance(view, memoryview):
+                view.release()
+        self.hashes = self.offsets = array("I")
+        self.count = 0
+        self.data.close()
+
+    def __len__(self):
+        return self.count
+
+    def memory_usage(self) -> int:
+        """Size of the mapped file, names are decoded on lookup and not kept"""
+        return 0 if self.data.closed else len(self.data)
+
+    def get(self, hash: int) -> str | None:
+        index = bisect_left(self.hashes, hash)
+        if index == self.count or self.hashes[index] != hash:
+            return None
+
+        start = self.blob_start + self.offsets[index]
+        end = self.blob_start + self.offsets[index + 1]
+        return self.data[start:end].decode("utf-8")
 
-        self.set_endian(data.read(4), "GXT2 file format is invalid")
-        
-        entry_count = self.read_uint4()
-        entries = []
-        for _ in range(entry_count):
-            hash = self.read_uint4()
-            offset = self.read_uint4()
-            entries.append((hash, offset))
-
-        self.set_endian(data.read(4), "Incorrect GXT2 header after entries, file may be corrupted")
-
-        data_length = self.read_uint4()
-        for x in range(entry_count):
-            entry = entries[x]
-            offset = entry[1]
-            hash = entry[0]
-
-            next_offset = data_length
-            if len(entries) > x+1:
-                next_offset = entries[x+1][1]
-            
-            self.hash_map[hash] = data.read(next_offset - offset).rstrip(b"\x00").decode(encoding="utf-8")
-    
 class HashMap:
+    """Names by hash in layers: the `map` at the bottom, then the stacked read-only tables in the order they were loaded.
+    A hash is resolved from the top layer down, a different name for it in a lower layer is reported once"""
     def __init__(self):
         self.map: dict[int, str] = {}
+        self.tables: list["CompiledNametable | gxt2_binary | HashMap"] = [] # stacked read-only tables, later ones take priority
         self.is_empty = True
+        self.checked: set[int] = set() # hashes whose layers were checked for conflicts
+
+    def __len__(self):
+        return len(self.map) + sum(map(len, self.tables))
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the map and the tables stacked on it"""
+        return (sys.getsizeof(self.map) + sum(map(sys.getsizeof, self.map.values())) + sys.getsizeof(self.checked)
+                + sum(table.memory_usage() for table in self.tables))
 
     def load_hashmap(self, hash_map: dict[int, str]):
+        """Adds names to the map. Once tables are stacked, the names are stacked on top of them instead, so they keep the loading order"""
+        if self.tables:
+            return self.load_table(HashMap().load_hashmap(hash_map))
         for k, v in hash_map.items():
             if k in self.map and self.map[k] != v:
                 print(ANSI(f"⚠️ Hashmap conflict '{k}': '{self.map[k]}' != '{v}'").yellow())
@@ -92,29 +302,49 @@ class HashMap:
             self.is_empty = False
         return self
 
-    def load_nametable(self, file_path: Path | str):
+    def load_table(self, table: "CompiledNametable | gxt2_binary | HashMap"):
+        """Stacks a read-only lookup table on top of the ones already loaded. A `HashMap` can be stacked too, which shares it instead of copying it"""
+        self.tables.append(table)
+        if len(table) > 0:
+            self.is_empty = False
+        return self
+
+    def load_compiled_nametable(self, file_path: Path | str):
+        return self.load_table(CompiledNametable(file_path))
+
+    def load_nametable(self, file_path: Path | str, cache_dir: Path | None = cache_dir):
+        """Loads a `.nametable` or `.txt` nametable. When `cache_dir` is set, the nametable is compiled there once
+        and memory-mapped on later loads instead of being hashed into a dict"""
         time_start = perf_counter()
         file_path = Path(file_path)
         if not file_path.exists():
             print(ANSI(f"Nametable '{ANSI(file_path.name).bold()}' does not exist").yellow())
             return
 
+        compiled_path = None
+        if cache_dir != None:
+            compiled_path = source_cache_path(cache_dir, file_path, ".ntc")
+            if CompiledNametable.is_current(compiled_path, file_path):
+                instrument.count("NametableCacheHits")
+                self.load_compiled_nametable(compiled_path)
+                print(f"[{delta_time_ms(time_start)}ms] Loaded compiled nametable '{file_path.name}'")
+                return self
+            instrument.count("NametableCacheMisses")
+
         if file_path.suffix == ".txt":
             with open(file_path, "r", encoding="utf-8") as f:
-                hash_map = {}
-                for line in f:
-                    line = line.strip()
-                    hash_map[joaat(line)] = line
-                
-                self.load_hashmap(hash_map)
+                lines = [line.strip() for line in f]
         elif file_path.suffix == ".nametable":
             with open(file_path, "rb") as f:
                 lines = [s.decode("utf-8") for s in f.read().split(b"\x00") if s] 
-
-            self.load_hashmap({joaat(s): s for s in lines})
         else:
             raise ValueError(f"Nametable only supports file types of .nametable or .txt ({file_path})")
 
+        if compiled_path != None and CompiledNametable.compile(lines, compiled_path, file_path):
+            self.load_compiled_nametable(compiled_path)
+        else:
+            self.load_hashmap(dict(zip(joaat_many(lines), lines)))
+
         print(f"[{delta_time_ms(time_start)}ms] Loaded nametable '{file_path.name}'")
         return self
 
@@ -137,8 +367,7 @@ class HashMap:
 
                 self.load_hashmap(hash_map)
         elif file_path.suffix == ".gxt2":
-            with open(file_path, 'rb') as f:
-                self.load_hashmap(gxt2_binary(f).hash_map)
+            self.load_table(gxt2_binary(file_path))
         else:
             raise ValueError(f"Global text table only supports file types of .gxt2 or .txt ({file_path})")
 
@@ -146,10 +375,25 @@ class HashMap:
         return self 
 
     def resolve(self, hash: int):
-        """Attempts to resolve a hash to a known name using the hash map."""
+        """Attempts to resolve a hash to a known name, from the top layer down"""
+        if hash in self.checked:
+            for table in reversed(self.tables):
+                name = table.get(hash)
+                if name != None:
+                    return name
+            return self.map.get(hash)
+
+        # first lookup of this hash: every layer is checked, so a name shadowed by a different one is reported
+        names = [name for name in (table.get(hash) for table in reversed(self.tables)) if name != None]
         if hash in self.map:
-            return self.map[hash]
-        return None
+            names.append(self.map[hash])
+        self.checked.add(hash)
+        for name in names[1:]:
+            if name != names[0]:
+                print(ANSI(f"⚠️ Hashmap conflict '{format_hash(hash)}': '{names[0]}' shadows '{name}'").yellow())
+        return names[0] if names else None
+
+    get = resolve # so a HashMap can be stacked on another one
 
     def resolve_string(self, hash_str: str):
         """Attempts to resolve a `"hash_FFFFFFFF"` to a known name using the hash map. Returns the same string otherwise"""
@@ -158,11 +402,3 @@ class HashMap:
             return hash_str
 
         return self.resolve(hash) or hash_str
-    
-
-trackid_table = None
-def get_trackid_table() -> HashMap:
-    global trackid_table
-    if trackid_table == None:
-        trackid_table = HashMap().load_gxt2(data_dir / "trackid.gxt2")
-    return trackid_table
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""Opt-in instrumentation for the export pipeline: nested timing spans, counters, tracemalloc peaks and cProfile.
+
+    instrument.start(trace_memory=True)
+    with instrument.span("load game"):
+        ...
+    instrument.count("RelCacheHits")
+    instrument.stop(cache_dir / "reports") # returns the report and saves it as JSON
+
+`span` and `count` do nothing while no instrumentation is running. They can be used from several threads: each thread nests its spans
+under the root on its own (a background thread's work shows up as its own spans, not inside the span the main thread is in)"""
+import os
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from threading import Lock, get_ident, local
+from time import perf_counter
+
+from utils import delta_time_ms, save_json
+
+REPORT_VERSION = 1
+PROFILE_TOP_FUNCTIONS = 40
+
+class Span:
+    """Timing of every call to a named span under the same parent, children are aggregated by name"""
+    __slots__ = ("name", "calls", "total_ms", "max_ms", "memory_peak", "counters", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.memory_peak = 0
+        self.counters: dict[str, int] = {}
+        self.children: dict[str, Span] = {}
+
+    def child(self, name: str) -> "Span":
+        span = self.children.get(name)
+        if span == None:
+            span = self.children[name] = Span(name)
+        return span
+
+    def add(self, data: dict):
+        """Adds a span from another report (e.g. one made in a worker process)"""
+        self.calls += data["Calls"]
+        self.total_ms += data["TotalMs"]
+        self.max_ms = max(self.max_ms, data["MaxMs"])
+        self.memory_peak = max(self.memory_peak, data.get("MemoryPeak", 0))
+        for name, amount in data.get("Counters", {}).items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for child in data.get("Children", []):
+            self.child(child["Name"]).add(child)
+
+    def to_dict(self) -> dict:
+        data = {"Name": self.name, "Calls": self.calls, "TotalMs": round(self.total_ms, 3), "MaxMs": round(self.max_ms, 3)}
+        if self.memory_peak:
+            data["MemoryPeak"] = self.memory_peak
+        if self.counters:
+            data["Counters"] = dict(self.counters)
+        if self.children:
+            data["Children"] = [child.to_dict() for child in self.children.values()]
+        return data
+
+class Instrumentation:
+    """Collects the spans and counters of a single run.
+    With `trace_memory`, the tracemalloc peak of every span of the thread that started it is recorded (the peak is shared by the whole process,
+    so other threads do not reset it). With `profile`, the run is profiled with cProfile, which only sees the thread that started it"""
+    def __init__(self, trace_memory: bool = False, profile: bool = False):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.root = Span("run")
+        self.counters: dict[str, int] = {}
+        self.started = datetime.now()
+
+        self._lock = Lock() # spans and counters are shared between threads
+        self._local = local() # span stack of each thread
+        self._memory_thread = get_ident()
+        self._memory_stack = [0]
+        self._started_tracemalloc = False
+        self._profiler = None # cProfile.Profile, only imported when profiling
+        self._profile_files: list[str] = []
+        self._time_start = perf_counter()
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._memory_thread = get_ident()
+        self._time_start = perf_counter()
+        return self
+
+    def stop(self):
+        self.root.calls = 1
+        self.root.total_ms = self.root.max_ms = delta_time_ms(self._time_start)
+        if self._profiler != None:
+            self._profiler.disable()
+        if self.trace_memory:
+            self.root.memory_peak = max(self._memory_stack[0], tracemalloc.get_traced_memory()[1])
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    @property
+    def _stack(self) -> list[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack == None:
+            stack = self._local.stack = [self.root]
+        return stack
+
+    @contextmanager
+    def span(self, name: str):
+        stack = self._stack
+        with self._lock:
+            span = stack[-1].child(name)
+        stack.append(span)
+        trace_memory = self.trace_memory and get_ident() == self._memory_thread
+        if trace_memory: # the tracemalloc peak is reset for every span, the parent keeps the highest peak seen so far
+            self._memory_stack[-1] = max(self._memory_stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._memory_stack.append(0)
+
+        time_start = perf_counter()
+        try:
+            yield span
+        finally:
+            elapsed_ms = (perf_counter() - time_start) * 1000
+            with self._lock:
+                span.calls += 1
+                span.total_ms += elapsed_ms
+                span.max_ms = max(span.max_ms, elapsed_ms)
+
+            if trace_memory:
+                peak = max(self._memory_stack.pop(), tracemalloc.get_traced_memory()[1])
+                span.memory_peak = max(span.memory_peak, peak)
+                self._memory_stack[-1] = max(self._memory_stack[-1], peak)
+            stack.pop()
+
+    def count(self, name: str, amount: int = 1):
+        counters = self._stack[-1].counters
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            counters[name] = counters.get(name, 0) + amount
+
+    def graft(self, report: dict | None):
+        """Adds the spans and counters of a report from another process under the current span"""
+        if report == None:
+            return
+        parent = self._stack[-1]
+        with self._lock:
+            for child in report["Spans"].get("Children", []):
+                parent.child(child["Name"]).add(child)
+            for name, amount in report["Counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            if report.get("ProfileFile"):
+                self._profile_files.append(report["ProfileFile"])
+
+    def profile_summary(self) -> list[dict]:
+        """The functions with the highest cumulative time, including the ones profiled in worker processes"""
+        if self._profiler == None:
+            return []
+
+        import pstats
+        stats = pstats.Stats(self._profiler)
+        for file in self._profile_files:
+            stats.add(file)
+            os.remove(file)
+        self._profile_files.clear()
+
+        summary = []
+        for (file, line, function), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+            summary.append({"Function": f"{Path(file).name}:{line}({function})", "Calls": calls,
+                            "TotalMs": round(total_time * 1000, 3), "CumulativeMs": round(cumulative_time * 1000, 3)})
+        summary.sort(key=lambda entry: entry["CumulativeMs"], reverse=True)
+        return summary[:PROFILE_TOP_FUNCTIONS]
+
+    def report(self, worker: bool = False) -> dict:
+        report = {
+            "Version": REPORT_VERSION,
+            "Started": self.started.isoformat(timespec="seconds"),
+            "TotalMs": self.root.total_ms,
+            "TraceMemory": self.trace_memory,
+            "Counters": dict(self.counters),
+            "Spans": self.root.to_dict()
+        }
+        if self._profiler != None:
+            if worker: # the parent process adds it to its own profile
+                import tempfile
+                fd, report["ProfileFile"] = tempfile.mkstemp(suffix=".prof")
+                os.close(fd)
+                self._profiler.dump_stats(report["ProfileFile"])
+            else:
+                report["Profile"] = self.profile_summary()
+        return report
+
+_active: Instrumentation | None = None
+
+def start(trace_memory: bool = False, profile: bool = False) -> Instrumentation:
+    """Starts collecting spans and counters, replacing any running instrumentation"""
+    global _active
+    _active = Instrumentation(trace_memory, profile).start()
+    return _active
+
+def stop(report_dir: Path | None = None, worker: bool = False) -> dict | None:
+    """Stops the running instrumentation and returns its report, saved as `report_dir/run_<time>.json` if `report_dir` is set"""
+    global _active
+    if _active == None:
+        return None
+
+    instrumentation, _active = _active, None
+    instrumentation.stop()
+    report = instrumentation.report(worker)
+
+    if report_dir != None:
+        report_dir = Path(report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        report_path = report_dir / f"run_{instrumentation.started:%Y%m%d_%H%M%S_%f}.json"
+        save_json(report_path, report)
+        print(f"Saved run report to '{report_path}'")
+    return report
+
+def active() -> Instrumentation | None:
+    return _active
+
+def options() -> dict | None:
+    """Arguments to `start` an equivalent instrumentation in a worker process, None if nothing is running"""
+    if _active == None:
+        return None
+    return {"trace_memory": _active.trace_memory, "profile": _active.profile}
+
+def graft(report: dict | None):
+    """Adds a report from a worker process under the current span"""
+    if _active != None:
+        _active.graft(report)
+
+_no_span = nullcontext()
+
+def span(name: str):
+    """Times a block as a child of the current span"""
+    if _active == None:
+        return _no_span
+    return _active.span(name)
+
+def count(name: str, amount: int = 1):
+    """Adds to a counter of the run and of the current span"""
+    if _active != None:
+        _active.count(name, amount)
+
+def traced(name: str):
+    """Decorator that runs a function inside a span"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
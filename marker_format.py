@@ -0,0 +1,179 @@
+"""Compact binary layout for exports (`info_merged.json` or `processed/*_info.json`), most of which is markers.
+
+Markers are stored column by column: one array per marker type and field over the whole export (e.g. every `Beat` `Offset`),
+delta-encoded with the smallest integer width that fits. Strings (track titles, artists, DJ/rockout values) are indexes
+into a shared string table. Everything else, including how many markers of each type every track has, is kept in a small JSON header.
+
+    b"RMK1" | zlib(header length (u32) | header JSON | string table length (u32) | concatenated UTF-8 strings | string lengths column | columns)
+
+Every column is a typecode byte, a count (u32) and the little-endian array. String lengths are in bytes, so strings may hold any character"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from pathlib import Path
+
+from cache_utils import write_atomic
+
+MARKER_FORMAT_MAGIC = b"RMK1"
+MARKER_FORMAT_VERSION = 2
+
+# smallest typecode first
+_int_typecodes = [(typecode, 1 << (8 * array(typecode).itemsize - 1)) for typecode in ("b", "h", "i", "q")]
+_column_header = struct.Struct("<cI")
+
+def _int_column(values: list[int]) -> array:
+    low, high = min(values, default=0), max(values, default=0)
+    for typecode, limit in _int_typecodes:
+        if -limit <= low and high < limit:
+            return array(typecode, values)
+    raise OverflowError("Marker value does not fit in 64 bits")
+
+def _column_bytes(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return _column_header.pack(column.typecode.encode("ascii"), len(column)) + column.tobytes()
+
+def _read_column(payload: memoryview, offset: int) -> tuple[array, int]:
+    """Column at `offset` and the offset right after it"""
+    typecode, count = _column_header.unpack_from(payload, offset)
+    offset += _column_header.size
+    column = array(typecode.decode("ascii"))
+    column.frombytes(payload[offset:offset + count * column.itemsize])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + count * column.itemsize
+
+def _field_type(values: list) -> str | None:
+    if all(type(value) is int for value in values):
+        return "int"
+    if all(value == None or type(value) is str for value in values):
+        return "str"
+    return None
+
+def _iter_tracks(export: dict):
+    for track_list in export.get("TrackLists", {}).values():
+        yield from track_list.get("Tracks", [])
+
+def write_marker_export(file_path: Path | str, export: dict, level: int = 9):
+    """Writes `export` in the binary marker layout. Marker lists whose markers do not share the same fields are kept in the header as is"""
+    # fields of every marker type, None if they are not the same for every marker
+    fields: dict[str, tuple[str, ...] | None] = {}
+    for track in _iter_tracks(export):
+        for marker_type, markers in track.get("Markers", {}).items():
+            for marker in markers:
+                if fields.setdefault(marker_type, tuple(marker)) != tuple(marker):
+                    fields[marker_type] = None
+
+    values: dict[str, dict[str, list]] = {marker_type: {field: [] for field in type_fields} for marker_type, type_fields in fields.items() if type_fields != None}
+    for track in _iter_tracks(export):
+        for marker_type, markers in track.get("Markers", {}).items():
+            if marker_type in values:
+                for field, field_values in values[marker_type].items():
+                    field_values.extend(marker[field] for marker in markers)
+
+    types = {marker_type: {field: _field_type(field_values) for field, field_values in type_values.items()} for marker_type, type_values in values.items()}
+    for marker_type, field_types in list(types.items()):
+        if None in field_types.values(): # mixed value types, stored in the header
+            del types[marker_type], values[marker_type]
+
+    strings: dict[str, int] = {}
+    columns = []
+    for marker_type, field_types in types.items():
+        for field, field_type in field_types.items():
+            field_values = values[marker_type][field]
+            if field_type == "int":
+                deltas = [value - previous for value, previous in zip(field_values, [0] + field_values)]
+                columns.append(_column_bytes(_int_column(deltas)))
+            else: # 0 is None
+                indexes = [0 if value == None else strings.setdefault(value, len(strings) + 1) for value in field_values]
+                columns.append(_column_bytes(_int_column(indexes)))
+
+    # the header is the export with the markers of every track replaced by their count
+    header_export = {}
+    for section, entries in export.items():
+        if section != "TrackLists":
+            header_export[section] = entries
+            continue
+
+        header_export[section] = {}
+        for tracklist_id, track_list in entries.items():
+            header_track_list = header_export[section][tracklist_id] = dict(track_list)
+            if "Tracks" not in track_list:
+                continue
+
+            header_track_list["Tracks"] = []
+            for track in track_list["Tracks"]:
+                if "Markers" in track:
+                    track = dict(track)
+                    track["Markers"] = {marker_type: len(markers) if marker_type in types else markers for marker_type, markers in track["Markers"].items()}
+                header_track_list["Tracks"].append(track)
+
+    header = json.dumps({"Version": MARKER_FORMAT_VERSION, "Types": types, "Export": header_export}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    encoded_strings = [string.encode("utf-8") for string in strings]
+    string_table = b"".join(encoded_strings)
+    string_lengths = _column_bytes(_int_column([len(string) for string in encoded_strings]))
+
+    payload = b"".join([struct.pack("<I", len(header)), header, struct.pack("<I", len(string_table)), string_table, string_lengths, *columns])
+    write_atomic(file_path, MARKER_FORMAT_MAGIC, zlib.compress(payload, level))
+
+def _build_markers(fields: tuple[str, ...], columns: list) -> list[dict]:
+    # dict displays are several times faster than dict(zip(...)), which only the unusual field counts fall back to
+    if len(fields) == 2:
+        f0, f1 = fields
+        return [{f0: v0, f1: v1} for v0, v1 in zip(*columns)]
+    if len(fields) == 3:
+        f0, f1, f2 = fields
+        return [{f0: v0, f1: v1, f2: v2} for v0, v1, v2 in zip(*columns)]
+    if len(fields) == 4:
+        f0, f1, f2, f3 = fields
+        return [{f0: v0, f1: v1, f2: v2, f3: v3} for v0, v1, v2, v3 in zip(*columns)]
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+def read_marker_export(file_path: Path | str) -> dict:
+    """Reads a file written by `write_marker_export`, returning the same structure as the JSON export"""
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if data[:4] != MARKER_FORMAT_MAGIC:
+        raise ValueError(f"'{file_path}' is not a marker export")
+
+    payload = memoryview(zlib.decompress(data[4:]))
+    header_length = struct.unpack_from("<I", payload)[0]
+    header = json.loads(bytes(payload[4:4 + header_length]))
+    if header["Version"] != MARKER_FORMAT_VERSION:
+        raise ValueError(f"Unsupported marker export version {header['Version']}")
+
+    offset = 4 + header_length
+    strings_length = struct.unpack_from("<I", payload, offset)[0]
+    offset += 4
+    string_table = bytes(payload[offset:offset + strings_length])
+    offset += strings_length
+    string_lengths, offset = _read_column(payload, offset)
+    strings = [None] + [string_table[start:end].decode("utf-8") for start, end in zip(accumulate(string_lengths, initial=0), accumulate(string_lengths))]
+
+    # the markers of every type, built from the decoded columns in one go and sliced per track below
+    type_markers: dict[str, list[dict]] = {}
+    for marker_type, field_types in header["Types"].items():
+        type_columns = []
+        for field_type in field_types.values():
+            column, offset = _read_column(payload, offset)
+            type_columns.append(accumulate(column) if field_type == "int" else map(strings.__getitem__, column))
+        type_markers[marker_type] = _build_markers(tuple(field_types), type_columns)
+
+    positions = dict.fromkeys(type_markers, 0)
+    export = header["Export"]
+    for track in _iter_tracks(export):
+        markers = track.get("Markers")
+        if markers == None:
+            continue
+
+        for marker_type, count in markers.items():
+            if marker_type in type_markers:
+                start = positions[marker_type]
+                positions[marker_type] = start + count
+                markers[marker_type] = type_markers[marker_type][start:start + count]
+
+    return export
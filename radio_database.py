@@ -0,0 +1,156 @@
+"""Read-only queries over a merged export (`info_merged.json`, `info_merged.bin` or a single `processed/*_info.json`)
+
+    db = RadioDatabase()
+    db.now_playing("radio_01_class_rock_music", "dlc_..._track", 61500) # the Track marker (title/artist) at 61.5s
+    db.next_marker("radio_01_class_rock_music", "dlc_..._track", "Beat", 61500)
+    db.markers_at_many("radio_01_class_rock_music", "dlc_..._track", "Track", timestamps)
+
+The export is only loaded on first use, and the marker offsets of a track are only indexed when it is first queried"""
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import repeat
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from utils import script_dir
+
+class TrackMarkers:
+    """The markers of one type on one track with their offsets in a sorted array, queried by bisection"""
+    __slots__ = ("markers", "offsets")
+
+    def __init__(self, markers: list[dict]):
+        self.markers = sorted(markers, key=lambda marker: marker["Offset"]) # exports are already sorted, this keeps them stable
+        self.offsets = array("q", [marker["Offset"] for marker in self.markers])
+
+    def __len__(self):
+        return len(self.markers)
+
+    def at(self, offset: int) -> dict | None:
+        """The last marker at or before `offset`, None if it is before the first marker"""
+        index = bisect_right(self.offsets, offset)
+        return self.markers[index - 1] if index else None
+
+    def next(self, offset: int) -> dict | None:
+        """The first marker after `offset`"""
+        index = bisect_right(self.offsets, offset)
+        return self.markers[index] if index < len(self.markers) else None
+
+    def between(self, start: int, end: int) -> list[dict]:
+        """Markers with `start <= Offset < end`"""
+        return self.markers[bisect_left(self.offsets, start):bisect_left(self.offsets, end)]
+
+    def at_many(self, offsets: Iterable[int]) -> list[dict | None]:
+        markers = [None] + self.markers # index 0 is before the first marker
+        return [markers[index] for index in map(bisect_right, repeat(self.offsets), offsets)]
+
+    def next_many(self, offsets: Iterable[int]) -> list[dict | None]:
+        markers = self.markers + [None] # index len(markers) is after the last marker
+        return [markers[index] for index in map(bisect_right, repeat(self.offsets), offsets)]
+
+_no_markers = TrackMarkers([])
+
+class RadioDatabase:
+    """Station, tracklist and track lookups by id and marker queries on top of an export, which is loaded on first use"""
+    def __init__(self, file_path: Path | str = script_dir / "info_merged.json", data: dict = None):
+        self.file_path = Path(file_path)
+        self._data = data
+        self._tracks: dict[str, dict[str, dict]] | None = None # tracklist id -> track id -> track
+        self._track_lists_of: dict[str, list[str]] | None = None # track id -> tracklists it is in
+        self._markers: dict[tuple[str, str, str], TrackMarkers] = {}
+
+    @property
+    def data(self) -> dict:
+        if self._data == None:
+            if self.file_path.suffix == ".bin":
+                from marker_format import read_marker_export
+                self._data = read_marker_export(self.file_path)
+            else:
+                with open(self.file_path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+        return self._data
+
+    def _index_tracks(self):
+        self._tracks = {}
+        self._track_lists_of = {}
+        for track_list_id, track_list in self.data.get("TrackLists", {}).items():
+            tracks = self._tracks[track_list_id] = {}
+            for track in track_list.get("Tracks", []):
+                tracks.setdefault(track["Id"], track)
+                self._track_lists_of.setdefault(track["Id"], []).append(track_list_id)
+
+    def station(self, station_id: str) -> dict | None:
+        return self.data.get("Stations", {}).get(station_id)
+
+    def track_list(self, track_list_id: str) -> dict | None:
+        return self.data.get("TrackLists", {}).get(track_list_id)
+
+    def station_track_lists(self, station_id: str) -> dict[str, dict]:
+        """The tracklists of a station that are in the export, by id"""
+        station = self.station(station_id)
+        if station == None:
+            return {}
+        track_lists = self.data.get("TrackLists", {})
+        return {track_list_id: track_lists[track_list_id] for track_list_id in station.get("TrackLists", []) if track_list_id in track_lists}
+
+    def station_tracks(self, station_id: str, category: str = None) -> Iterator[tuple[str, dict]]:
+        """(tracklist id, track) of every track of a station, only from tracklists of `category` if set"""
+        for track_list_id, track_list in self.station_track_lists(station_id).items():
+            if category == None or track_list.get("Category") == category:
+                for track in track_list.get("Tracks", []):
+                    yield track_list_id, self.track(track_list_id, track["Id"])
+
+    def track_lists_of(self, track_id: str) -> list[str]:
+        """Ids of every tracklist a track is in"""
+        if self._track_lists_of == None:
+            self._index_tracks()
+        return self._track_lists_of.get(track_id, [])
+
+    def track(self, track_list_id: str | None, track_id: str) -> dict | None:
+        """A track of a tracklist (the first tracklist it is in if `track_list_id` is None).
+        Duplicated tracks that only reference another tracklist are resolved to the track in that tracklist"""
+        if self._tracks == None:
+            self._index_tracks()
+
+        if track_list_id == None:
+            track_lists = self.track_lists_of(track_id)
+            if not track_lists:
+                return None
+            track_list_id = track_lists[0]
+
+        track = self._tracks.get(track_list_id, {}).get(track_id)
+        # a reference can point to another reference, the visited set guards against cycles
+        visited = {track_list_id}
+        while track != None and "TrackList" in track and "Path" not in track and track["TrackList"] not in visited:
+            visited.add(track["TrackList"])
+            track = self._tracks.get(track["TrackList"], {}).get(track_id, track)
+        return track
+
+    def markers(self, track_list_id: str | None, track_id: str, marker_type: str) -> TrackMarkers:
+        """The markers of one type (`Track`, `Beat`, `DJ` or `Rockout`) on a track, empty if it has none"""
+        key = (track_list_id, track_id, marker_type)
+        track_markers = self._markers.get(key)
+        if track_markers == None:
+            track = self.track(track_list_id, track_id)
+            markers = (track or {}).get("Markers", {}).get(marker_type)
+            track_markers = self._markers[key] = TrackMarkers(markers) if markers else _no_markers
+        return track_markers
+
+    def marker_at(self, track_list_id: str | None, track_id: str, marker_type: str, offset: int) -> dict | None:
+        return self.markers(track_list_id, track_id, marker_type).at(offset)
+
+    def next_marker(self, track_list_id: str | None, track_id: str, marker_type: str, offset: int) -> dict | None:
+        return self.markers(track_list_id, track_id, marker_type).next(offset)
+
+    def markers_between(self, track_list_id: str | None, track_id: str, marker_type: str, start: int, end: int) -> list[dict]:
+        return self.markers(track_list_id, track_id, marker_type).between(start, end)
+
+    def markers_at_many(self, track_list_id: str | None, track_id: str, marker_type: str, offsets: Iterable[int]) -> list[dict | None]:
+        return self.markers(track_list_id, track_id, marker_type).at_many(offsets)
+
+    def next_markers_many(self, track_list_id: str | None, track_id: str, marker_type: str, offsets: Iterable[int]) -> list[dict | None]:
+        return self.markers(track_list_id, track_id, marker_type).next_many(offsets)
+
+    def now_playing(self, track_list_id: str | None, track_id: str, offset: int) -> dict | None:
+        """The `Track` marker (title and artist) playing at `offset` ms into a track"""
+        return self.marker_at(track_list_id, track_id, "Track", offset)
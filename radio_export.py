@@ -0,0 +1,918 @@
+"""The export pipeline as a library. Importing it does not load lxml or read anything from `/raw`, see `main.py` for the command line"""
+from __future__ import annotations
+from time import perf_counter
+
+from pathlib import Path
+from typing import Iterable
+import json
+import pickle
+
+import instrument
+import xml_utils as xml
+import rel_schema
+from awc_index import AwcMarkerIndex, load_awc_index
+from export_manifest import ExportManifest, fingerprint_inputs
+from hash_utils import joaat, parse_hash_string, format_hash, HashMap
+from resources import get_session, get_trackid_table, Prefetcher
+from cache_utils import read_cache, write_cache, source_cache_path
+from utils import delta_time_ms, save_json, ANSI, script_dir, data_dir, out_dir, cache_dir
+
+dlcname_paths = {'base': ['audio/sfx'], 'dlcbeach': ['dlcpacks/mpbeach'], 'dlcvalentines': ['dlcpacks/mpvalentines'], 'dlcupdate': ['dlcpacks/patchday2bng'], 'dlcbusiness': ['dlcpacks/mpbusiness'], 'dlcbusi2': ['dlcpacks/mpbusiness2'], 'dlcpd03': ['dlcpacks/patchday3ng'], 'dlcthelab': ['dlcpacks/patchday3ng', 'dlcpacks/mpluxe2'], 'dlchipster': ['dlcpacks/mphipster'], 'dlcindependence': ['dlcpacks/mpindependence'], 'dlcpilotschool': ['dlcpacks/mppilot'], 'dlcmplts': ['dlcpacks/mplts'], 'dlcxmas2': ['dlcpacks/mpchristmas2'], 'dlcmpheist': ['dlcpacks/mpheist'], 'dlcluxe': ['dlcpacks/mpluxe'], 'dlcsfx1': ['dlcpacks/mpreplay'], 'dlclowrider': ['dlcpacks/mplowrider'], 'dlchalloween': ['dlcpacks/mphalloween'], 'dlcapartment': ['dlcpacks/mpapartment'], 'dlcxmas3': ['dlcpacks/mpxmas_604490'], 'dlcjanuary2016': ['dlcpacks/mpjanuary2016'], 'mpvalentines2': ['dlcpacks/mpvalentines2'], 'dlclow2': ['dlcpacks/mplowrider2'], 'dlcexec1': ['dlcpacks/mpexecutive'], 'dlcstunt': ['dlcpacks/mpstunt'], 'dlcbiker': ['dlcpacks/mpbiker'], 'dlcimportexport': ['dlcpacks/mpimportexport'], 'dlcspecialraces': ['dlcpacks/mpspecialraces'], 'dlcgunrunning': ['dlcpacks/mpgunrunning'], 'dlcairraces': ['dlcpacks/mpairraces'], 'dlcsmuggler': ['dlcpacks/mpsmuggler'], 'dlcchristmas2017': ['dlcpacks/mpchristmas2017'], 'dlcassault': ['dlcpacks/mpassault'], 'dlcbattle': ['dlcpacks/mpbattle'], 'dlcawxm2018': ['dlcpacks/mpchristmas2018'], 'dlcvinewood': ['dlcpacks/mpvinewood'], 'dlcheist3': ['dlcpacks/mpheist3'], 'dlcsum20': ['dlcpacks/mpsum'], 'dlchei4': ['dlcpacks/mpheist4'], 'dlctuner': ['dlcpacks/mptuner'], 'dlcsecurity': ['dlcpacks/mpsecurity'], 'dlcg9ec': ['dlcpacks/mpg9ec'], 'dlcmpsum2': ['dlcpacks/mpsum2'], 'dlccm2022': ['dlcpacks/mpchristmas3'], 'dlcmp2023_1': ['dlcpacks/mp2023_01'], 'dlc23_2': ['dlcpacks/mp2023_02'], 'dlc24-1': ['dlcpacks/mp2024_01'], 'dlc24-2': ['dlcpacks/mp2024_02']}
+def full_dlc_path(dlcpath: str):
+    dlcpath: Path = Path(dlcpath)
+    if dlcpath.parent.name == "dlcpacks":
+        return f"update/%PLATFORM%/{dlcpath.as_posix()}"
+    return f"%PLATFORM%/{dlcpath.as_posix()}"
+
+def resolve_dlc_path(dlcname: str, file_path: str):
+    if dlcname not in dlcname_paths:
+        return file_path
+    return f"{full_dlc_path(dlcname_paths[dlcname][0])}/{file_path}"
+
+class PendingSound:
+    """Placeholder for a sound ref that can only be solved by exports that ran before the current one"""
+    def __init__(self, sound_id: str):
+        self.sound_id = sound_id
+
+class ExportContext:
+    """State shared by the exports of a single run, in the order they are exported.
+
+    With `deferred`, sound refs that are missing from the current DLC and were not solved earlier in the same export
+    are left as `PendingSound` placeholders, so the export does not depend on any other DLC and can run in a separate process.
+    `resolve_pending_sounds` fills them in afterwards, in export order.
+    `reversed_names` is a nametable of names found by `hash_reverse.py` to stack under the nametables of every DLC, None to only use the DLC's own"""
+    def __init__(self, deferred: bool = False, awc_index: AwcMarkerIndex = None, reversed_names: Path = None):
+        self.deferred = deferred
+        self.reversed_names = reversed_names
+        self.solved_sounds: dict[str, str] = {}
+        self.found_speech_context = {}
+        self.awc_index = awc_index
+        self.awc_files: set[tuple[str, str]] = set() # AWC files looked up, including missing ones
+        self.trackid_table: HashMap | None = None # `trackid.gxt2` of the DLC being exported, looked up once per export
+
+    def get_awc_index(self, tracks_path: Path, cache_dir: Path | None):
+        """Returns the AWC marker index of the run, building it on first use"""
+        if self.awc_index == None or self.awc_index.tracks_path != tracks_path:
+            self.awc_index = load_awc_index(tracks_path, cache_dir)
+        return self.awc_index
+
+    def resolve_pending_sounds(self, export_info: dict, solved_sounds: dict[str, str]):
+        """Solves the placeholders left in `export_info` by a deferred export, then adds the sounds it solved.
+        Returns how each placeholder was resolved (None if it was not)"""
+        external_sounds: dict[str, str | None] = {}
+        for track_list in export_info["TrackLists"].values():
+            for track_info in track_list["Tracks"]:
+                pending = track_info.get("TrackList")
+                if not isinstance(pending, PendingSound):
+                    continue
+
+                sound_id = pending.sound_id
+                external_sounds[sound_id] = self.solved_sounds.get(sound_id)
+                if sound_id in self.solved_sounds:
+                    print(ANSI(f"Sound ref '{ANSI(sound_id).bold()}' is identical to sound in track list '{ANSI(self.solved_sounds[sound_id]).bold()}'").yellow())
+                    track_info["TrackList"] = self.solved_sounds[sound_id]
+                else:
+                    print(ANSI(f"Missing sound ref: '{ANSI(sound_id).bold()}'").yellow())
+                    instrument.count("MissingSoundRefs")
+                    del track_info["TrackList"]
+
+        self.solved_sounds.update(solved_sounds)
+        return external_sounds
+
+def GetStreamingSoundInfo(context: ExportContext, sound_index: xml.TypeIndex, sound_id: str, dlcname: str, tracklist_id: str):
+    if sound_index == None:
+        return {}
+
+    solved_sounds = context.solved_sounds
+    streaming_sound: rel_schema.RelItem = sound_index.get("StreamingSound", sound_id, True)
+    if streaming_sound == None:
+        if sound_id in solved_sounds:
+            equivalent_track_list = solved_sounds[sound_id]
+            print(ANSI(f"Sound ref '{ANSI(sound_id).bold()}' is identical to sound in track list '{ANSI(solved_sounds[sound_id]).bold()}'").yellow())
+            return {"TrackList": equivalent_track_list}
+
+        if context.deferred:
+            return {"TrackList": PendingSound(sound_id)}
+        
+        print(ANSI(f"Missing sound ref: '{ANSI(sound_id).bold()}'").yellow())
+        instrument.count("MissingSoundRefs")
+        return {}
+    else:
+        solved_sounds[sound_id] = tracklist_id
+    
+    duration, child_sounds = rel_schema.streaming_sound(streaming_sound)
+    for child_sound in child_sounds:
+        simple_sound: rel_schema.RelItem = sound_index.get("SimpleSound", child_sound)
+        path = rel_schema.simple_sound_container(simple_sound)
+
+        special_path = Path(path).parent.name.replace("_", "")
+        if special_path != dlcname and special_path in dlcname_paths: # special case where some tracks contain a path that goes outside of current dlc
+            print(ANSI(f"Sound path '{ANSI(path).bold()}' is not part of dlc '{ANSI(dlcname).bold()}'").yellow())
+            return {"DlcPath": full_dlc_path(dlcname_paths[special_path][0]), "Path": path, "Duration": int(duration)}
+        
+        return {"Path": path, "Duration": int(duration)}
+    
+    print(ANSI(f"Sound path not found: {sound_id}").yellow())
+    return {}
+
+speech_full_lookup_hashes = {
+    "DJ_RADIO_01_CLASS_ROCK_TIMEEVENING": "hash_94860776",
+    "DJ_RADIO_03_HIPHOP_NEW_TIMEMORNING": "hash_9D2EBFE7",
+    "DJ_RADIO_03_HIPHOP_NEW_TOTO_NEWS": "hash_BC0D19AE",
+    "DJ_RADIO_16_SILVERLAKE_TOTO_NEWS": "hash_F4B00F49"
+}
+
+speech_context_lookup_hashes = { # some intro speech hashes are calculated incorrectly so we need to correct them temporarily (these are not guaranteed to be correct but do have the right amount of variations and belong to the right container)
+    # RADIO_01_CLASS_ROCK
+    "fortunate_son": "hash_C2B7DAA9",
+    "peace_of_mind": "hash_B5305BDE",
+    # RADIO_02_POP
+    "adult_education": "hash_5E9215DB",
+    "bad_girls": "hash_7197FF12",
+    "circle_in_the_sand": "hash_B3021ACB",
+    "kids": "hash_67DBA112",
+    "me_and_you": "hash_DF70D30D",
+    "tape_loop": "hash_A52104F5",
+    "tape_loop_alt": "hash_A52104F5",
+    "tell_to_my_heart": "hash_9226104B",
+    "the_time_is_now": "hash_4E4B7EC6",
+    "with_every_heartbeat": "hash_740A6C34",
+    "work": "hash_B215308B",
+    # RADIO_03_HIPHOP_NEW
+    "illuminate": "hash_EC3039FB",
+    # RADIO_04_PUNK
+    "lexicon_devil": "hash_73D453B0",
+    # RADIO_09_HIPHOP_OLD
+    "gin_and_juice": "hash_FDEFB15F",
+    "no_more_questions": "hash_F55916E4",
+    "so_you_want_to_be_a_gangster": "hash_228D7ED7",
+    # RADIO_12_REGGAE
+    "grumblin_dub": "hash_6B9A5F84",
+    "nobody_move_get_hurt": "hash_D1165638",
+    # RADIO_15_MOTOWN
+    "hercules": "hash_DD744275",
+    "i_believe_in_miracles": "hash_B33CEB37",
+    # RADIO_16_SILVERLAKE
+    "old_love": "hash_765071BF",
+    # RADIO_17_FUNK
+    # "cant_hold_back": "???" - before it was removed
+    "heart_beat": "hash_B66D01A2",
+    # RADIO_18_90S_ROCK
+    "nine_is_god": "hash_4B5B10F2"
+}
+
+def get_speech_context(context: ExportContext, speech_table: xml.SpeechTable, voice_name: str, context_name: str):
+    if speech_table == None:
+        return {}
+
+    if context_name in speech_context_lookup_hashes:
+        lookup_string = speech_context_lookup_hashes[context_name]
+    elif (voice_name + context_name).upper() in speech_full_lookup_hashes:
+        lookup_string = speech_full_lookup_hashes[(voice_name + context_name).upper()]
+    else:
+        context_name_hash = joaat(context_name)
+        voice_name_hash = joaat(voice_name)
+
+        lookup_hash = context_name_hash
+        if context_name_hash != voice_name_hash:
+            lookup_hash = (context_name_hash ^ voice_name_hash) & 0xFFFFFFFF
+        lookup_string = f"{lookup_hash:08x}"
+
+    speech_context = speech_table.context(lookup_string)
+
+    #DEBUG
+    found_speech_context = context.found_speech_context
+    if not voice_name in found_speech_context:
+        found_speech_context[voice_name] = {"Count": 0, "Variations": 0, "Items": [], "Lost": []}
+
+    if speech_context == None:
+        found_speech_context[voice_name]["Lost"].append([context_name, context_name])
+        return {}
+        
+    found_speech_context[voice_name]["Count"] += 1
+    found_speech_context[voice_name]["Variations"] += speech_context.num_variations
+    found_speech_context[voice_name]["Items"].append([format_hash(joaat(lookup_string)), context_name, voice_name, speech_context.container_index])
+    #DEBUG END
+
+    return {
+        "Variations": speech_context.num_variations,
+        "ContainerPath": speech_context.container_path
+    }
+
+def GetIntroInfo(context: ExportContext, speech_table: xml.SpeechTable, radio_name: str, sound_path: str):
+    if not sound_path:
+        return {}
+    return get_speech_context(context, speech_table, f"DJ_{radio_name}_INTRO", Path(sound_path).name)
+
+def GetStationSpeechInfo(context: ExportContext, speech_table: xml.SpeechTable, radio_name: str, dlcname: str = None):
+    speech_categories = {"GENERAL": [], "TAKEOVER_GENERAL": [], "DD_GENERAL": [], "PL_GENERAL": [],
+                         "TIME": ["MORNING", "AFTERNOON", "EVENING", "NIGHT"],
+                         "TO": ["TO_AD", "TO_NEWS", "TO_WEATHER"]}
+    speech_info = {}
+    for category, context_list in speech_categories.items():
+        voice_name = f"DJ_{radio_name}_{category}"
+
+        for context_name in context_list or [category]:
+            speech_context_info = get_speech_context(context, speech_table, voice_name, context_name)
+            if not speech_context_info:
+                continue
+
+            if dlcname and "ContainerPath" in speech_context_info:
+                speech_context_info["ContainerPath"] = resolve_dlc_path(dlcname, speech_context_info["ContainerPath"])
+
+            if len(context_list) == 0:
+                speech_info[category] = speech_context_info
+            else:
+                if category not in speech_info:
+                    speech_info[category] = {}
+                speech_info[category][context_name] = speech_context_info
+
+    return speech_info
+
+
+def GetAwcMarkers(context: ExportContext, tracklist_id: str, track_path: str, fallback_id: str = None):
+    """Markers of a track from its AWC file in the folder of `tracklist_id`, or of `fallback_id` if it has none
+    (the AWC folders of track lists named by `hash_reverse.py` keep their `hash_XXXXXXXX` name)"""
+    if not track_path:
+        return
+
+    track_name = Path(track_path).name
+    context.awc_files.add((tracklist_id, track_name))
+    awc_info = context.awc_index.get(tracklist_id, track_name)
+    if awc_info == None and fallback_id not in (None, tracklist_id):
+        context.awc_files.add((fallback_id, track_name))
+        awc_info = context.awc_index.get(fallback_id, track_name)
+    if awc_info == None:
+        return
+
+    markers, sample_rate = awc_info
+    if markers == None:
+        return
+
+    return xml.awc_marker_dict(markers, sample_rate, context.trackid_table)
+
+def GetRelMarkers(type_index: xml.TypeIndex, track_id: str, trackid_table: HashMap = None):
+    id_is_hash = parse_hash_string(track_id) # check if track_id is a hash string
+    if id_is_hash: # that means the rtt and rtb will also be a hash string instead
+        rtt_id = format_hash(joaat(f"rtt_{id_is_hash:08x}"))
+        rtb_id = format_hash(joaat(f"rtb_{id_is_hash:08x}"))
+    else:
+        hash_val = joaat(track_id)
+        rtt_id = f"rtt_{hash_val:08x}"
+        rtb_id = f"rtb_{hash_val:08x}"
+
+    rtt = type_index.get("RadioTrackTextIDs", rtt_id)
+    rtb = type_index.get("RadioTrackTextIDs", rtb_id)
+
+    res = {}
+    if rtt != None:
+        res["Track"] = xml.marker_dict_xml(rel_schema.text_id_events(rtt), True, trackid_table)
+    if rtb != None:
+        res["Beat"] = xml.marker_dict_xml(rel_schema.text_id_events(rtb))
+
+    return res
+
+def get_station_flags_list(hex_str: str, station_id: str):
+    station_id = station_id.upper()
+    forced_flags = {
+        "RADIO_03_HIPHOP_NEW": ["USERANDOMIZEDSTRIDESELECTION"],
+        "RADIO_09_HIPHOP_OLD": ["USERANDOMIZEDSTRIDESELECTION"],
+        "RADIO_22_DLC_BATTLE_MIX1_CLUB": ["ISMIXSTATION"],
+        "RADIO_37_MOTOMAMI": ["USERANDOMIZEDSTRIDESELECTION"]
+    }
+    flags = [
+        "NOBACK2BACKMUSIC",
+        "BACK2BACKADS",
+        "PLAYWEATHER",
+        "PLAYNEWS",
+        "SEQUENTIALMUSIC",
+        "IDENTSINSTEADOFADS",
+        "LOCKED",
+        "HIDDEN",
+        "PLAYSUSERSMUSIC",
+        "HASREVERBCHANNEL",
+        "ISMIXSTATION",
+    ]
+
+    AUD_TRISTATE_TRUE = 1
+    value = int(hex_str, 16)
+
+    enabled_flags = []
+    for flag_id, name in enumerate(flags):
+        tristate = (value >> (flag_id * 2)) & 0x03
+        if tristate == AUD_TRISTATE_TRUE:
+            enabled_flags.append(name)
+    
+    if station_id and station_id in forced_flags:
+        for flag in forced_flags[station_id]:
+            if flag in enabled_flags:
+                continue
+            enabled_flags.append(flag)
+
+    return enabled_flags
+
+def dlc_file(dlcname, filename):
+    dlcprefix = "" if dlcname == "base" else f"{dlcname}_"
+    return dlcprefix + filename
+
+REL_RECORD_VERSION = 1 # bump when `rel_schema.item_record` changes, so older cache entries are not read
+
+def load_rel_items(file_path: Path, saved_types: list[str], streaming: bool = True, cache_dir: Path | None = cache_dir) -> list[rel_schema.RelItem]:
+    """Returns the records (see `rel_schema.item_record`) of the items of `saved_types` in a rel.xml file.
+    When `cache_dir` is set, the records are pickled there and reused until the source file changes, without parsing the XML"""
+    cache_path = None
+    if cache_dir != None:
+        cache_path = source_cache_path(cache_dir, file_path, ".relcache", str(REL_RECORD_VERSION), *saved_types)
+        cached = read_cache(cache_path, file_path)
+        if cached != None:
+            try:
+                records = pickle.loads(cached)
+            except Exception: # a corrupt cache file is rebuilt, it must not stop the export
+                records = None
+            if isinstance(records, list):
+                print(f"Loaded '{file_path.name}' items from cache")
+                instrument.count("RelCacheHits")
+                return records
+        instrument.count("RelCacheMisses")
+
+    if streaming:
+        root = xml.stream_rel_items(file_path, saved_types)
+    else:
+        from lxml import etree
+        root = etree.parse(file_path).getroot().find("Items")
+
+    saved_types = set(saved_types)
+    records = [rel_schema.item_record(item) for item in root.iterchildren("Item") if item.get("type") in saved_types]
+
+    if cache_path != None:
+        write_cache(cache_path, file_path, pickle.dumps(records, pickle.HIGHEST_PROTOCOL))
+
+    return records
+
+GAME_ITEM_TYPES = ["RadioTrackTextIDs", "RadioStationTrackList", "RadioStationSettings"]
+SOUND_ITEM_TYPES = ["StreamingSound", "SimpleSound"]
+SPEECH_ITEM_TYPES = ["ByteArray", "Hash", "Container"]
+DLC_NAMETABLES = ["game.dat151.nametable", "sounds.dat54.nametable"]
+
+def prefetch_dlc_inputs(dlcname: str, data_path: Path = data_dir, cache_dir: Path | None = cache_dir, reversed_names: Path = None):
+    """Loads the rel.xml indexes and nametables of a DLC into the session, so its export finds them already loaded.
+    Meant to run on a background thread (see `resources.Prefetcher`) while the previous DLC is processed, its work is timed as `prefetch/<dlc>`.
+    AWC files are not read here: their markers come from the `AwcMarkerIndex` of the run, which is up to date before the first DLC is resolved"""
+    with instrument.span(f"prefetch/{dlcname}"):
+        try_load_data(dlcname, data_path, "game.dat151.rel.xml", GAME_ITEM_TYPES, cache_dir=cache_dir)
+        try_load_data(dlcname, data_path, "sounds.dat54.rel.xml", SOUND_ITEM_TYPES, cache_dir=cache_dir)
+        try_load_data(dlcname, data_path, "speech.dat4.rel.xml", SPEECH_ITEM_TYPES, cache_dir=cache_dir)
+        load_dlc_nametables(dlcname, data_path, cache_dir, reversed_names)
+
+def load_dlc_nametables(dlcname: str, data_path: Path = data_dir, cache_dir: Path | None = cache_dir, reversed_names: Path = None) -> HashMap:
+    """The nametables of a DLC, stacked on the `reversed_names` nametable if one is given, which then only fills in hashes the DLC's own nametables do not name"""
+    nametables = HashMap()
+    if reversed_names != None:
+        nametables.load_table(get_session().nametable(reversed_names, cache_dir))
+    for filename in DLC_NAMETABLES:
+        nametables.load_table(get_session().nametable(data_path / dlc_file(dlcname, filename), cache_dir))
+    return nametables
+
+def dlc_input_files(dlcname: str, data_path: Path) -> list[Path]:
+    """Every file an export of `dlcname` reads, apart from AWC files"""
+    input_files = [data_path / dlc_file(dlcname, filename) for filename in (
+        "game.dat151.rel.xml", "sounds.dat54.rel.xml", "speech.dat4.rel.xml", "game.dat151.nametable", "sounds.dat54.nametable"
+    )]
+    if dlcname == "base":
+        input_files.append(data_path / "speech.dat4.nametable")
+    input_files.append(data_path / "trackid.gxt2")
+    return input_files
+
+def try_load_data(dlcname: str, data_path: Path, filename: str, saved_types: list[str], streaming: bool = True, cache_dir: Path | None = cache_dir):
+    """Loads the items of `saved_types` from a rel.xml file into a `TypeIndex`, kept in the session so it is only built once.
+    With `streaming` the file is parsed incrementally and unused items are dropped while parsing, otherwise the full tree is built"""
+    file_path = data_path / dlc_file(dlcname, filename)
+    if not file_path.is_file():
+        return None, file_path
+
+    def load():
+        nametable = None
+        if filename == "speech.dat4.rel.xml" and dlcname == "base":
+            nametable = get_session().nametable(data_path / "speech.dat4.nametable", cache_dir)
+
+        items = load_rel_items(file_path, saved_types, streaming, cache_dir)
+
+        type_index = xml.TypeIndex(items, saved_types, nametable)
+        print(f"[{type_index.build_time_ms}ms] Indexed {type_index.items_kept}/{type_index.items_seen} items from '{file_path.name}' ({type_index.alias_collisions} alias collisions)")
+        return type_index
+
+    return get_session().get(("rel index", file_path, tuple(saved_types), streaming, cache_dir), load, file_path), file_path
+
+def get_news_tracklists(context: ExportContext, game_index: xml.TypeIndex, sound_index: xml.TypeIndex, nametables: HashMap):
+    tracklists_result = {}
+    for index in range(1, 64):
+        tracklist_id = f"RADIO_NEWS_{index:02d}"
+        tracklist_el = game_index.get("RadioStationTrackList", tracklist_id, True)
+        if tracklist_el == None:
+            continue
+
+        tracklist_info, track_ids = rel_schema.track_list(tracklist_el)
+        tracklist_info["Tracks"] = []
+
+        for track_id in track_ids:
+            track_id_resolved = nametables.resolve_string(track_id)
+
+            track_info = {"Id": track_id_resolved} | GetStreamingSoundInfo(context, sound_index, track_id, "base", tracklist_id)
+            tracklist_info["Tracks"].append(track_info)
+
+        tracklists_result[tracklist_id] = tracklist_info
+
+    if len(tracklists_result) != 0:
+        print(ANSI("\n\nLoaded news track lists").green())
+
+    return tracklists_result
+
+def GetTrackListInfo(context: ExportContext, game_index: xml.TypeIndex, sound_index: xml.TypeIndex, nametables: HashMap, tracklist_id: str, dlcname: str):
+    """Processes a track list without the intros of its station. Returns None if it does not exist"""
+    tracklist_el = game_index.get("RadioStationTrackList", tracklist_id)
+    if tracklist_el == None:
+        return None
+
+    hash_id, tracklist_id = tracklist_id, nametables.resolve_string(tracklist_id)
+    tracklist_fields, track_ids = rel_schema.track_list(tracklist_el)
+    tracklist_info = {"FlagsValue": None} | tracklist_fields
+
+    tracklist_info["FlagsValue"] = tracklist_info["Flags"]
+    del tracklist_info["Flags"]
+
+    collected_tracks = []
+    for track_id in track_ids:
+        track_id_marker = track_id
+        track_id_resolved = nametables.resolve_string(track_id)
+
+        KULT_PREFIX  = "hei4_radio_kult_" # Special handling for Kult FM due to unique bank layout
+        if track_id_marker.startswith(KULT_PREFIX):
+            track_id_marker = "dlc_hei4_music_" + track_id_marker[len(KULT_PREFIX):]
+
+        with instrument.span("sound info"):
+            track_info = {"Id": track_id_resolved} | GetStreamingSoundInfo(context, sound_index, track_id, dlcname, tracklist_id)
+    
+        markers = None
+        if tracklist_info["Category"] in ("0", "2"):
+            with instrument.span("awc markers"):
+                markers = GetAwcMarkers(context, tracklist_id, track_info.get("Path"), hash_id)
+
+        if not markers:
+            with instrument.span("rel markers"):
+                markers = GetRelMarkers(game_index, track_id_marker, context.trackid_table)
+
+        if markers:
+            track_info["Markers"] = markers
+
+        collected_tracks.append(track_info)
+
+    tracklist_info["Tracks"] = collected_tracks
+    return tracklist_info
+
+def AddTrackListIntros(context: ExportContext, speech_table: xml.SpeechTable, tracklist_info: dict, radio_name: str):
+    """Adds the DJ intros of a station to the tracks of a music or advert track list, before their markers"""
+    if tracklist_info["Category"] not in ("0", "2"):
+        return
+
+    for track_info in tracklist_info["Tracks"]:
+        with instrument.span("intro"):
+            intro_info = GetIntroInfo(context, speech_table, radio_name, track_info.get("Path"))
+        if intro_info:
+            markers = track_info.pop("Markers", None)
+            track_info["Intro"] = intro_info
+            if markers:
+                track_info["Markers"] = markers
+
+def build_dlc_radio_info(context: ExportContext, station_list: list[str], dlcname: str = "base", data_path: Path = data_dir, cache_dir: Path | None = cache_dir):
+    """Builds the export of a single DLC, returns None if there is nothing to export"""
+    with instrument.span("load game"):
+        game_index, game_path = try_load_data(
+            dlcname, data_path, "game.dat151.rel.xml", GAME_ITEM_TYPES,
+            cache_dir=cache_dir
+        )
+    if game_index == None:
+        print(ANSI(f"Game data file '{game_path.name}' does not exist, export cancelled").yellow())
+        return None
+    
+    with instrument.span("load sounds"):
+        sound_index, sound_path = try_load_data(
+            dlcname, data_path, "sounds.dat54.rel.xml", SOUND_ITEM_TYPES,
+            cache_dir=cache_dir
+        )
+    if sound_index == None:
+        print(ANSI(f"Sound data file '{sound_path.name}' does not exist, sound path and duration will not be loaded").red())
+
+    with instrument.span("load speech"):
+        speech_index, speech_path = try_load_data(
+            dlcname, data_path, "speech.dat4.rel.xml", SPEECH_ITEM_TYPES,
+            cache_dir=cache_dir
+        )
+    speech_table = None
+    if speech_index == None:
+        print(ANSI(f"Speech data file '{speech_path.name}' does not exist, dj speeches will not be loaded").red())
+    else:
+        with instrument.span("speech table"):
+            speech_table = xml.SpeechTable(speech_index)
+        print(f"[{speech_table.build_time_ms}ms] Decoded {len(speech_table)} speech contexts from '{speech_path.name}'")
+
+
+    with instrument.span("awc index"):
+        context.get_awc_index(data_path / "tracks", cache_dir)
+    context.trackid_table = get_trackid_table(data_path)
+
+    with instrument.span("load nametables"):
+        nametables = load_dlc_nametables(dlcname, data_path, cache_dir, context.reversed_names)
+
+    time_start = perf_counter()
+    with instrument.span("news tracklists"):
+        news_tracklists = get_news_tracklists(context, game_index, sound_index, nametables)
+    export_track_info = {"Stations": {}, "TrackLists": news_tracklists}
+    unique_track_lists: dict[str, str] = {} # track list -> last station that uses it (its DJ intros are added), in order of first use
+
+    with instrument.span("stations"):
+        for station_id in station_list:
+            station_time_start = perf_counter()
+
+            station_el: rel_schema.RelItem = game_index.get("RadioStationSettings", station_id, True)
+            if station_el == None:
+                continue
+
+            station_fields, track_list_ids = rel_schema.station_settings(station_el)
+            station_track_lists = []
+            for track_list_id in track_list_ids:
+                station_track_lists.append(nametables.resolve_string(track_list_id))
+                unique_track_lists[track_list_id] = station_id
+        
+            station_info = {"FlagsValue": None, "Flags": []} | station_fields
+            station_info["FlagsValue"] = station_info["Flags"]
+            station_info["Flags"] = get_station_flags_list(station_info["FlagsValue"], station_id)
+
+            station_info["TrackLists"] = station_track_lists
+
+            with instrument.span("speech"):
+                speech_info = GetStationSpeechInfo(context, speech_table, station_info["RadioName"] or station_id, dlcname)
+            if speech_info:
+                station_info["Speech"] = speech_info
+
+            export_track_info["Stations"][station_id] = station_info
+
+            print(f"[{delta_time_ms(station_time_start)}ms] Processed station '{station_id}' with {len(station_track_lists)} track lists")
+
+    print(f"\n[{delta_time_ms(time_start)}ms] Processed all stations for '{dlcname}'")
+    time_start = perf_counter()
+
+    if len(export_track_info["Stations"]) == 0:
+        print(ANSI(f"No stations exist for '{dlcname}', export cancelled").red())
+        return None
+
+    with instrument.span("tracklists"):
+        for tracklist_id, station_id in unique_track_lists.items():
+            tracklist_info = GetTrackListInfo(context, game_index, sound_index, nametables, tracklist_id, dlcname)
+            if tracklist_info == None:
+                continue
+
+            radio_name = export_track_info["Stations"][station_id].get("RadioName") or station_id
+            AddTrackListIntros(context, speech_table, tracklist_info, radio_name)
+            export_track_info["TrackLists"][nametables.resolve_string(tracklist_id)] = tracklist_info
+
+    print(f"[{delta_time_ms(time_start)}ms] Processed all track lists for '{dlcname}' ({len(unique_track_lists)} unique)")
+    return export_track_info
+
+def export_dlc_radio_info(station_list: list[str], dlcname: str = "base", data_path: Path = data_dir, out_path: Path = out_dir, cache_dir: Path | None = cache_dir, context: ExportContext = None):
+    """Exports a single DLC to `out_path`. Pass the same `context` to consecutive calls to share solved sounds between them"""
+    with instrument.span(dlcname):
+        export_track_info = build_dlc_radio_info(context or ExportContext(), station_list, dlcname, data_path, cache_dir)
+    if export_track_info == None:
+        return False
+
+    save_json(out_path / f"{dlcname}_info.json", export_track_info)
+    return True
+
+def _export_dlc_worker(station_list: list[str], dlcname: str, data_path: Path, cache_dir: Path | None, awc_index: AwcMarkerIndex, instrument_options: dict = None,
+                       reversed_names: Path = None):
+    """Builds a DLC export in deferred mode. With `instrument_options` (when running in a worker process),
+    the spans of the export are collected separately and returned as a report for the parent to add.
+    The fingerprints of the inputs are taken before anything is read, for the manifest"""
+    if instrument_options != None:
+        instrument.start(**instrument_options)
+    inputs = fingerprint_inputs(data_path, dlc_input_files(dlcname, data_path))
+
+    print(ANSI(f"\n\nLoading radio dlc: '{ANSI(dlcname).bold()}'").green())
+    context = ExportContext(deferred=True, awc_index=awc_index, reversed_names=reversed_names)
+    with instrument.span(dlcname):
+        export_track_info = build_dlc_radio_info(context, station_list, dlcname, data_path, cache_dir)
+
+    report = instrument.stop(worker=True) if instrument_options != None else None
+    return export_track_info, context.solved_sounds, context.awc_files, inputs, report
+
+@instrument.traced("export")
+def export_all_radio_info(station_list: list[str], dlc_names: list[str], data_path: Path = data_dir, out_path: Path = out_dir, cache_dir: Path | None = cache_dir,
+                          jobs: int = 1, manifest: ExportManifest = None, selected: list[str] = None, prefetch: int = 1, reversed_names: Path = None):
+    """Exports every DLC in `dlc_names`, in order. With `jobs` other than 1 the DLCs are exported in a process pool
+    (`None` uses every core), the output is identical to a serial run.
+    A serial run loads the rel.xml files and nametables of the next `prefetch` DLCs on a background thread while the current one is processed.
+    With a `manifest`, only DLCs whose inputs changed since the last export are rebuilt.
+    With `selected`, only those DLCs are exported and the sound refs solved by the DLCs before them are taken from the `manifest`.
+    With `reversed_names`, the names found by `hash_reverse.py` in that nametable fill in hashes the nametables of a DLC do not name.
+    Returns the exports that were written by DLC name, which can be passed to `merge_exports` to skip reading them back"""
+    exported = {}
+    if selected != None:
+        dlc_names = _dlcs_up_to(dlc_names, selected)
+    elif jobs == 1 and manifest == None:
+        context = ExportContext(reversed_names=reversed_names)
+        for dlc in Prefetcher(dlc_names, lambda dlc: prefetch_dlc_inputs(dlc, data_path, cache_dir, reversed_names), prefetch):
+            print(ANSI(f"\n\nLoading radio dlc: '{ANSI(dlc).bold()}'").green())
+            with instrument.span(dlc):
+                export_track_info = build_dlc_radio_info(context, station_list, dlc, data_path, cache_dir)
+            if export_track_info != None:
+                save_json(out_path / f"{dlc}_info.json", export_track_info)
+                exported[dlc] = export_track_info
+        return exported
+
+    context = ExportContext(reversed_names=reversed_names)
+    awc_index = context.get_awc_index(data_path / "tracks", cache_dir) # built once, shared with every worker
+
+    stale = dlc_names
+    if selected != None:
+        stale = [dlc for dlc in dlc_names if dlc in selected]
+    elif manifest != None:
+        stale = [dlc for dlc in dlc_names if not manifest.is_current(dlc, data_path, out_path / f"{dlc}_info.json", awc_index)]
+        print(ANSI(f"{len(stale)} of {len(dlc_names)} DLC(s) have changed inputs").green())
+
+    results = {}
+    if jobs == 1:
+        prefetched = Prefetcher(stale, lambda dlc: prefetch_dlc_inputs(dlc, data_path, cache_dir, reversed_names), prefetch)
+        results = {dlc: _export_dlc_worker(station_list, dlc, data_path, cache_dir, awc_index, reversed_names=reversed_names) for dlc in prefetched}
+    elif stale:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {dlc: executor.submit(_export_dlc_worker, station_list, dlc, data_path, cache_dir, awc_index, instrument.options(), reversed_names) for dlc in stale}
+            results = {dlc: future.result() for dlc, future in futures.items()}
+
+    for dlc in dlc_names:
+        if dlc not in results:
+            if selected != None:
+                _reuse_solved_sounds(context, manifest, dlc)
+                continue
+            if manifest.external_sounds_match(dlc, context.solved_sounds):
+                context.solved_sounds.update(manifest.solved_sounds(dlc))
+                continue
+            # an earlier DLC changed a sound ref this one relies on
+            results[dlc] = _export_dlc_worker(station_list, dlc, data_path, cache_dir, awc_index, reversed_names=reversed_names)
+
+        export_track_info, solved_sounds, awc_files, inputs, report = results[dlc]
+        instrument.graft(report)
+        out_file = out_path / f"{dlc}_info.json"
+
+        external_sounds = {}
+        if export_track_info != None:
+            external_sounds = context.resolve_pending_sounds(export_track_info, solved_sounds)
+            save_json(out_file, export_track_info)
+            exported[dlc] = export_track_info
+        else: # a cancelled export may still have solved news sounds
+            context.solved_sounds.update(solved_sounds)
+
+        if manifest != None:
+            manifest.record(dlc, inputs, out_file, awc_index, awc_files, external_sounds, solved_sounds, export_track_info)
+
+    if manifest != None:
+        manifest.save()
+
+    return exported
+
+def _dlcs_up_to(dlc_names: list[str], selected: list[str]) -> list[str]:
+    """The DLCs in `dlc_names` up to the last one in `selected`, the ones after it cannot affect the selected exports"""
+    last = max((index for index, dlc in enumerate(dlc_names) if dlc in selected), default=-1)
+    return dlc_names[:last + 1]
+
+def _reuse_solved_sounds(context: ExportContext, manifest: ExportManifest | None, dlcname: str):
+    """Adds the sound refs solved by the last full export of a DLC that is not exported again"""
+    if manifest != None and dlcname in manifest.dlcs:
+        context.solved_sounds.update(manifest.solved_sounds(dlcname))
+    else:
+        print(ANSI(f"Sound refs solved by '{ANSI(dlcname).bold()}' are unknown until it is exported in full, tracks that rely on them will miss their track list").yellow())
+
+@instrument.traced("export")
+def refresh_stations(station_ids: list[str], dlc_names: list[str], selected: list[str] = None, data_path: Path = data_dir, out_path: Path = out_dir,
+                     cache_dir: Path | None = cache_dir, manifest: ExportManifest = None, reversed_names: Path = None):
+    """Exports only `station_ids` and patches them and their track lists into the existing exports of the `selected` DLCs (every DLC if None).
+    Sound refs solved by the other DLCs are taken from the `manifest`, which is not updated: its next run exports the patched DLCs in full again.
+    `reversed_names` is passed on as in `export_all_radio_info`. Returns the patched exports by DLC name"""
+    exported = {}
+    context = ExportContext(reversed_names=reversed_names)
+    context.get_awc_index(data_path / "tracks", cache_dir)
+
+    for dlc in _dlcs_up_to(dlc_names, selected) if selected != None else dlc_names:
+        if selected != None and dlc not in selected:
+            _reuse_solved_sounds(context, manifest, dlc)
+            continue
+
+        print(ANSI(f"\n\nLoading radio dlc: '{ANSI(dlc).bold()}'").green())
+        with instrument.span(dlc):
+            export_track_info = build_dlc_radio_info(context, station_ids, dlc, data_path, cache_dir)
+        if manifest != None and dlc in manifest.dlcs: # sounds solved by the stations that were not exported
+            context.solved_sounds.update(manifest.solved_sounds(dlc))
+        if export_track_info == None:
+            continue
+
+        out_file = out_path / f"{dlc}_info.json"
+        export = _read_export(out_file) if out_file.is_file() else {"Stations": {}, "TrackLists": {}}
+        export["Stations"].update(export_track_info["Stations"])
+        export["TrackLists"].update(export_track_info["TrackLists"])
+
+        save_json(out_file, export)
+        exported[dlc] = export
+        print(ANSI(f"Updated {len(export_track_info['Stations'])} station(s) in '{ANSI(out_file.name).bold()}'").green())
+
+    return exported
+
+class MergeProvenance:
+    """Records which DLC set each merged value, keyed by field path (e.g. `("Stations", id, "Genre")`).
+    Values are indexes into `sources`. Fields that a later DLC also tried to set are kept in `overrides`, which the conflict report is built from"""
+    def __init__(self):
+        self.sources: list[str] = []
+        self.fields: dict[tuple[str, ...], int] = {}
+        self.overrides: dict[tuple[str, ...], list[int]] = {}
+
+    def add_source(self, dlcname: str) -> int:
+        self.sources.append(dlcname)
+        return len(self.sources) - 1
+
+    def set(self, path: tuple[str, ...], source: int):
+        self.fields[path] = source
+
+    def override(self, path: tuple[str, ...], source: int, replaced: bool = True):
+        """Records a conflicting value from `source`, `replaced` if it became the merged value"""
+        self.overrides.setdefault(path, []).append(source)
+        if replaced:
+            self.fields[path] = source
+
+    def source_of(self, *path: str) -> str | None:
+        source = self.fields.get(path)
+        return None if source == None else self.sources[source]
+
+    def conflicts(self) -> list[tuple[list[str], str]]:
+        """Conflicting fields with the export file they came from, in merge order"""
+        conflicts = [(source, list(path)) for path, sources in self.overrides.items() for source in sources]
+        conflicts.sort(key=lambda conflict: conflict[0])
+        return [(path, f"{self.sources[source]}_info.json") for source, path in conflicts]
+
+def merge_export_data(exports: Iterable[tuple[str, dict]], affected: dict[str, set[str]] = None) -> tuple[dict, MergeProvenance]:
+    """Merges exports given as `(dlcname, export)` in release order, without modifying them.
+    Only the ids in `affected` are merged if it is set"""
+    merged_data = {"Stations": {}, "TrackLists": {}}
+    provenance = MergeProvenance()
+    station_track_lists: dict[str, dict[str, None]] = {} # ordered sets, turned back into lists at the end
+
+    for dlcname, data in exports:
+        source = provenance.add_source(dlcname)
+
+        for station_id, station in data.get("Stations", {}).items():
+            if affected != None and station_id not in affected["Stations"]:
+                continue
+
+            merged_station = merged_data["Stations"].setdefault(station_id, {})
+            for property, value in station.items():
+                path = ("Stations", station_id, property)
+
+                if property == "TrackLists":
+                    track_lists = station_track_lists.setdefault(station_id, {})
+                    merged_station[property] = track_lists
+                    for track_list in value:
+                        if track_list not in track_lists:
+                            track_lists[track_list] = None
+                            provenance.set(path + (track_list,), source)
+                    continue
+
+                if property not in merged_station:
+                    merged_station[property] = dict(value) if property == "Speech" else value
+                    provenance.set(path, source)
+                    continue
+
+                if property == "Speech":
+                    for category_name, category in value.items():
+                        if category_name in merged_station[property]:
+                            provenance.override(path + (category_name,), source)
+                        else:
+                            provenance.set(path + (category_name,), source)
+                        merged_station[property][category_name] = category
+                    continue
+
+                if merged_station[property] != value:
+                    merged_station[property] = value
+                    provenance.override(path, source)
+
+        for tracklist_id, track_list in data.get("TrackLists", {}).items():
+            if affected != None and tracklist_id not in affected["TrackLists"]:
+                continue
+
+            path = ("TrackLists", tracklist_id)
+            if tracklist_id in merged_data["TrackLists"]:
+                provenance.override(path, source, replaced=False)
+                continue
+
+            if dlcname in dlcname_paths:
+                track_list = {"DlcPath": full_dlc_path(dlcname_paths[dlcname][0])} | track_list
+            else:
+                print(ANSI(f"Could not find DlcPath for dlc '{ANSI(dlcname).bold()}'").red())
+            merged_data["TrackLists"][tracklist_id] = track_list
+            provenance.set(path, source)
+
+    for station_id, track_lists in station_track_lists.items():
+        merged_data["Stations"][station_id]["TrackLists"] = list(track_lists)
+
+    return merged_data, provenance
+
+def _read_export(dlc_path: Path) -> dict:
+    with open(dlc_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_binary_export(file_path: Path, export: dict):
+    from marker_format import write_marker_export # only needed with `binary`
+
+    time_start = perf_counter()
+    write_marker_export(file_path, export)
+    print(f"[{delta_time_ms(time_start)}ms] Wrote binary export '{ANSI(file_path.name).bold()}' ({file_path.stat().st_size} bytes)")
+
+def _write_sharded_export(out_path: Path, export: dict):
+    from sharded_export import write_sharded_export # only needed with `sharded`
+    write_sharded_export(out_path, export)
+
+@instrument.traced("merge")
+def merge_exports(dlc_names: list[str] = None, manifest: ExportManifest = None, exports: dict[str, dict] = None, binary: bool = False, sharded: bool = False):
+    """Merges the exports of `dlc_names` (every export if None) into `info_merged.json`.
+    Exports found in `exports` are used directly instead of being read back from disk.
+    With the `manifest` of an incremental export, only the stations and track lists of DLCs that changed are merged again.
+    With `binary`, the merged data is also written as `info_merged.bin` (see `marker_format.py`).
+    With `sharded`, it is also written as one file per station and tracklist into `info_merged/` (see `sharded_export.py`).
+    Returns the merged data, the conflicts and the provenance of every merged field"""
+    merged_out_path = script_dir / "info_merged.json"
+    binary_out_path = merged_out_path.with_suffix(".bin")
+    sharded_out_path = merged_out_path.with_suffix("")
+    exports = exports or {}
+
+    affected = None
+    previous_data = None
+    if manifest != None and dlc_names != None and merged_out_path.is_file():
+        if not manifest.changed:
+            print(ANSI(f"No exports changed, '{ANSI(merged_out_path.name).bold()}' is up to date").green())
+            merged_data = _read_export(merged_out_path)
+            if binary and (not binary_out_path.is_file() or binary_out_path.stat().st_mtime_ns < merged_out_path.stat().st_mtime_ns):
+                _write_binary_export(binary_out_path, merged_data)
+            if sharded:
+                _write_sharded_export(sharded_out_path, merged_data) # only rewrites shards that are missing or out of date
+            return merged_data, [], MergeProvenance()
+
+        previous_data = _read_export(merged_out_path)
+        affected = manifest.affected
+
+    dlc_paths: list[tuple[str, Path]] = []
+    if dlc_names == None:
+        dlc_paths = [(path.name.rsplit("_", 1)[0], path) for path in out_dir.rglob("*_info.json")]
+    else:
+        for dlc in dlc_names:
+            dlc_path = out_dir / f"{dlc}_info.json"
+            if dlc not in exports and not dlc_path.is_file():
+                print(ANSI(f"Could not merge with export '{ANSI(dlc_path.name).bold()}', because it does not exist").red())
+                continue
+            if affected != None and not manifest.contains_any(dlc, affected):
+                continue
+            dlc_paths.append((dlc, dlc_path))
+
+    # exports that are not in memory are read one at a time while merging
+    export_data = ((dlc, exports[dlc] if dlc in exports else _read_export(path)) for dlc, path in dlc_paths)
+    merged_data, provenance = merge_export_data(export_data, affected)
+
+    if previous_data != None:
+        # unaffected entries are kept from the previous merge, in the order a full merge would produce
+        for section in merged_data:
+            order = manifest.merge_order(dlc_names, section)
+            if order == None or any(id not in affected[section] and id not in previous_data[section] for id in order):
+                print(ANSI("Previous merge is out of sync with the export manifest, merging everything").yellow())
+                return merge_exports(dlc_names, exports=exports, binary=binary, sharded=sharded)
+
+            merged_data[section] = {id: merged_data[section][id] if id in affected[section] else previous_data[section][id] for id in order if id in merged_data[section] or id not in affected[section]}
+
+    print(ANSI(f"Merged processed files into '{ANSI(merged_out_path.name).bold()}'").green())
+    save_json(merged_out_path, merged_data)
+    if binary:
+        _write_binary_export(binary_out_path, merged_data)
+    if sharded:
+        _write_sharded_export(sharded_out_path, merged_data)
+
+    conflicts = provenance.conflicts()
+    if conflicts:
+        print(ANSI(f"\n{len(conflicts)} conflict(s) detected during merge").red())
+        for section, source in conflicts:
+            print(f"- '{ANSI('/'.join(section)).bold()}' (from file '{source}')")
+
+    return merged_data, conflicts, provenance
+
+
+# Ordered list of DLCs that contain .dat151 or .dat54 metadata files.
+# The order reflects their chronological release, with 'base' representing base game content.
+all_dlc = ['base', 'dlcbeach', 'dlcvalentines', 'dlcbusiness', 'dlcbusi2', 'dlcpd03', 'dlcthelab', 'dlchipster', 'dlcindependence', 'dlcpilotschool', 'dlcmplts', 'dlcxmas2', 'dlcmpheist', 'dlcluxe', 'dlcthelab', 'dlcsfx1', 'dlclowrider', 'dlchalloween', 'dlcapartment', 'dlcxmas3', 'dlcjanuary2016', 'mpvalentines2', 'dlclow2', 'dlcexec1', 'dlcstunt', 'dlcbiker', 'dlcimportexport', 'dlcspecialraces', 'dlcgunrunning', 'dlcairraces', 'dlcsmuggler', 'dlcchristmas2017', 'dlcassault', 'dlcbattle', 'dlcawxm2018', 'dlcvinewood', 'dlcheist3', 'dlcsum20', 'dlchei4', 'dlctuner', 'dlcsecurity', 'dlcg9ec', 'dlcmpsum2', 'dlccm2022', 'dlcmp2023_1', 'dlc23_2', 'dlc24-1', 'dlc24-2']
+# Subset of the above DLCs that contain radio station metadata
+all_radio_dlc = ['base', 'dlcpd03', 'dlcthelab', 'dlcchristmas2017', 'dlcbattle', 'dlcheist3', 'dlcsum20', 'dlchei4', 'dlctuner', 'dlcsecurity', 'dlcmpsum2', 'dlc23_2', 'dlc24-1']
+# List of all known radio station identifiers (excluding ones not shown on radio wheel)
+all_stations = ["radio_01_class_rock", "radio_02_pop", "radio_03_hiphop_new", "radio_04_punk", "radio_05_talk_01", "radio_06_country", "radio_07_dance_01", "radio_08_mexican", "radio_09_hiphop_old", "radio_11_talk_02", "radio_12_reggae", "radio_13_jazz", "radio_14_dance_02", "radio_15_motown", "radio_16_silverlake", "radio_17_funk", "radio_18_90s_rock", "radio_19_user", "radio_20_thelab", "radio_21_dlc_xm17", "radio_22_dlc_battle_mix1_radio", "radio_23_dlc_xm19_radio", "radio_27_dlc_prhei4", "radio_34_dlc_hei4_kult", "radio_35_dlc_hei4_mlr", "radio_36_audioplayer", "radio_37_motomami"]
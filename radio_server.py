@@ -0,0 +1,262 @@
+"""Local HTTP server for an export (`info_merged.json`, `info_merged.bin` or a single `processed/*_info.json`), answering from an in-memory index
+
+    python radio_server.py --port 8080
+    curl localhost:8080/stations/radio_01_class_rock
+    curl "localhost:8080/tracks/<track id>/markers?from=60000&to=120000"
+
+    /stations                  every station with its RadioName, Genre and tracklists
+    /stations/<id>             a station
+    /tracklists/<id>           a tracklist with its tracks
+    /tracks/<id>/markers       the markers of a track by type. `from`/`to` (ms) keep the markers with `from <= Offset < to`,
+                               `tracklist` picks the tracklist of a track that is in several (the first one otherwise)
+
+Fixed responses are serialized, gzip-compressed and tagged with an ETag once when the export is loaded. The export is checked for changes
+every few seconds, a new index is built next to the current one and swapped in once it is complete, so a request never sees a partial export"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Event, Thread
+from time import perf_counter
+from urllib.parse import parse_qs, unquote
+
+from radio_database import RadioDatabase
+from utils import delta_time_ms, ANSI, script_dir
+
+GZIP_LEVEL = 6
+GZIP_MIN_SIZE = 512 # smaller bodies are sent as they are, compressing them saves nothing
+MAX_OFFSET = 2 ** 63 - 1
+
+class Response:
+    """A JSON body with its gzip-compressed version (None if too small to be worth it) and ETag"""
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, data: object):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, GZIP_LEVEL, mtime=0) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=8).hexdigest()}"'
+
+def _fingerprint(file_path: Path) -> tuple[int, int]:
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether an `Accept-Encoding` header allows gzip: `gzip` (or `x-gzip`) with a q-value above 0, or else `*` with one.
+    `gzip;q=0` refuses it even if `*` is accepted"""
+    gzip_q = any_q = None
+    for coding in (accept_encoding or "").split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = name.lower()
+        if name in ("gzip", "x-gzip"):
+            gzip_q = q if gzip_q == None else max(gzip_q, q)
+        elif name == "*":
+            any_q = q
+    if gzip_q != None:
+        return gzip_q > 0
+    return any_q != None and any_q > 0
+
+class ServerIndex:
+    """Every fixed response of an export by path, and the database that marker ranges are queried from"""
+    def __init__(self, file_path: Path | str):
+        time_start = perf_counter()
+        self.file_path = Path(file_path)
+        self.fingerprint = _fingerprint(self.file_path)
+        self.database = RadioDatabase(self.file_path)
+
+        data = self.database.data
+        stations = data.get("Stations", {})
+        track_lists = data.get("TrackLists", {})
+
+        self.routes: dict[str, Response] = {}
+        self.routes["/stations"] = Response([
+            {"Id": station_id, "RadioName": station.get("RadioName"), "Genre": station.get("Genre"), "TrackLists": station.get("TrackLists", [])}
+            for station_id, station in stations.items()
+        ])
+        for station_id, station in stations.items():
+            self.routes[f"/stations/{station_id}"] = Response(station)
+        for track_list_id, track_list in track_lists.items():
+            self.routes[f"/tracklists/{track_list_id}"] = Response(track_list)
+
+        track_ids = dict.fromkeys(track["Id"] for track_list in track_lists.values() for track in track_list.get("Tracks", []))
+        for track_id in track_ids:
+            self.routes[f"/tracks/{track_id}/markers"] = self.markers_response(track_id)
+
+        self.load_time_ms = delta_time_ms(time_start)
+
+    def markers_response(self, track_id: str, track_list_id: str = None, start: int = 0, end: int = MAX_OFFSET) -> Response | None:
+        """Markers of a track with `start <= Offset < end`, None if the track is not in the export (or not in `track_list_id`)"""
+        database = self.database
+        if track_list_id == None:
+            track_lists = database.track_lists_of(track_id)
+            if not track_lists:
+                return None
+            track_list_id = track_lists[0]
+
+        track = database.track(track_list_id, track_id)
+        if track == None:
+            return None
+
+        markers = {}
+        for marker_type in track.get("Markers", {}):
+            markers[marker_type] = database.markers_between(track_list_id, track_id, marker_type, start, end)
+        return Response({"Id": track_id, "TrackList": track_list_id, "Markers": markers})
+
+    def marker_range(self, track_id: str, query: str) -> Response | None:
+        """Response to `/tracks/<id>/markers?...`, raises ValueError for an invalid query"""
+        params = parse_qs(query)
+        try:
+            start = int(params["from"][0]) if "from" in params else 0
+            end = int(params["to"][0]) if "to" in params else MAX_OFFSET
+        except ValueError:
+            raise ValueError("'from' and 'to' must be integer offsets in ms")
+        track_list_id = params["tracklist"][0] if "tracklist" in params else None
+        return self.markers_response(track_id, track_list_id, start, end)
+
+    def get(self, path: str, query: str) -> Response | None:
+        path = unquote(path)
+        if not query:
+            return self.routes.get(path)
+
+        parts = path.split("/")
+        if len(parts) == 4 and parts[1] == "tracks" and parts[3] == "markers":
+            return self.marker_range(parts[2], query)
+        return self.routes.get(path) # other routes ignore their query
+
+class RadioService:
+    """The index of an export, rebuilt and swapped in whole when the file changes"""
+    def __init__(self, file_path: Path | str, poll_interval: float = 2.0):
+        self.file_path = Path(file_path)
+        self.poll_interval = poll_interval
+        self.index = ServerIndex(self.file_path)
+        self.reloads = 0
+        self._stop = Event()
+
+    def reload_if_changed(self) -> bool:
+        """Builds a new index if the export changed. A failed load (e.g. a file that is still being written) keeps the current index"""
+        try:
+            if _fingerprint(self.file_path) == self.index.fingerprint:
+                return False
+            index = ServerIndex(self.file_path)
+        except Exception as e:
+            print(ANSI(f"Could not reload '{ANSI(self.file_path.name).bold()}', still serving the previous export ({e})").yellow())
+            return False
+
+        self.index = index # requests that already started keep the index they took
+        self.reloads += 1
+        print(ANSI(f"[{index.load_time_ms}ms] Reloaded '{ANSI(self.file_path.name).bold()}' ({len(index.routes)} responses)").green())
+        return True
+
+    def watch(self):
+        """Checks the export for changes every `poll_interval` seconds on a background thread"""
+        def poll():
+            while not self._stop.wait(self.poll_interval):
+                self.reload_if_changed()
+        Thread(target=poll, name="export watcher", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+class RadioRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keeps connections open between requests
+    disable_nagle_algorithm = True
+    server: "RadioServer"
+
+    def do_GET(self):
+        self.send_json(send_body=True)
+
+    def do_HEAD(self):
+        """The headers a GET would send (Content-Length included), without the body"""
+        self.send_json(send_body=False)
+
+    def send_json(self, send_body: bool):
+        index = self.server.service.index
+        path, _, query = self.path.partition("?")
+        try:
+            response = index.get(path, query)
+        except ValueError as e:
+            return self.send_json_error(400, str(e), send_body)
+        if response == None:
+            return self.send_json_error(404, f"'{unquote(path)}' was not found", send_body)
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match != None and (if_none_match.strip() == "*" or response.etag in [etag.strip() for etag in if_none_match.split(",")]):
+            self.send_response(304)
+            self.send_header("ETag", response.etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        body = response.body
+        use_gzip = response.gzipped != None and accepts_gzip(self.headers.get("Accept-Encoding"))
+        if use_gzip:
+            body = response.gzipped
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", response.etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_json_error(self, status: int, message: str, send_body: bool = True):
+        body = json.dumps({"Error": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class RadioServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service: RadioService, host: str = "127.0.0.1", port: int = 8080, verbose: bool = False):
+        self.service = service
+        self.verbose = verbose
+        super().__init__((host, port), RadioRequestHandler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves stations, tracklists and track markers of an export over HTTP")
+    parser.add_argument("--export", type=Path, default=script_dir / "info_merged.json", help="export to serve, .json or .bin (default: info_merged.json)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--poll", type=float, default=2.0, metavar="SECONDS", help="how often the export is checked for changes, 0 to never reload")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    service = RadioService(args.export, args.poll)
+    print(f"[{service.index.load_time_ms}ms] Loaded '{args.export.name}' ({len(service.index.routes)} responses)")
+    if args.poll > 0:
+        service.watch()
+
+    server = RadioServer(service, args.host, args.port, args.verbose)
+    print(ANSI(f"Serving on http://{args.host}:{server.server_address[1]}").green())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Records of the rel.xml item types the export reads, holding only the fields it uses.
+
+`item_record` turns an `Item` element into a `RelItem` when the file is loaded, the accessors below read the records.
+Records are plain Python objects, so they are what the rel.xml cache stores and a cache hit does not need lxml at all.
+Leaf fields are read in a single walk over the children of an item, nested lists go through precompiled `etree.XPath` objects.
+The XPaths are compiled on first use, so importing this module does not load lxml"""
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from lxml.etree import _Element
+
+class CompiledXPath:
+    """An `etree.XPath` compiled the first time it is called, returning plain strings instead of smart strings"""
+    __slots__ = ("expression", "compiled")
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.compiled = None
+
+    def __call__(self, elem: _Element) -> list:
+        if self.compiled == None:
+            from lxml import etree
+            self.compiled = etree.XPath(self.expression, smart_strings=False)
+        return self.compiled(elem)
+
+STATION_TRACK_LISTS = CompiledXPath("TrackList/Item/text()")
+TRACK_LIST_SOUND_REFS = CompiledXPath("Tracks/Item/SoundRef/text()")
+CHILD_SOUNDS = CompiledXPath("ChildSounds/Item/text()")
+TEXT_ID_EVENTS = CompiledXPath("Events/Item")
+
+STATION_FIELDS = frozenset(("Flags", "RadioName", "Genre", "AmbientRadioVol"))
+TRACK_LIST_FIELDS = frozenset(("Flags", "Category"))
+
+def _leaf_value(elem: _Element) -> str | dict | None:
+    """Value of a field the way `xml_utils.to_dict` reads a child without descending further:
+    its text, or its only attribute (`<Flags value="0x..." />`), None if it has neither"""
+    text = elem.text
+    if text != None and not text.isspace():
+        if not elem.attrib and not len(elem):
+            return text.strip()
+    else:
+        text = None
+
+    fields = dict(elem.attrib)
+    if text:
+        fields["Text"] = text
+    if len(fields) == 1:
+        return next(iter(fields.values()))
+    return fields or None
+
+def _fields(item: _Element, names: frozenset[str]) -> dict:
+    """`names` children of an item in document order, repeated children become a list"""
+    fields = {}
+    for child in item:
+        tag = child.tag
+        if tag not in names:
+            continue
+
+        value = _leaf_value(child)
+        if value == None:
+            continue
+        if tag in fields:
+            if type(fields[tag]) is list:
+                fields[tag].append(value)
+            else:
+                fields[tag] = [fields[tag], value]
+            continue
+        fields[tag] = value
+    return fields
+
+def _station_settings(item: _Element) -> tuple[dict, list[str]]:
+    return _fields(item, STATION_FIELDS), STATION_TRACK_LISTS(item)
+
+def _track_list(item: _Element) -> tuple[dict, list[str]]:
+    return _fields(item, TRACK_LIST_FIELDS), TRACK_LIST_SOUND_REFS(item)
+
+def _streaming_sound(item: _Element) -> tuple[str | None, list[str]]:
+    duration = None
+    for child in item:
+        if child.tag == "Duration":
+            duration = child.get("value")
+            break
+    return duration, CHILD_SOUNDS(item)
+
+def _child_text(item: _Element, tag: str) -> str | None:
+    for child in item:
+        if child.tag == tag:
+            return child.text
+    return None
+
+def _text_id_events(item: _Element) -> list[tuple[str, str]]:
+    events = []
+    for event in TEXT_ID_EVENTS(item):
+        offset = text_id = None
+        for child in event:
+            if child.tag == "OffsetMs":
+                offset = child.get("value")
+            elif child.tag == "TextId":
+                text_id = child.get("value")
+        events.append((offset, text_id))
+    return events
+
+def _byte_array_data(item: _Element) -> str | None:
+    raw_data = item[1] if len(item) > 1 else None # right after Name in every dump
+    if raw_data == None or raw_data.tag != "RawData":
+        raw_data = item.find("RawData")
+    if raw_data == None or raw_data.text == None:
+        return None
+    return "".join(raw_data.text.split())
+
+_record_extractors = {
+    "RadioStationSettings": _station_settings,
+    "RadioStationTrackList": _track_list,
+    "RadioTrackTextIDs": _text_id_events,
+    "StreamingSound": _streaming_sound,
+    "SimpleSound": lambda item: _child_text(item, "ContainerName"),
+    "ByteArray": _byte_array_data,
+    "Container": lambda item: _child_text(item, "ContainerHash"),
+}
+
+# type, Name and the fields the export reads of an `Item`, made of plain tuples, lists, dicts and strings so it can be pickled
+RelItem = tuple[str, str | None, object]
+
+def item_record(item: _Element) -> RelItem:
+    """Record of an `Item` element. Types the export never reads the fields of (e.g. speech `Hash` items) only keep their name"""
+    type_name = item.get("type")
+    extract = _record_extractors.get(type_name)
+    return type_name, _child_text(item, "Name"), extract(item) if extract != None else None
+
+def station_settings(item: RelItem) -> tuple[dict, list[str]]:
+    """Flags, RadioName, Genre and AmbientRadioVol of a `RadioStationSettings`, and the names of its tracklists"""
+    fields, track_lists = item[2]
+    return dict(fields), track_lists # records are shared between exports, the fields are copied so they can be extended
+
+def track_list(item: RelItem) -> tuple[dict, list[str]]:
+    """Flags and Category of a `RadioStationTrackList`, and the sound refs of its tracks"""
+    fields, sound_refs = item[2]
+    return dict(fields), sound_refs
+
+def streaming_sound(item: RelItem) -> tuple[str | None, list[str]]:
+    """Duration of a `StreamingSound` and the names of its child sounds"""
+    return item[2]
+
+def simple_sound_container(item: RelItem) -> str | None:
+    """ContainerName of a `SimpleSound`"""
+    return item[2]
+
+def text_id_events(item: RelItem) -> list[tuple[str, str]]:
+    """(OffsetMs, TextId) of every event of a `RadioTrackTextIDs`"""
+    return item[2]
+
+def byte_array_data(item: RelItem) -> str | None:
+    """RawData of a speech `ByteArray` as a hex string without whitespace"""
+    return item[2]
+
+def container_hash(item: RelItem) -> str | None:
+    """ContainerHash of a speech `Container`"""
+    return item[2]
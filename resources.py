@@ -0,0 +1,204 @@
+"""Resources loaded once per session and shared read-only between DLC exports: nametables, global text tables and rel.xml indexes.
+
+    session = get_session()
+    nametable = session.nametable(data_dir / "game.dat151.nametable")
+    session.memory_usage() # approximate bytes held by each resource
+
+With a memory budget, the least recently used resources are dropped once the total goes over it and loaded again when they are next needed.
+Resources loaded from a file are keyed by its size and mtime too, a file that changed is loaded again and its previous version is dropped.
+Sessions can be used from several threads, `Prefetcher` loads resources on a background thread ahead of the work that needs them"""
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from queue import Queue
+from threading import Lock, Semaphore, Thread
+from typing import Callable, Iterable, Iterator
+
+import os
+
+import instrument
+from hash_utils import HashMap
+from utils import ANSI, data_dir, cache_dir
+
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+def _source_version(source_path: Path) -> tuple[int, int] | None:
+    """Size and mtime (ns) of a file, None if it does not exist"""
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class ResourceSession:
+    """Loads resources by key on first use and keeps them, least recently used first, within `memory_budget` bytes (None for no limit).
+    The resource that was just loaded is kept even if it is over the budget on its own.
+    A resource requested while another thread is loading it waits for that load instead of loading it again"""
+    def __init__(self, memory_budget: int | None = DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.resources: OrderedDict[tuple, tuple[object, int]] = OrderedDict() # key -> resource, approximate bytes
+        self.loading: dict[tuple, Future] = {}
+        self.versions: dict[tuple, tuple] = {} # key without the source version -> key of the version held
+        self.lock = Lock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, key: tuple, load: Callable[[], object], source: Path | None = None) -> object:
+        """The resource stored under `key`, loaded with `load` if it is not held. Resources with a `memory_usage()` count towards the budget.
+        With `source`, the size and mtime of that file are part of the key: a changed file is loaded again and the resource of its previous version dropped"""
+        if source != None:
+            versioned_key = key + (_source_version(source),)
+            with self.lock:
+                held_key = self.versions.get(key)
+                if held_key != versioned_key:
+                    if held_key != None and self.resources.pop(held_key, None) != None:
+                        instrument.count("SessionStale")
+                    self.versions[key] = versioned_key
+            key = versioned_key
+
+        with self.lock:
+            entry = self.resources.get(key)
+            if entry != None:
+                self.resources.move_to_end(key)
+                self.hits += 1
+                instrument.count("SessionHits")
+                return entry[0]
+
+            loading = self.loading.get(key)
+            if loading == None:
+                self.loading[key] = Future()
+            else:
+                self.hits += 1
+                instrument.count("SessionHits")
+
+        if loading != None:
+            return loading.result()
+
+        loading = self.loading[key]
+        try:
+            resource = load()
+            size = resource.memory_usage() if hasattr(resource, "memory_usage") else 0
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            loading.set_exception(e)
+            raise
+
+        with self.lock:
+            self.loads += 1
+            instrument.count("SessionLoads")
+            self.resources[key] = (resource, size)
+            del self.loading[key]
+            self._evict()
+        loading.set_result(resource)
+        return resource
+
+    def evict(self):
+        """Drops the least recently used resources until the total is within the budget"""
+        with self.lock:
+            self._evict()
+
+    def _evict(self):
+        if self.memory_budget == None:
+            return
+
+        total = self.memory_total()
+        while total > self.memory_budget and len(self.resources) > 1:
+            _, (_, size) = self.resources.popitem(last=False)
+            total -= size
+            self.evictions += 1
+            instrument.count("SessionEvictions")
+
+    def clear(self):
+        with self.lock:
+            self.resources.clear()
+            self.versions.clear()
+
+    def memory_total(self) -> int:
+        return sum(size for _, size in self.resources.values())
+
+    def memory_usage(self) -> dict[tuple, int]:
+        """Approximate bytes held by each resource, most recently used last"""
+        return {key: size for key, (_, size) in self.resources.items()}
+
+    def nametable(self, file_path: Path | str, cache_dir: Path | None = cache_dir) -> HashMap:
+        """A `.nametable` or `.txt` nametable on its own `HashMap`, empty if the file does not exist. Stack it with `HashMap.load_table`"""
+        file_path = Path(file_path)
+        def load():
+            nametable = HashMap()
+            nametable.load_nametable(file_path, cache_dir)
+            return nametable
+        return self.get(("nametable", file_path, cache_dir), load, file_path)
+
+    def text_table(self, file_path: Path | str) -> HashMap:
+        """A `.gxt2` or `.txt` global text table, empty if the file does not exist"""
+        file_path = Path(file_path)
+        def load():
+            text_table = HashMap()
+            text_table.load_gxt2(file_path)
+            return text_table
+        return self.get(("text table", file_path), load, file_path)
+
+    def print_summary(self):
+        print(ANSI(f"Session held {len(self.resources)} resource(s), {self.memory_total() / 1024 / 1024:.1f} MB "
+                   f"({self.loads} loaded, {self.hits} reused, {self.evictions} evicted)").green())
+
+class Prefetcher:
+    """Iterates `items` in order while `load` runs for the upcoming ones on a background thread.
+    At most `depth` items are loaded ahead of the one being processed, so prefetching cannot hold more than that in memory.
+    Errors in `load` are ignored, the foreground work loads the item again and raises them where they can be handled"""
+    def __init__(self, items: Iterable, load: Callable[[object], None], depth: int = 1):
+        self.items = list(items)
+        self.load = load
+        self.depth = depth
+
+    def __iter__(self) -> Iterator:
+        if self.depth < 1 or len(self.items) < 2:
+            yield from self.items
+            return
+
+        slots = Semaphore(self.depth + 1) # the item being processed and `depth` items ahead of it
+        ready: Queue = Queue()
+        stopped = False
+
+        def prefetch():
+            for item in self.items:
+                slots.acquire()
+                if stopped:
+                    return
+                try:
+                    self.load(item)
+                except Exception:
+                    pass
+                ready.put(item)
+
+        thread = Thread(target=prefetch, name="prefetch", daemon=True)
+        thread.start()
+        try:
+            for _ in self.items:
+                item = ready.get()
+                yield item
+                slots.release()
+        finally:
+            stopped = True
+            slots.release() # wakes the thread if it is waiting for a slot
+
+_session: ResourceSession | None = None
+
+def get_session() -> ResourceSession:
+    """The session of the process, created on first use"""
+    global _session
+    if _session == None:
+        _session = ResourceSession()
+    return _session
+
+def start_session(memory_budget: int | None = DEFAULT_MEMORY_BUDGET) -> ResourceSession:
+    """Starts a new session for the process, dropping the resources of the previous one"""
+    global _session
+    _session = ResourceSession(memory_budget)
+    return _session
+
+def get_trackid_table(data_path: Path = data_dir) -> HashMap:
+    """The `trackid.gxt2` of `data_path`. Look it up once per export and pass it on, every lookup takes the session lock"""
+    return get_session().text_table(data_path / "trackid.gxt2")
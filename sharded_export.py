@@ -0,0 +1,187 @@
+"""Sharded layout for an export: one file per station and per tracklist, and a manifest to find them, so a consumer only reads what it needs.
+
+    info_merged/
+        manifest.json               every station and tracklist with its file, size, content hash and cross-references
+        stations/<id>.json          a station, as in `info_merged.json`
+        tracklists/<id>.json        a tracklist with its tracks and markers
+
+    {
+        "Version": 2,
+        "Stations": {"<id>": {"File": "stations/<id>.json", "Size": 1024, "Hash": "<blake2b>", "TrackLists": ["<id>", ...]}},
+        "TrackLists": {"<id>": {"File": "tracklists/<id>.json", "Size": 6600, "Hash": "<blake2b>", "DlcPath": "...", "Stations": ["<id>", ...],
+                                "TrackLists": ["<id>", ...]}}
+    }
+
+The `TrackLists` of a tracklist are the other tracklists its tracks reference (a track that only points to the tracklist
+it is defined in, with a `"TrackList"` field), which a consumer needs too to resolve those tracks.
+
+Shards whose content did not change are not written again, shards of entries that are gone are removed and the manifest is written last"""
+import hashlib
+import json
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import quote
+
+from cache_utils import write_atomic
+from utils import delta_time_ms, ANSI
+
+SHARDED_FORMAT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+
+def _encode(data: object) -> bytes:
+    # same formatting as `save_json`, so a shard reads like the matching part of `info_merged.json`
+    return json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
+
+def _content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def _shard_file(folder: str, id: str, taken: set[str]) -> str:
+    """Relative path of the shard of `id`, unique even on case-insensitive file systems"""
+    file = f"{folder}/{quote(id, safe='')}.json"
+    if file.lower() in taken:
+        file = f"{folder}/{quote(id, safe='')}_{_content_hash(id.encode('utf-8'))[:8]}.json"
+    taken.add(file.lower())
+    return file
+
+def _referenced_track_lists(track_list_id: str, track_list: dict) -> list[str]:
+    """Other tracklists the tracks of a tracklist reference, in order of first reference"""
+    referenced = (track.get("TrackList") for track in track_list.get("Tracks", []))
+    return list(dict.fromkeys(id for id in referenced if isinstance(id, str) and id != track_list_id))
+
+def read_manifest(out_path: Path | str) -> dict | None:
+    """The manifest of a sharded export, None if there is none (or it is from another version of the layout)"""
+    manifest_path = Path(out_path) / MANIFEST_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("Version") == SHARDED_FORMAT_VERSION else None
+
+def write_sharded_export(out_path: Path | str, export: dict) -> dict[str, int]:
+    """Writes `export` (a merged export or a single `processed/*_info.json`) as shards into the `out_path` folder.
+    Returns how many shards were written, left unchanged and removed"""
+    time_start = perf_counter()
+    out_path = Path(out_path)
+    previous = read_manifest(out_path) or {}
+    stations = export.get("Stations", {})
+    track_lists = export.get("TrackLists", {})
+
+    stations_of: dict[str, list[str]] = {track_list_id: [] for track_list_id in track_lists}
+    for station_id, station in stations.items():
+        for track_list_id in station.get("TrackLists", []):
+            stations_of.setdefault(track_list_id, []).append(station_id)
+
+    manifest = {"Version": SHARDED_FORMAT_VERSION, "Stations": {}, "TrackLists": {}}
+    counts = {"Written": 0, "Unchanged": 0, "Removed": 0}
+    taken: set[str] = set()
+
+    def write_shard(section: str, folder: str, id: str, data: dict) -> dict:
+        body = _encode(data)
+        entry = {"File": _shard_file(folder, id, taken), "Size": len(body), "Hash": _content_hash(body)}
+        previous_entry = previous.get(section, {}).get(id)
+        shard_path = out_path / entry["File"]
+        if (previous_entry != None and previous_entry.get("File") == entry["File"] and previous_entry.get("Hash") == entry["Hash"]
+                and shard_path.is_file() and shard_path.stat().st_size == entry["Size"]):
+            counts["Unchanged"] += 1
+        else:
+            write_atomic(shard_path, body)
+            counts["Written"] += 1
+        return entry
+
+    for station_id, station in stations.items():
+        entry = write_shard("Stations", "stations", station_id, station)
+        entry["TrackLists"] = station.get("TrackLists", [])
+        manifest["Stations"][station_id] = entry
+
+    for track_list_id, track_list in track_lists.items():
+        entry = write_shard("TrackLists", "tracklists", track_list_id, track_list)
+        entry["DlcPath"] = track_list.get("DlcPath")
+        entry["Stations"] = stations_of[track_list_id]
+        entry["TrackLists"] = _referenced_track_lists(track_list_id, track_list)
+        manifest["TrackLists"][track_list_id] = entry
+
+    # shards of removed (or renamed) entries
+    files = {entry["File"] for section in ("Stations", "TrackLists") for entry in manifest[section].values()}
+    for section in ("Stations", "TrackLists"):
+        for entry in previous.get(section, {}).values():
+            if entry.get("File") not in files and (out_path / entry["File"]).is_file():
+                (out_path / entry["File"]).unlink()
+                counts["Removed"] += 1
+
+    manifest_body = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8") # compact, every consumer reads it first
+    manifest_path = out_path / MANIFEST_NAME
+    if not manifest_path.is_file() or manifest_path.read_bytes() != manifest_body:
+        write_atomic(manifest_path, manifest_body)
+
+    print(f"[{delta_time_ms(time_start)}ms] Wrote sharded export '{ANSI(out_path.name).bold()}' "
+          f"({counts['Written']} written, {counts['Unchanged']} unchanged, {counts['Removed']} removed)")
+    return counts
+
+class ShardedExport:
+    """Reads a sharded export one shard at a time, only the manifest is read up front.
+
+        shards = ShardedExport(script_dir / "info_merged")
+        database = RadioDatabase(data=shards.station_bundle("radio_34_dlc_hei4_kult"))
+
+    With `verify`, every shard is checked against the hash in the manifest and a ValueError is raised if it does not match"""
+    def __init__(self, out_path: Path | str, verify: bool = False):
+        self.out_path = Path(out_path)
+        self.verify = verify
+        self._manifest: dict | None = None
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest == None:
+            self._manifest = read_manifest(self.out_path)
+            if self._manifest == None:
+                raise FileNotFoundError(f"No sharded export in '{self.out_path}'")
+        return self._manifest
+
+    @property
+    def stations(self) -> dict[str, dict]:
+        """Manifest entries of the stations"""
+        return self.manifest["Stations"]
+
+    @property
+    def track_lists(self) -> dict[str, dict]:
+        """Manifest entries of the tracklists"""
+        return self.manifest["TrackLists"]
+
+    def _read(self, entry: dict) -> dict:
+        body = (self.out_path / entry["File"]).read_bytes()
+        if self.verify and _content_hash(body) != entry["Hash"]:
+            raise ValueError(f"Shard '{entry['File']}' does not match the manifest")
+        return json.loads(body)
+
+    def station(self, station_id: str) -> dict | None:
+        entry = self.stations.get(station_id)
+        return self._read(entry) if entry != None else None
+
+    def track_list(self, track_list_id: str) -> dict | None:
+        entry = self.track_lists.get(track_list_id)
+        return self._read(entry) if entry != None else None
+
+    def station_bundle(self, station_id: str) -> dict | None:
+        """An export with only `station_id`, its tracklists and the tracklists they reference (and so on), in the layout of `info_merged.json`"""
+        station = self.station(station_id)
+        if station == None:
+            return None
+        track_lists = {}
+        pending = list(self.stations[station_id]["TrackLists"])
+        while pending:
+            track_list_id = pending.pop(0)
+            if track_list_id in track_lists:
+                continue
+            track_list = self.track_list(track_list_id)
+            if track_list != None:
+                track_lists[track_list_id] = track_list
+                pending += self.track_lists[track_list_id].get("TrackLists", [])
+        return {"Stations": {station_id: station}, "TrackLists": track_lists}
+
+    def export(self) -> dict:
+        """Every shard, in the layout of `info_merged.json`"""
+        return {
+            "Stations": {station_id: self._read(entry) for station_id, entry in self.stations.items()},
+            "TrackLists": {track_list_id: self._read(entry) for track_list_id, entry in self.track_lists.items()},
+        }
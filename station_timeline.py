@@ -0,0 +1,438 @@
+"""Seeded, deterministic playback schedules for the stations of an export.
+
+    timeline = StationTimeline(RadioDatabase(), "radio_01_class_rock").generate(WEEK_MS, seed=1)
+    timeline.at(3_600_000) # the segment playing an hour in
+
+A schedule is a sequence of music, advert, ident, DJ solo and news segments back to back, with DJ speech segments on top of them
+(during the DJ intro/outro markers of music tracks). Station flags and tracklist categories shape it, but the
+probabilities below are approximations, not values from the game. Segments are kept in parallel arrays, `Timeline.segment` builds a dict for one
+
+Timelines are generated with NumPy, a block of music slots at a time: every random draw of a block comes from arrays,
+and the segments of the block are laid out with cumulative sums instead of one by one.
+
+    python station_timeline.py radio_01_class_rock --hours 168 --seed 1 --out timeline.json
+"""
+import argparse
+import hashlib
+import math
+from pathlib import Path
+from time import perf_counter
+
+from hash_utils import _load_numpy
+from radio_database import RadioDatabase
+from utils import delta_time_ms, save_json, ANSI
+
+DAY_MS = 24 * 60 * 60 * 1000
+WEEK_MS = 7 * DAY_MS
+
+# tracklist `Category` values
+CATEGORY_ADVERTS = "0"
+CATEGORY_IDENTS = "1"
+CATEGORY_MUSIC = "2"
+CATEGORY_NEWS = "3"
+CATEGORY_DJSOLO = "5"
+
+SEGMENT_KINDS = ("Music", "Advert", "Ident", "DjSolo", "News", "Speech")
+KIND_MUSIC, KIND_ADVERT, KIND_IDENT, KIND_DJSOLO, KIND_NEWS, KIND_SPEECH = range(len(SEGMENT_KINDS))
+
+MUSIC_BETWEEN_BREAKS = (2, 4) # music tracks played before a break, inclusive
+BREAK_WEIGHTS = {KIND_ADVERT: 4, KIND_IDENT: 3, KIND_DJSOLO: 2, KIND_NEWS: 1}
+SPEECH_CHANCE = 0.5 # of DJ speech over a music intro or before an advert/news break
+TRACK_INTRO_CHANCE = 0.5 # of using a track's exclusive intro instead of general speech
+TIME_SPEECH_CHANCE = 0.3 # of morning/evening speech instead of general speech at those hours
+
+class Timeline:
+    """Segments of a schedule in parallel NumPy arrays, ordered by start. Speech segments start inside the segment they play over"""
+    __slots__ = ("station_id", "seed", "items", "kinds", "starts", "durations", "item_indexes", "variations")
+
+    def __init__(self, station_id: str, seed: int, items: list[tuple[str, str]], kinds, starts, durations, item_indexes, variations):
+        self.station_id = station_id
+        self.seed = seed
+        self.items = items # (tracklist id, track id) or (speech category, context)
+        self.kinds = kinds # uint8
+        self.starts = starts # int64
+        self.durations = durations # int64
+        self.item_indexes = item_indexes # int64
+        self.variations = variations # speech variation, 0 for tracks
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def segment(self, index: int) -> dict:
+        kind = int(self.kinds[index])
+        group, item_id = self.items[self.item_indexes[index]]
+        segment = {"Kind": SEGMENT_KINDS[kind], "Start": int(self.starts[index]), "Duration": int(self.durations[index])}
+        if kind == KIND_SPEECH:
+            segment |= {"Category": group, "Context": item_id, "Variation": int(self.variations[index])}
+        else:
+            segment |= {"TrackList": group, "Id": item_id}
+        return segment
+
+    def __iter__(self):
+        return map(self.segment, range(len(self)))
+
+    def at(self, offset: int, speech: bool = False) -> dict | None:
+        """The segment playing at `offset`, or the speech segment that last started at or before it with `speech`"""
+        index = int(self.starts.searchsorted(offset, side="right")) - 1
+        while index >= 0 and (self.kinds[index] == KIND_SPEECH) != speech:
+            index -= 1
+        return self.segment(index) if index >= 0 else None
+
+    def end(self) -> int:
+        """Where the last segment that is not speech ends (speech plays over the segments, so it can end earlier)"""
+        index = len(self) - 1
+        while index >= 0 and self.kinds[index] == KIND_SPEECH:
+            index -= 1
+        return int(self.starts[index] + self.durations[index]) if index >= 0 else 0
+
+def _speech_contexts(speech: dict) -> dict[str, list[tuple[str, str, int]]]:
+    """(category, context, variations) of the speech of a station by category, a category without contexts is its own context"""
+    contexts = {}
+    for category, entry in speech.items():
+        leaves = [(category, category, entry["Variations"])] if "Variations" in entry else [(category, context, leaf["Variations"]) for context, leaf in entry.items()]
+        contexts[category] = [leaf for leaf in leaves if leaf[2] > 0]
+    return contexts
+
+def _dj_window(track: dict, kind: str) -> tuple[int, int] | None:
+    """Offsets of the `{kind}_start` and `{kind}_end` DJ markers of a track"""
+    start = end = None
+    for marker in track.get("Markers", {}).get("DJ", []):
+        if marker["Value"] == f"{kind}_start":
+            start = marker["Offset"]
+        elif marker["Value"] == f"{kind}_end" and start != None:
+            end = marker["Offset"]
+            break
+    return None if end == None else (start, end)
+
+class _Pool:
+    """The tracks of a category: item indexes and durations, as lists while gathering and NumPy arrays once `StationTimeline` is ready to generate"""
+    __slots__ = ("item_indexes", "durations")
+
+    def __init__(self):
+        self.item_indexes = []
+        self.durations = []
+
+class _RandomStream:
+    """Uniform doubles of a generator, drawn ahead into a buffer. The sequence does not depend on how many are taken at once,
+    so a timeline is the same whatever its block sizes are"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.buffer = rng.random(0)
+
+    def peek(self, count: int):
+        if len(self.buffer) < count:
+            np = _load_numpy()
+            self.buffer = np.concatenate((self.buffer, self.rng.random(max(count - len(self.buffer), 1024))))
+        return self.buffer[:count]
+
+    def advance(self, count: int):
+        self.buffer = self.buffer[count:]
+
+    def take(self, count: int):
+        values = self.peek(count)
+        self.advance(count)
+        return values
+
+class _BagStream:
+    """Indexes into a pool of `size` tracks played from shuffled bags, every track once per bag.
+    With `no_repeat`, a bag never starts with the track the previous one ended with (if the pool has more than one)"""
+    def __init__(self, rng, size: int, no_repeat: bool = False):
+        np = _load_numpy()
+        self.rng = rng
+        self.size = size
+        self.no_repeat = no_repeat and size > 1
+        self.last = -1
+        self.pending = np.empty(0, dtype=np.int64)
+
+    def take(self, count: int):
+        np = _load_numpy()
+        if len(self.pending) < count:
+            bags = (count - len(self.pending)) // self.size + 1
+            orders = self.rng.random((bags, self.size)).argsort(axis=1) # each row is a random permutation
+            if self.no_repeat:
+                for order in orders:
+                    if order[0] == self.last:
+                        order[0], order[-1] = order[-1], order[0]
+                    self.last = order[-1]
+            self.pending = np.concatenate((self.pending, orders.ravel()))
+
+        taken, self.pending = self.pending[:count], self.pending[count:]
+        return taken
+
+class StationTimeline:
+    """Turns the tracklists, flags and speech of a station into timelines. The tracks and speech are gathered once, `generate` can be called for any seed"""
+    def __init__(self, database: RadioDatabase, station_id: str):
+        station = database.station(station_id)
+        if station == None:
+            raise KeyError(f"Station '{station_id}' is not in the export")
+
+        self.station_id = station_id
+        self.flags = set(station.get("Flags", []))
+        self.items: list[tuple[str, str]] = []
+        self.pools = {kind: _Pool() for kind in (KIND_MUSIC, KIND_ADVERT, KIND_IDENT, KIND_DJSOLO, KIND_NEWS)}
+        categories = {CATEGORY_MUSIC: KIND_MUSIC, CATEGORY_ADVERTS: KIND_ADVERT, CATEGORY_IDENTS: KIND_IDENT, CATEGORY_DJSOLO: KIND_DJSOLO, CATEGORY_NEWS: KIND_NEWS}
+
+        # DJ speech windows of music tracks (start, end) and their exclusive intros (item index, variations), by pool index
+        self.intro_windows: list[tuple[int, int] | None] = []
+        self.outro_windows: list[tuple[int, int] | None] = []
+        self.track_intros: list[tuple[int, int] | None] = []
+
+        tracks = list(database.station_tracks(station_id))
+        if "PLAYNEWS" in self.flags: # news tracklists are shared by every station instead of being listed in them
+            station_track_lists = set(station.get("TrackLists", []))
+            for track_list_id, track_list in database.data.get("TrackLists", {}).items():
+                if track_list.get("Category") == CATEGORY_NEWS and track_list_id not in station_track_lists:
+                    tracks += [(track_list_id, database.track(track_list_id, track["Id"])) for track in track_list.get("Tracks", [])]
+
+        for track_list_id, track in tracks:
+            kind = categories.get(database.track_list(track_list_id).get("Category"))
+            if kind == None or track == None or not track.get("Duration"):
+                continue
+            if kind == KIND_NEWS and "PLAYNEWS" not in self.flags:
+                continue
+
+            pool = self.pools[kind]
+            pool.item_indexes.append(len(self.items))
+            pool.durations.append(track["Duration"])
+            self.items.append((track_list_id, track["Id"]))
+            if kind == KIND_MUSIC:
+                self.intro_windows.append(_dj_window(track, "intro"))
+                self.outro_windows.append(_dj_window(track, "outro"))
+                intro = track.get("Intro")
+                if intro and intro.get("Variations"):
+                    self.track_intros.append((len(self.items), intro["Variations"]))
+                    self.items.append(("INTRO", track["Id"]))
+                else:
+                    self.track_intros.append(None)
+
+        if not self.pools[KIND_MUSIC].durations:
+            raise ValueError(f"Station '{station_id}' has no music with a known duration")
+
+
+        # speech contexts as (item index, variations), the TO and TIME categories also by context
+        self.speech: dict[str, list[tuple[int, int]]] = {}
+        self.speech_to: dict[str, tuple[int, int]] = {}
+        self.speech_time: dict[str, tuple[int, int]] = {}
+        for category, leaves in _speech_contexts(station.get("Speech", {})).items():
+            self.speech[category] = []
+            for speech_category, context, variations in leaves:
+                entry = (len(self.items), variations)
+                self.speech[category].append(entry)
+                self.items.append((speech_category, context))
+                if category == "TO":
+                    self.speech_to[context] = entry
+                elif category == "TIME":
+                    self.speech_time[context] = entry
+
+        # break kinds repeated by weight, and what separates music tracks on NOBACK2BACKMUSIC stations outside of breaks
+        weights = dict(BREAK_WEIGHTS)
+        if "IDENTSINSTEADOFADS" in self.flags:
+            weights[KIND_IDENT] += weights.pop(KIND_ADVERT)
+        self.breaks = [kind for kind, weight in weights.items() for _ in range(weight) if len(self.pools[kind].durations)]
+        self.fillers = [kind for kind in (KIND_IDENT, KIND_DJSOLO) if len(self.pools[kind].durations)]
+
+    def _prepare(self):
+        """NumPy arrays of the pools, DJ windows, intros and speech, built for the first timeline"""
+        np = _load_numpy()
+        if np == None:
+            raise ImportError("Station timelines are generated with NumPy, install it with 'pip install numpy'")
+        if hasattr(self, "arrays"):
+            return np
+
+        def entries(entries: list[tuple[int, int] | None]):
+            entries = [entry or (-1, 0) for entry in entries]
+            return np.array([item for item, _ in entries], dtype=np.int64), np.array([variations for _, variations in entries], dtype=np.int64)
+
+        def windows(windows: list[tuple[int, int] | None]):
+            windows = [window or (-1, -1) for window in windows]
+            return np.array([start for start, _ in windows], dtype=np.int64), np.array([end for _, end in windows], dtype=np.int64)
+
+        for pool in self.pools.values():
+            pool.item_indexes = np.array(pool.item_indexes, dtype=np.int64)
+            pool.durations = np.array(pool.durations, dtype=np.int64)
+
+        self.arrays = {
+            "IntroWindows": windows(self.intro_windows),
+            "OutroWindows": windows(self.outro_windows),
+            "TrackIntros": entries(self.track_intros),
+            "General": entries(self.speech.get("GENERAL", [])),
+        }
+        return np
+
+    def generate(self, duration_ms: int = DAY_MS, seed: int = 0, start_hour: float = 0) -> Timeline:
+        """A timeline that covers at least `duration_ms`, starting at `start_hour` (for morning/evening speech).
+        The same seed always gives the same timeline for the same export"""
+        np = self._prepare()
+        entropy = int.from_bytes(hashlib.blake2b(f"{seed}:{self.station_id}".encode("utf-8"), digest_size=16).digest(), "little")
+        setup_rng, slot_rng, gap_rng, music_rng, *pool_rngs = map(np.random.default_rng, np.random.SeedSequence(entropy).spawn(4 + len(self.pools)))
+
+        is_mix = "ISMIXSTATION" in self.flags
+        music = self.pools[KIND_MUSIC]
+        music_count = len(music.durations)
+        # music order: a shuffled bag by default, the tracklist order from a random start when sequential,
+        # or a random stride through the tracklist (coprime with its length, so every track is reached)
+        sequential = is_mix or "SEQUENTIALMUSIC" in self.flags
+        stride = 1
+        if "USERANDOMIZEDSTRIDESELECTION" in self.flags and music_count > 2:
+            while stride == 1 or math.gcd(stride, music_count) != 1:
+                stride = 2 + int(setup_rng.random() * (music_count - 2))
+        music_start = int(setup_rng.random() * music_count)
+        music_bag = None if sequential or stride > 1 else _BagStream(music_rng, music_count, no_repeat=True)
+        pool_bags = {kind: _BagStream(rng, len(pool.durations)) for (kind, pool), rng in zip(self.pools.items(), pool_rngs) if len(pool.durations)}
+
+        slots = _RandomStream(slot_rng)
+        gaps = _RandomStream(gap_rng)
+        breaks = np.array(self.breaks if not is_mix else [], dtype=np.int64)
+        fillers = np.array(self.fillers if not is_mix and "NOBACK2BACKMUSIC" in self.flags else [], dtype=np.int64)
+        back_to_back_ads = "BACK2BACKADS" in self.flags
+        min_music, max_music = MUSIC_BETWEEN_BREAKS
+        intro_starts, intro_ends = self.arrays["IntroWindows"]
+        outro_starts, outro_ends = self.arrays["OutroWindows"]
+        intro_items, intro_variations = self.arrays["TrackIntros"]
+        general_items, general_variations = self.arrays["General"]
+        time_speech = {hour: self.speech_time.get(context) for hour, context in ((0, "MORNING"), (1, "EVENING"))}
+        to_speech = {KIND_ADVERT: self.speech_to.get("TO_AD"), KIND_NEWS: self.speech_to.get("TO_NEWS")}
+        mean_music = max(1, int(music.durations.mean()))
+
+        blocks = []
+        time = 0
+        slot = 0 # music slots generated so far
+        next_break = 0
+        while time < duration_ms:
+            # a music track per slot, followed by up to two break segments
+            count = (duration_ms - time) // mean_music + 16
+            if music_bag == None:
+                music_indexes = (music_start + stride * np.arange(slot + 1, slot + count + 1)) % music_count
+            else:
+                music_indexes = music_bag.take(count)
+            random = slots.take(count * 8).reshape(count, 8)
+            music_durations = music.durations[music_indexes]
+
+            # breaks every 2-4 slots from the first one on, fillers (if any) after the other slots
+            kinds = np.full(count, -1, dtype=np.int64)
+            is_break = np.zeros(count, dtype=bool)
+            if len(breaks):
+                max_breaks = (count - 1) // min_music + 2
+                positions = next_break + np.concatenate(([0], np.cumsum(min_music + (gaps.peek(max_breaks) * (max_music - min_music + 1)).astype(np.int64))))
+                in_block = int(np.searchsorted(positions, slot + count))
+                gaps.advance(in_block)
+                is_break[positions[:in_block] - slot] = True
+                next_break = int(positions[in_block])
+                kinds[is_break] = breaks[(random[is_break, 5] * len(breaks)).astype(np.int64)]
+            if len(fillers):
+                kinds[~is_break] = fillers[(random[~is_break, 5] * len(fillers)).astype(np.int64)]
+
+            # break segments, picked from the bag of their kind in slot order
+            break_items = np.full((count, 2), -1, dtype=np.int64)
+            break_durations = np.zeros((count, 2), dtype=np.int64)
+            for kind, bag in pool_bags.items():
+                if kind == KIND_MUSIC:
+                    continue
+                kind_slots = np.flatnonzero(kinds == kind)
+                if not len(kind_slots):
+                    continue
+                per_slot = 2 if kind == KIND_ADVERT and back_to_back_ads else 1
+                picks = bag.take(len(kind_slots) * per_slot).reshape(-1, per_slot)
+                pool = self.pools[kind]
+                break_items[kind_slots, :per_slot] = pool.item_indexes[picks]
+                break_durations[kind_slots, :per_slot] = pool.durations[picks]
+
+            slot_ends = time + np.cumsum(music_durations + break_durations.sum(axis=1))
+            starts = slot_ends - music_durations - break_durations.sum(axis=1)
+
+            # DJ speech over the intro of a music track: its exclusive intro, morning/evening speech or general speech
+            speech_items = np.full(count, -1, dtype=np.int64)
+            speech_variations = np.zeros(count, dtype=np.int64)
+            outro_items = np.full(count, -1, dtype=np.int64)
+            outro_variations = np.zeros(count, dtype=np.int64)
+            if not is_mix:
+                speaks = random[:, 0] < SPEECH_CHANCE
+                use_intro = speaks & (intro_items[music_indexes] >= 0) & (random[:, 1] < TRACK_INTRO_CHANCE)
+                speech_items[use_intro] = intro_items[music_indexes[use_intro]]
+                speech_variations[use_intro] = intro_variations[music_indexes[use_intro]]
+                rest = speaks & ~use_intro
+
+                if self.speech_time:
+                    hours = (start_hour + starts / 3_600_000) % 24
+                    use_time = rest & (((5 <= hours) & (hours < 12)) | (17 <= hours)) & (random[:, 2] < TIME_SPEECH_CHANCE)
+                    for evening, speech in time_speech.items():
+                        if speech == None: # no speech for this time of day, the slot falls back to general speech
+                            continue
+                        selected = use_time & ((hours >= 12) == evening)
+                        speech_items[selected], speech_variations[selected] = speech
+                        rest &= ~selected
+                if len(general_items):
+                    picks = (random[rest, 3] * len(general_items)).astype(np.int64)
+                    speech_items[rest] = general_items[picks]
+                    speech_variations[rest] = general_variations[picks]
+
+                # the DJ leads into advert and news breaks over the outro
+                for kind, speech in to_speech.items():
+                    if speech != None:
+                        selected = (kinds == kind) & (random[:, 6] < SPEECH_CHANCE)
+                        outro_items[selected], outro_variations[selected] = speech
+
+            intro_starts_block, intro_ends_block = intro_starts[music_indexes], intro_ends[music_indexes]
+            outro_starts_block, outro_ends_block = outro_starts[music_indexes], outro_ends[music_indexes]
+            has_intro = (speech_items >= 0) & (intro_starts_block >= 0)
+            has_outro = (outro_items >= 0) & (outro_starts_block >= 0)
+
+            # every slot as music, intro speech, outro speech and two break segments, the ones that do not exist are masked out
+            music_ends = starts + music_durations
+            block = {
+                "kinds": np.column_stack((np.full(count, KIND_MUSIC), np.full(count, KIND_SPEECH), np.full(count, KIND_SPEECH), kinds, kinds)),
+                "starts": np.column_stack((starts, starts + intro_starts_block, starts + outro_starts_block, music_ends, music_ends + break_durations[:, 0])),
+                "durations": np.column_stack((music_durations, intro_ends_block - intro_starts_block, outro_ends_block - outro_starts_block, break_durations)),
+                "item_indexes": np.column_stack((music.item_indexes[music_indexes], speech_items, outro_items, break_items)),
+                "variations": np.column_stack((np.zeros(count, dtype=np.int64), (random[:, 4] * speech_variations).astype(np.int64),
+                                               (random[:, 7] * outro_variations).astype(np.int64), np.zeros((count, 2), dtype=np.int64))),
+            }
+            mask = np.column_stack((np.ones(count, dtype=bool), has_intro, has_outro, break_items >= 0)) & (block["starts"] < duration_ms)
+            blocks.append({name: column[mask] for name, column in block.items()})
+
+            time = int(slot_ends[-1])
+            slot += count
+
+        columns = {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]}
+        return Timeline(self.station_id, seed, self.items, columns["kinds"].astype(np.uint8), columns["starts"], columns["durations"],
+                        columns["item_indexes"], columns["variations"])
+
+def generate_timelines(database: RadioDatabase, station_ids: list[str] = None, duration_ms: int = WEEK_MS, seed: int = 0, start_hour: float = 0) -> dict[str, Timeline]:
+    """Timelines of every station in `station_ids` (every station with music if None)"""
+    timelines = {}
+    for station_id in station_ids or database.data.get("Stations", {}):
+        try:
+            station = StationTimeline(database, station_id)
+        except ValueError:
+            if station_ids:
+                raise
+            continue
+        timelines[station_id] = station.generate(duration_ms, seed, start_hour)
+    return timelines
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates playback schedules for stations in info_merged.json")
+    parser.add_argument("stations", nargs="*", help="stations to schedule (default: every station with music)")
+    parser.add_argument("--hours", type=float, default=24 * 7, help="length of each schedule (default: a week)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-hour", type=float, default=0, help="hour of the day the schedules start at")
+    parser.add_argument("--export", type=Path, help="export to schedule (default: info_merged.json)")
+    parser.add_argument("--out", type=Path, help="write the schedules to this JSON file")
+    args = parser.parse_args()
+
+    database = RadioDatabase(args.export) if args.export else RadioDatabase()
+    unknown = [station_id for station_id in args.stations if database.station(station_id) == None]
+    if unknown:
+        parser.error(f"unknown station(s) {', '.join(unknown)}")
+
+    time_start = perf_counter()
+    timelines = generate_timelines(database, args.stations, int(args.hours * 3_600_000), args.seed, args.start_hour)
+    segment_count = sum(map(len, timelines.values()))
+    print(f"[{delta_time_ms(time_start)}ms] Generated {segment_count} segments for {len(timelines)} station(s)")
+
+    if args.out:
+        save_json(args.out, {station_id: list(timeline) for station_id, timeline in timelines.items()})
+        print(ANSI(f"Saved timelines to '{ANSI(str(args.out)).bold()}'").green())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import pytest
+
+from awc_index import AwcMarkerIndex
+
+AWC_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<AudioWaveContainer>
+ <Streams>
+  <Item>
+   <Chunks>
+    <Item><Type>markers</Type>
+     <Markers>
+      <Item><Name>trackid</Name><Value>1234</Value><SampleOffset value="48000" /></Item>
+      <Item><Name>dj</Name><Value>intro_start</Value><SampleOffset value="96000" /></Item>
+     </Markers>
+    </Item>
+    <Item><Type>streamformat</Type><StreamFormat><SampleRate value="48000" /></StreamFormat></Item>
+   </Chunks>
+  </Item>
+ </Streams>
+</AudioWaveContainer>
+"""
+
+@pytest.fixture
+def tracks_path(tmp_path):
+    tracks_path = tmp_path / "tracks"
+    for tracklist, track in (("radio_01_music", "song"), ("radio_01_music", "sóng"), ("hash_3D764B0B", "song")):
+        (tracks_path / tracklist).mkdir(parents=True, exist_ok=True)
+        (tracks_path / tracklist / f"{track}.awc.xml").write_text(AWC_XML, encoding="utf-8")
+    (tracks_path / "radio_01_music" / "empty.awc.xml").write_text("<AudioWaveContainer />")
+    return tracks_path
+
+def test_index_file_roundtrip(tmp_path, tracks_path):
+    index = AwcMarkerIndex(tracks_path, tmp_path / "index").update()
+    assert index.get("radio_01_music", "sóng")[0] != None
+    assert index.get("radio_01_music", "empty") == (None, None)
+
+    reloaded = AwcMarkerIndex(tracks_path, tmp_path / "index")
+    assert reloaded.load()
+    assert reloaded.entries == index.entries
+
+@pytest.mark.parametrize("corrupt", [lambda data: data[:len(data) // 2], lambda data: data[:4] + b"\x78\x01" + bytes(16), lambda data: data[:-1]])
+def test_corrupt_index_file_is_rebuilt(tmp_path, tracks_path, corrupt):
+    index = AwcMarkerIndex(tracks_path, tmp_path / "index").update()
+    index_path = tmp_path / "index"
+    index_path.write_bytes(corrupt(index_path.read_bytes()))
+
+    rebuilt = AwcMarkerIndex(tracks_path, index_path)
+    assert not rebuilt.load()
+    assert rebuilt.update().entries == index.entries
+    assert AwcMarkerIndex(tracks_path, index_path).load()
@@ -0,0 +1,134 @@
+import os
+
+import pytest
+
+from awc_index import AwcMarkerIndex
+from export_manifest import ExportManifest, fingerprint_inputs
+
+STATIONS = ["radio_01", "radio_02"]
+
+@pytest.fixture
+def dump(tmp_path):
+    data_path = tmp_path / "raw"
+    data_path.mkdir()
+    for name in ("dlca_game.dat151.rel.xml", "dlca_sounds.dat54.rel.xml"):
+        (data_path / name).write_text(f"<{name}/>")
+    out_file = tmp_path / "dlca_info.json"
+    out_file.write_text('{"Stations": {"radio_01": {}}, "TrackLists": {"music": {}}}')
+
+    awc_index = AwcMarkerIndex(data_path / "tracks")
+    awc_index.entries[("music", "song")] = (100, 1, None, None)
+    return data_path, out_file, awc_index
+
+def input_files(data_path):
+    # the speech file is missing, which is recorded too
+    return [data_path / "dlca_game.dat151.rel.xml", data_path / "dlca_sounds.dat54.rel.xml", data_path / "dlca_speech.dat4.rel.xml"]
+
+def record(manifest, dump, export_info=None, external_sounds=None):
+    data_path, out_file, awc_index = dump
+    export_info = export_info or {"Stations": {"radio_01": {}}, "TrackLists": {"music": {}}}
+    manifest.record("dlca", fingerprint_inputs(data_path, input_files(data_path)), out_file, awc_index, {("music", "song")}, external_sounds or {}, {"song": "music"}, export_info)
+
+def touch(file_path, content):
+    stat = os.stat(file_path)
+    file_path.write_text(content)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_unchanged_inputs_are_current(tmp_path, dump):
+    data_path, out_file, awc_index = dump
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    assert not manifest.is_current("dlca", data_path, out_file, awc_index)
+
+    record(manifest, dump)
+    manifest.save()
+
+    reloaded = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    assert reloaded.is_current("dlca", data_path, out_file, awc_index)
+    assert reloaded.solved_sounds("dlca") == {"song": "music"}
+
+def test_touched_input_with_same_content_is_current(tmp_path, dump):
+    data_path, out_file, awc_index = dump
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    record(manifest, dump)
+
+    game_file = data_path / "dlca_game.dat151.rel.xml"
+    touch(game_file, game_file.read_text())
+    assert manifest.is_current("dlca", data_path, out_file, awc_index)
+
+@pytest.mark.parametrize("change", ["input", "output", "new input", "awc file", "removed awc file"])
+def test_changes_are_detected(tmp_path, dump, change):
+    data_path, out_file, awc_index = dump
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    record(manifest, dump)
+
+    if change == "input":
+        touch(data_path / "dlca_sounds.dat54.rel.xml", "<changed/>")
+    elif change == "output":
+        touch(out_file, "{}")
+    elif change == "new input":
+        (data_path / "dlca_speech.dat4.rel.xml").write_text("<speech/>")
+    elif change == "awc file":
+        awc_index.entries[("music", "song")] = (101, 2, None, None)
+    elif change == "removed awc file":
+        del awc_index.entries[("music", "song")]
+
+    assert not manifest.is_current("dlca", data_path, out_file, awc_index)
+
+def test_input_changed_during_export_is_not_current(tmp_path, dump):
+    data_path, out_file, awc_index = dump
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    inputs = fingerprint_inputs(data_path, input_files(data_path)) # taken when the export starts
+    touch(data_path / "dlca_game.dat151.rel.xml", "<changed while exporting/>")
+    manifest.record("dlca", inputs, out_file, awc_index, set(), {}, {}, {"Stations": {}, "TrackLists": {}})
+
+    assert not manifest.is_current("dlca", data_path, out_file, awc_index)
+
+def test_other_station_list_discards_entries(tmp_path, dump):
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    record(manifest, dump)
+    manifest.save()
+
+    assert ExportManifest(tmp_path / "manifest.json", STATIONS + ["radio_03"]).dlcs == {}
+
+def test_reversed_names_apply_to_every_dlc(tmp_path, dump):
+    reversed_names = tmp_path / "reversed_candidates.txt"
+    reversed_names.write_text("dj_radio_01_intro\n")
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS, reversed_names)
+    record(manifest, dump)
+    manifest.save()
+
+    assert ExportManifest(tmp_path / "manifest.json", STATIONS, reversed_names).dlcs != {}
+    assert ExportManifest(tmp_path / "manifest.json", STATIONS).dlcs == {}
+    touch(reversed_names, "dj_radio_01_outro\n")
+    assert ExportManifest(tmp_path / "manifest.json", STATIONS, reversed_names).dlcs == {}
+
+def test_external_sounds(tmp_path, dump):
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    record(manifest, dump, external_sounds={"intro": "base_music", "missing": None})
+
+    assert manifest.external_sounds_match("dlca", {"intro": "base_music"})
+    assert not manifest.external_sounds_match("dlca", {"intro": "other_music"})
+    assert not manifest.external_sounds_match("dlca", {"intro": "base_music", "missing": "news"})
+
+def test_affected_ids_cover_previous_and_new_exports(tmp_path, dump):
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    record(manifest, dump)
+    manifest.save()
+
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    record(manifest, dump, export_info={"Stations": {"radio_02": {}}, "TrackLists": {"adverts": {}}})
+
+    assert manifest.changed == ["dlca"]
+    assert manifest.affected == {"Stations": {"radio_01", "radio_02"}, "TrackLists": {"music", "adverts"}}
+    assert manifest.contains_any("dlca", {"Stations": {"radio_02"}, "TrackLists": set()})
+    assert not manifest.contains_any("dlca", {"Stations": {"radio_01"}, "TrackLists": {"music"}})
+    assert manifest.contains_any("never_exported", {"Stations": set(), "TrackLists": set()})
+
+def test_merge_order(tmp_path, dump):
+    data_path, out_file, awc_index = dump
+    manifest = ExportManifest(tmp_path / "manifest.json", STATIONS)
+    manifest.record("dlca", {}, out_file, awc_index, set(), {}, {}, {"Stations": {"radio_01": {}, "radio_02": {}}, "TrackLists": {}})
+    manifest.record("dlcb", {}, out_file, awc_index, set(), {}, {}, {"Stations": {"radio_03": {}, "radio_01": {}}, "TrackLists": {}})
+
+    assert manifest.merge_order(["dlca", "dlcb"], "Stations") == ["radio_01", "radio_02", "radio_03"]
+    assert manifest.merge_order(["dlca", "dlcc"], "Stations") == None
@@ -0,0 +1,31 @@
+from hash_utils import CompiledNametable, HashMap, joaat
+
+def compiled(tmp_path, name: str, names: list[str]) -> CompiledNametable:
+    source_path = tmp_path / f"{name}.txt"
+    source_path.write_text("\n".join(names))
+    assert CompiledNametable.compile(names, tmp_path / f"{name}.ntc", source_path)
+    return CompiledNametable(tmp_path / f"{name}.ntc")
+
+def test_later_layers_take_priority(tmp_path, capsys):
+    hash_map = HashMap().load_hashmap({joaat("song"): "bottom", joaat("intro"): "intro"})
+    hash_map.load_table(compiled(tmp_path, "a", ["song", "outro"]))
+    hash_map.load_hashmap({joaat("outro"): "top"})
+
+    assert hash_map.resolve(joaat("song")) == "song"
+    assert hash_map.resolve(joaat("outro")) == "top"
+    assert hash_map.resolve(joaat("intro")) == "intro"
+    assert hash_map.resolve(joaat("missing")) == None
+
+    output = capsys.readouterr().out
+    assert "'song' shadows 'bottom'" in output and "'top' shadows 'outro'" in output
+
+    hash_map.resolve(joaat("song"))
+    assert capsys.readouterr().out == "" # reported once
+
+def test_recompiling_keeps_mapped_tables(tmp_path):
+    table = compiled(tmp_path, "a", ["song"])
+    hash_map = HashMap().load_table(table)
+
+    compiled(tmp_path, "a", ["other"])
+    assert hash_map.resolve(joaat("song")) == "song" # still the version it mapped
+    assert CompiledNametable(tmp_path / "a.ntc").get(joaat("other")) == "other"
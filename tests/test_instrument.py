@@ -0,0 +1,39 @@
+from threading import Thread
+
+import instrument
+
+def test_threads_keep_their_own_spans():
+    instrument.start()
+    def background():
+        with instrument.span("prefetch/dlca"):
+            instrument.count("Loads", 2)
+
+    with instrument.span("export"):
+        thread = Thread(target=background)
+        thread.start()
+        thread.join()
+        instrument.count("Loads")
+    report = instrument.stop()
+
+    spans = {span["Name"]: span for span in report["Spans"]["Children"]}
+    assert spans["export"]["Counters"] == {"Loads": 1}
+    assert "Children" not in spans["export"]
+    assert spans["prefetch/dlca"]["Counters"] == {"Loads": 2}
+    assert report["Counters"] == {"Loads": 3}
+
+def test_concurrent_counts():
+    instrument.start()
+    def work():
+        for _ in range(10000):
+            with instrument.span("work"):
+                instrument.count("Items")
+
+    threads = [Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = instrument.stop()
+
+    assert report["Counters"] == {"Items": 40000}
+    assert report["Spans"]["Children"][0]["Calls"] == 40000
@@ -0,0 +1,44 @@
+import pytest
+
+from marker_format import write_marker_export, read_marker_export
+
+def export_with_markers(*tracks: dict) -> dict:
+    return {"Stations": {"radio_01": {"TrackLists": ["music"]}}, "TrackLists": {"music": {"Category": "2", "Tracks": list(tracks)}}}
+
+def roundtrip(tmp_path, export: dict) -> dict:
+    file_path = tmp_path / "export.bin"
+    write_marker_export(file_path, export)
+    return read_marker_export(file_path)
+
+def test_roundtrip(tmp_path):
+    export = export_with_markers(
+        {"Id": "a", "Path": "x/a", "Duration": 1000, "Markers": {
+            "Track": [{"Offset": 0, "Title": "Song", "Artist": "Band"}, {"Offset": 5000, "Title": "Other", "Artist": None}],
+            "Beat": [{"Offset": 10, "Value": 4}, {"Offset": -3, "Value": 2 ** 40}],
+        }},
+        {"Id": "b", "TrackList": "other"},
+        {"Id": "c", "Markers": {"Beat": []}},
+    )
+    assert roundtrip(tmp_path, export) == export
+
+def test_only_empty_string(tmp_path):
+    export = export_with_markers({"Id": "a", "Markers": {"Track": [{"Offset": 0, "Title": ""}]}})
+    assert roundtrip(tmp_path, export) == export
+
+@pytest.mark.parametrize("title", ["a\x00b", "\x00", "", "é ♪ 日本"])
+def test_strings_are_kept_whole(tmp_path, title):
+    export = export_with_markers({"Id": "a", "Markers": {"Track": [{"Offset": 0, "Title": title}, {"Offset": 1, "Title": "after"}]}})
+    assert roundtrip(tmp_path, export) == export
+
+def test_mixed_fields_are_kept_in_header(tmp_path):
+    export = export_with_markers({"Id": "a", "Markers": {
+        "Track": [{"Offset": 0, "Title": "a"}, {"Offset": 1, "Title": "b", "Artist": "c"}],
+        "Beat": [{"Offset": 0, "Value": 1}, {"Offset": 1, "Value": "2"}],
+    }})
+    assert roundtrip(tmp_path, export) == export
+
+def test_not_a_marker_export(tmp_path):
+    file_path = tmp_path / "export.bin"
+    file_path.write_bytes(b"{}")
+    with pytest.raises(ValueError):
+        read_marker_export(file_path)
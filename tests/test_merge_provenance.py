@@ -0,0 +1,77 @@
+import copy
+
+from radio_export import merge_export_data, MergeProvenance
+
+BASE = {
+    "Stations": {"radio_01": {"RadioName": "RADIO_01", "Genre": "rock", "TrackLists": ["music", "adverts"], "Speech": {"Intro": {"Variations": 2}}}},
+    "TrackLists": {"music": {"Category": "2", "Tracks": []}, "adverts": {"Category": "0", "Tracks": []}},
+}
+DLC = {
+    "Stations": {
+        "radio_01": {"RadioName": "RADIO_01", "Genre": "pop", "TrackLists": ["adverts", "music_dlc"], "Speech": {"Intro": {"Variations": 3}, "Outro": {"Variations": 1}}},
+        "radio_02": {"RadioName": "RADIO_02", "TrackLists": ["music_dlc"]},
+    },
+    "TrackLists": {"music": {"Category": "2", "Tracks": [{"Id": "new"}]}, "music_dlc": {"Category": "2", "Tracks": []}},
+}
+
+def test_later_station_fields_override():
+    merged, provenance = merge_export_data([("base", BASE), ("dlchei4", DLC)])
+    station = merged["Stations"]["radio_01"]
+
+    assert station["Genre"] == "pop"
+    assert provenance.source_of("Stations", "radio_01", "Genre") == "dlchei4"
+    assert provenance.source_of("Stations", "radio_01", "RadioName") == "base" # same value, not an override
+
+def test_station_track_lists_are_an_ordered_union():
+    merged, provenance = merge_export_data([("base", BASE), ("dlchei4", DLC)])
+
+    assert merged["Stations"]["radio_01"]["TrackLists"] == ["music", "adverts", "music_dlc"]
+    assert provenance.source_of("Stations", "radio_01", "TrackLists", "adverts") == "base"
+    assert provenance.source_of("Stations", "radio_01", "TrackLists", "music_dlc") == "dlchei4"
+
+def test_speech_categories_are_merged():
+    merged, provenance = merge_export_data([("base", BASE), ("dlchei4", DLC)])
+
+    assert merged["Stations"]["radio_01"]["Speech"] == {"Intro": {"Variations": 3}, "Outro": {"Variations": 1}}
+    assert provenance.source_of("Stations", "radio_01", "Speech", "Intro") == "dlchei4"
+    assert provenance.source_of("Stations", "radio_01", "Speech", "Outro") == "dlchei4"
+
+def test_first_track_list_is_kept():
+    merged, provenance = merge_export_data([("base", BASE), ("dlchei4", DLC)])
+
+    assert merged["TrackLists"]["music"]["Tracks"] == []
+    assert merged["TrackLists"]["music"]["DlcPath"] == "%PLATFORM%/audio/sfx"
+    assert merged["TrackLists"]["music_dlc"]["DlcPath"] == "update/%PLATFORM%/dlcpacks/mpheist4"
+    assert provenance.source_of("TrackLists", "music") == "base"
+
+def test_conflicts_in_merge_order():
+    _, provenance = merge_export_data([("base", BASE), ("dlchei4", DLC)])
+
+    assert provenance.conflicts() == [
+        (["Stations", "radio_01", "Genre"], "dlchei4_info.json"),
+        (["Stations", "radio_01", "Speech", "Intro"], "dlchei4_info.json"),
+        (["TrackLists", "music"], "dlchei4_info.json"),
+    ]
+
+def test_override_order():
+    provenance = MergeProvenance()
+    first, second, third = (provenance.add_source(dlc) for dlc in ("base", "dlca", "dlcb"))
+    provenance.set(("Stations", "radio_01", "Genre"), first)
+    provenance.override(("Stations", "radio_01", "Genre"), third)
+    provenance.override(("Stations", "radio_01", "Genre"), second, replaced=False)
+
+    assert provenance.source_of("Stations", "radio_01", "Genre") == "dlcb"
+    assert [source for _, source in provenance.conflicts()] == ["dlca_info.json", "dlcb_info.json"]
+
+def test_affected_ids_only():
+    merged, provenance = merge_export_data([("base", BASE), ("dlchei4", DLC)], {"Stations": {"radio_02"}, "TrackLists": {"music_dlc"}})
+
+    assert list(merged["Stations"]) == ["radio_02"]
+    assert list(merged["TrackLists"]) == ["music_dlc"]
+    assert provenance.conflicts() == []
+
+def test_exports_are_not_modified():
+    base, dlc = copy.deepcopy(BASE), copy.deepcopy(DLC)
+    merge_export_data([("base", base), ("dlchei4", dlc)])
+
+    assert base == BASE and dlc == DLC
@@ -0,0 +1,68 @@
+import json
+from http.client import HTTPConnection
+from threading import Thread
+
+import pytest
+
+from radio_server import RadioServer, RadioService, accepts_gzip
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("GZIP;q=0.5", True),
+    ("x-gzip", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, deflate", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("*, gzip;q=0", False),
+    ("gzip;q=0, *", False),
+    ("deflate, *;q=0.1", True),
+    ("deflate", False),
+    ("gzipped", False),
+    ("br;q=1, gzip;q=nope", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) == expected
+
+@pytest.fixture
+def server(tmp_path):
+    export_path = tmp_path / "export.json"
+    track_lists = [f"radio_01_music_{index}" for index in range(64)] # long enough to be gzipped
+    export_path.write_text(json.dumps({"Stations": {"radio_01": {"RadioName": "RADIO_01", "TrackLists": track_lists}}, "TrackLists": {}}))
+    server = RadioServer(RadioService(export_path, poll_interval=0), port=0)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield HTTPConnection("127.0.0.1", server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+def get(connection, headers, method="GET", path="/stations/radio_01"):
+    connection.request(method, path, headers=headers)
+    response = connection.getresponse()
+    response.body = response.read()
+    return response
+
+def test_gzip_refused(server):
+    assert get(server, {"Accept-Encoding": "gzip"}).getheader("Content-Encoding") == "gzip"
+    response = get(server, {"Accept-Encoding": "gzip;q=0"})
+    assert response.status == 200 and response.getheader("Content-Encoding") == None
+
+def test_not_modified_varies(server):
+    etag = get(server, {}).getheader("ETag")
+    response = get(server, {"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert response.status == 304
+    assert response.getheader("Vary") == "Accept-Encoding"
+    assert response.getheader("ETag") == etag
+
+@pytest.mark.parametrize("path, status", [("/stations/radio_01", 200), ("/stations/missing", 404)])
+def test_head_sends_the_get_headers(server, path, status):
+    response = get(server, {"Accept-Encoding": "gzip"}, path=path)
+    head = get(server, {"Accept-Encoding": "gzip"}, "HEAD", path)
+    assert head.status == response.status == status
+    assert head.body == b""
+    for header in ("Content-Type", "Content-Length", "Content-Encoding", "ETag", "Vary"):
+        assert head.getheader(header) == response.getheader(header)
+
+    get(server, {}) # the connection is still usable after a response without a body
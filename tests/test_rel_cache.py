@@ -0,0 +1,29 @@
+import pytest
+
+from cache_utils import source_cache_path, write_cache
+from radio_export import REL_RECORD_VERSION, load_rel_items
+
+REL_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Dat151>
+ <Items>
+  <Item type="RadioStationTrackList" ntOffset="0">
+   <Name>radio_01_music</Name>
+   <Category value="2" />
+   <Tracks>
+    <Item><SoundRef>song</SoundRef></Item>
+   </Tracks>
+  </Item>
+ </Items>
+</Dat151>
+"""
+TYPES = ["RadioStationTrackList"]
+
+@pytest.mark.parametrize("payload", [b"", b"\x80\x05", b"\x80\x05\x8c\x08missing.\x94\x8c\x04name\x94\x93\x94.", b"not a pickle"])
+def test_corrupt_cache_is_rebuilt(tmp_path, payload):
+    rel_path = tmp_path / "dlca_game.dat151.rel.xml"
+    rel_path.write_text(REL_XML)
+    records = load_rel_items(rel_path, TYPES, cache_dir=tmp_path)
+
+    write_cache(source_cache_path(tmp_path, rel_path, ".relcache", str(REL_RECORD_VERSION), *TYPES), rel_path, payload)
+    assert load_rel_items(rel_path, TYPES, cache_dir=tmp_path) == records
+    assert load_rel_items(rel_path, TYPES, cache_dir=tmp_path) == records # from the rewritten cache
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from radio_database import RadioDatabase
+from sharded_export import ShardedExport, write_sharded_export
+from utils import script_dir
+
+MARKER_TYPES = ("Track", "Beat", "DJ", "Rockout")
+
+def station_markers(database: RadioDatabase, station_id: str) -> dict:
+    return {(track_list_id, track["Id"], marker_type): list(database.markers(track_list_id, track["Id"], marker_type).markers)
+            for track_list_id, track in database.station_tracks(station_id) for marker_type in MARKER_TYPES}
+
+EXPORT = {
+    "Stations": {
+        "radio_01": {"TrackLists": ["radio_01_music"]},
+        "radio_02": {"TrackLists": ["radio_02_music"]},
+    },
+    "TrackLists": {
+        "radio_01_music": {"Tracks": [{"Id": "song", "TrackList": "radio_02_music"}, {"Id": "loop", "TrackList": "radio_03_music"}]},
+        "radio_02_music": {"Tracks": [{"Id": "song", "TrackList": "radio_03_music"}]}, # a reference to a reference
+        "radio_03_music": {"Tracks": [{"Id": "song", "Path": "song", "Markers": {"Beat": [{"Offset": 0, "Value": 1}]}}, {"Id": "loop", "TrackList": "radio_01_music"}]},
+    },
+}
+
+def test_references_are_in_the_manifest(tmp_path):
+    write_sharded_export(tmp_path, EXPORT)
+    shards = ShardedExport(tmp_path)
+
+    assert shards.track_lists["radio_01_music"]["TrackLists"] == ["radio_02_music", "radio_03_music"]
+    assert shards.track_lists["radio_03_music"]["TrackLists"] == ["radio_01_music"]
+    assert list(shards.station_bundle("radio_01")["TrackLists"]) == ["radio_01_music", "radio_02_music", "radio_03_music"]
+
+def test_bundle_resolves_referenced_tracks(tmp_path):
+    write_sharded_export(tmp_path, EXPORT)
+    bundle = RadioDatabase(data=ShardedExport(tmp_path, verify=True).station_bundle("radio_02"))
+    assert bundle.markers("radio_02_music", "song", "Beat").at(10) == {"Offset": 0, "Value": 1}
+
+@pytest.mark.skipif(not (script_dir / "info_merged.json").is_file(), reason="needs info_merged.json")
+def test_bundles_resolve_like_the_full_merge(tmp_path):
+    with open(script_dir / "info_merged.json", "r", encoding="utf-8") as f:
+        export = json.load(f)
+    write_sharded_export(tmp_path, export)
+    shards = ShardedExport(tmp_path)
+    full = RadioDatabase(data=export)
+
+    for station_id in export["Stations"]:
+        bundle = RadioDatabase(data=shards.station_bundle(station_id))
+        assert station_markers(bundle, station_id) == station_markers(full, station_id), station_id
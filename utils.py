@@ -5,6 +5,7 @@ from time import perf_counter
 script_dir = Path(__file__).resolve().parent
 data_dir = script_dir / "raw"
 out_dir = script_dir / "processed"
+cache_dir = script_dir / ".cache"
 
 def delta_time_ms(start: float):
     return round((perf_counter() - start)*1000, 3)
@@ -1,37 +1,137 @@
+from __future__ import annotations
 import math
-import struct
-from lxml.etree import _Element
+import sys
+from array import array
+from itertools import accumulate
+from pathlib import Path
 from time import perf_counter
+from typing import TYPE_CHECKING
 
-from hash_utils import joaat, format_hash, get_trackid_table, HashMap
+import instrument
+import rel_schema
+from hash_utils import joaat, joaat_many, format_hash, parse_hash_string, HashMap, hash_string_prefix
+from resources import get_trackid_table
+from utils import delta_time_ms
+
+if TYPE_CHECKING:
+    from lxml.etree import _Element
+    from rel_schema import RelItem
 
 class TypeIndex:
-    def __init__(self, xml_root: _Element, valid_types: list[str], nametable: HashMap = None):
+    """Indexes the `rel_schema.RelItem` records of `valid_types` by name.
+    Every item is registered under its resolved name and its `"hash_FFFFFFFF"` alias, so most lookups are a single dict probe"""
+    def __init__(self, items: list[RelItem], valid_types: list[str], nametable: HashMap = None):
         if len(valid_types) == 0:
             raise ValueError("valid_types cannot be empty")
 
         start_time = perf_counter()
-        self.index = {t: {} for t in valid_types}
+        self.items = items
+        self.index: dict[str, dict[str, RelItem]] = {t: {} for t in valid_types}
+        aliases: dict[str, dict[str, RelItem]] = {t: {} for t in valid_types}
+
+        self.items_seen = 0
+        self.items_kept = 0
+        self.alias_collisions = 0
+
+        alias_items: list[tuple[str, RelItem]] = []
+        unhashed_items: list[tuple[str, RelItem]] = []
+
+        use_nametable = nametable and not nametable.is_empty
+        for item in items:
+            self.items_seen += 1
+
+            type_name, name, _ = item
+            type_index = self.index.get(type_name)
+            if type_index is None or not name:
+                continue
+
+            elem_id = name
+            if use_nametable:
+                elem_id = nametable.resolve_string(elem_id)
+            type_index[elem_id] = item
+            self.items_kept += 1
+
+            if parse_hash_string(name) != None:
+                if name != elem_id:
+                    alias_items.append((name, item))
+            else:
+                unhashed_items.append((elem_id, item))
+
+        # hash all plain names at once
+        hashes = joaat_many([elem_id for elem_id, _ in unhashed_items])
+        alias_items.extend((format_hash(hash), item) for hash, (_, item) in zip(hashes, unhashed_items))
 
-        for type_name in valid_types:
-            for item in xml_root.xpath(f".//Item[@type='{type_name}']"):
-                name_elem = item.find("Name")
-                elem_id = name_elem.text
-                if name_elem is not None and elem_id:
-                    if nametable and not nametable.is_empty:
-                        elem_id = nametable.resolve_string(elem_id)
-                    self.index[type_name][elem_id] = item
+        for alias, item in alias_items:
+            type_aliases = aliases[item[0]]
+            if alias in type_aliases and type_aliases[alias] is not item:
+                self.alias_collisions += 1
+            type_aliases[alias] = item
 
-        print(f"Building xml index took {round((perf_counter() - start_time) * 1000, 3)}ms")
+        # names take priority over aliases
+        for type_name, type_aliases in aliases.items():
+            type_index = self.index[type_name]
+            for alias, item in type_aliases.items():
+                existing = type_index.setdefault(alias, item)
+                if existing is not item:
+                    self.alias_collisions += 1
 
-    def get(self, type_name: str, name: str, try_hash: bool = False) -> _Element | None:
+        self.build_time_ms = delta_time_ms(start_time)
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the records, measured on a sample of them"""
+        sample = self.items[::max(1, len(self.items) // 256)]
+        per_item = sum(map(_deep_size, sample)) / len(sample) if sample else 0
+        return int(per_item * len(self.items)) + sum(map(sys.getsizeof, self.index.values())) + sys.getsizeof(self.items)
+
+    @property
+    def stats(self):
+        return {
+            "ItemsSeen": self.items_seen,
+            "ItemsKept": self.items_kept,
+            "AliasCollisions": self.alias_collisions,
+            "BuildTimeMs": self.build_time_ms
+        }
+
+    def get(self, type_name: str, name: str, try_hash: bool = False) -> RelItem | None:
         items = self.index.get(type_name, {})
-        if name in items:
-            return items[name]
-        if try_hash:
+        item = items.get(name)
+        if item is None and try_hash: # only needed when the item name itself was never resolved
+            instrument.count("TypeIndexHashFallbacks")
             return items.get(format_hash(joaat(name)))
-        return None
+        return item
     
+def _deep_size(obj: object) -> int:
+    """Size of an object and the tuples, lists, dicts and strings it holds"""
+    size = sys.getsizeof(obj)
+    if type(obj) in (tuple, list):
+        size += sum(map(_deep_size, obj))
+    elif type(obj) is dict:
+        size += sum(map(_deep_size, obj.keys())) + sum(map(_deep_size, obj.values()))
+    return size
+
+def stream_rel_items(file_path: Path | str, valid_types: list[str]) -> _Element:
+    """Streams a `.rel.xml` file and returns an `Items` element holding only the items whose type is in `valid_types`.
+    Every other item is discarded as soon as it has been parsed, so memory scales with the kept subset instead of the whole file"""
+    from lxml import etree
+
+    valid_types = set(valid_types)
+    items = etree.Element("Items")
+
+    for _, elem in etree.iterparse(str(file_path), events=("end",), tag="Item"):
+        parent = elem.getparent()
+        if parent is None:
+            continue
+
+        if parent.tag == "Items":
+            if elem.get("type") in valid_types:
+                items.append(elem) # moves the element out of the parsed tree
+            else:
+                parent.remove(elem)
+        elif parent.tag == "ContainerPaths":
+            parent.remove(elem)
+
+    return items
+
 def to_dict(elem: _Element, depth_limit = 0, depth = 0):
     text = None
     if isinstance(elem.text, str) and (not elem.text.isspace()):
@@ -65,44 +165,28 @@ def to_dict(elem: _Element, depth_limit = 0, depth = 0):
             
     return d
 
-def resolve_marker_trackid(marker: dict[str, any], text_id: str):
+def resolve_marker_trackid(marker: dict[str, any], text_id: str, trackid_table: HashMap):
     marker["Id"] = int(text_id)
-    marker["Title"] = get_trackid_table().resolve(joaat(text_id + "S"))
-    marker["Artist"] = get_trackid_table().resolve(joaat(text_id + "A"))
+    marker["Title"] = trackid_table.resolve(joaat(text_id + "S"))
+    marker["Artist"] = trackid_table.resolve(joaat(text_id + "A"))
 
-def marker_dict_awc(markers_container: _Element, stream_info: dict):
-    markers_dict = to_dict(markers_container)
-    if not (type(markers_dict) is list):
-        markers_dict = [markers_dict]
+awc_marker_types = {"trackid": "Track", "beat": "Beat", "rockout": "Rockout", "dj": "DJ"}
+AwcMarker = tuple[str, float, str] # marker type, sample offset, value
 
+def awc_marker_dict(markers: list[AwcMarker], sample_rate: float | None, trackid_table: HashMap = None):
+    """Converts typed AWC marker tuples into the exported `{marker type: [marker, ...]}` shape.
+    Track markers are named from `trackid_table` (the session's `trackid.gxt2` if None)"""
+    if trackid_table == None:
+        trackid_table = get_trackid_table()
     result: dict[str, list[str]] = {}
-    sample_rate = float(stream_info.get("SampleRate") or 48000)
-    for marker in markers_dict:
-        if "Name" not in marker: # some awc xml files have missing values? (hei4_mlr_mm_p3)
-            continue
-
-        if "Value" not in marker: # some awc xml files have missing values? (flylo_part2)
-            continue
-
-        match marker["Name"]:
-            case "trackid":
-                marker_type = "Track"
-            case "beat":
-                marker_type = "Beat"
-            case "rockout":
-                marker_type = "Rockout"
-            case "dj":
-                marker_type = "DJ"
-            case _:
-                continue
-
+    sample_rate = float(sample_rate or 48000)
+    for marker_type, sample_offset, value in markers:
         new_marker = {}
-        new_marker["Offset"] = math.floor((float(marker["SampleOffset"]) * 1000) / sample_rate)
+        new_marker["Offset"] = math.floor((sample_offset * 1000) / sample_rate)
 
         if marker_type == "Track":
-            resolve_marker_trackid(new_marker, marker["Value"])
+            resolve_marker_trackid(new_marker, value, trackid_table)
         else:
-            value = marker["Value"]
             if value.isdigit():
                 value = int(value)
             new_marker["Value"] = value
@@ -113,21 +197,92 @@ def marker_dict_awc(markers_container: _Element, stream_info: dict):
         result[marker_type].append(new_marker)
 
     return result
-    
-def marker_dict_xml(markers_container: _Element, isTrackType = False):
+
+def marker_dict_awc(markers_container: _Element, stream_info: dict, trackid_table: HashMap = None):
     markers_dict = to_dict(markers_container)
     if not (type(markers_dict) is list):
         markers_dict = [markers_dict]
 
+    markers: list[AwcMarker] = []
+    for marker in markers_dict:
+        if "Name" not in marker: # some awc xml files have missing values? (hei4_mlr_mm_p3)
+            continue
+
+        if "Value" not in marker: # some awc xml files have missing values? (flylo_part2)
+            continue
+
+        marker_type = awc_marker_types.get(marker["Name"])
+        if marker_type == None:
+            continue
+
+        markers.append((marker_type, float(marker["SampleOffset"]), marker["Value"]))
+
+    return awc_marker_dict(markers, stream_info.get("SampleRate"), trackid_table)
+
+def _value_text(elem: _Element) -> str | None:
+    """Value of a `<Tag value="..." />` or `<Tag>...</Tag>` element"""
+    value = elem.get("value")
+    if value == None and elem.text:
+        value = elem.text.strip()
+    return value or None
+
+def stream_awc_markers(file_path: Path | str) -> tuple[list[AwcMarker] | None, str | None]:
+    """Streams an `.awc.xml` file and returns the typed markers of the first `Markers` chunk and the sample rate of the first `StreamFormat`.
+
+    Multi-stream containers (`_left`/`_right`, or a header stream followed by a mono stream) repeat the markers for every stream,
+    only the first chunk is used. Reading stops as soon as both have been found. Markers are None if the file has no marker chunk"""
+    from lxml import etree
+
+    markers: list[AwcMarker] | None = None
+    sample_rate = None
+    stream_format_done = False
+
+    for _, elem in etree.iterparse(str(file_path), events=("end",), tag=("Markers", "StreamFormat")):
+        if elem.tag == "Markers":
+            if markers != None:
+                continue
+
+            markers = []
+            for item in elem: # children are walked directly, find() is much slower than the parsing itself
+                name = value = sample_offset = None
+                for child in item:
+                    match child.tag:
+                        case "Name":
+                            name = child.text
+                        case "Value":
+                            value = _value_text(child)
+                        case "SampleOffset":
+                            sample_offset = _value_text(child)
+
+                marker_type = awc_marker_types.get(name.strip() if name else None)
+                if marker_type == None or value == None: # some awc xml files have missing values? (hei4_mlr_mm_p3, flylo_part2)
+                    continue
+                markers.append((marker_type, float(sample_offset), value))
+        elif not stream_format_done:
+            for child in elem:
+                if child.tag == "SampleRate":
+                    sample_rate = _value_text(child)
+                    break
+            stream_format_done = True
+
+        if markers != None and stream_format_done:
+            break
+
+    return markers, sample_rate
+
+def marker_dict_xml(events: list[tuple[str, str]], isTrackType = False, trackid_table: HashMap = None):
+    """Converts the (OffsetMs, TextId) events of a `RadioTrackTextIDs` (`rel_schema.text_id_events`) into exported markers.
+    Track markers are named from `trackid_table` (the session's `trackid.gxt2` if None)"""
+    if isTrackType and trackid_table == None:
+        trackid_table = get_trackid_table()
     result = []
     prev_marker = None
-    for marker in markers_dict:
+    for offset, TextId in events:
         new_marker = {}
-        new_marker["Offset"] = int(marker["OffsetMs"])
+        new_marker["Offset"] = int(offset)
 
-        TextId = marker["TextId"]
         if isTrackType:
-            resolve_marker_trackid(new_marker, TextId)
+            resolve_marker_trackid(new_marker, TextId, trackid_table)
         else:
             new_marker["Value"] = int(TextId)
 
@@ -139,19 +294,92 @@ def marker_dict_xml(markers_container: _Element, isTrackType = False):
 
     return result
 
+class SpeechTable:
+    """Every `ByteArray` (speech context) of a speech.dat4 decoded at once into arrays, keyed by the uint32 hash of its name.
+    The `Container` of each context is resolved while building, so lookups are integer operations"""
+    def __init__(self, speech_index: TypeIndex):
+        start_time = perf_counter()
+        byte_arrays = speech_index.index.get("ByteArray", {})
+        items = list({id(item): item for item in byte_arrays.values()}.values())
+        rows = {id(item): row for row, item in enumerate(items)}
+
+        # the RawData of every item is decoded in a single call, `offsets` mark where each one starts
+        raw_data = [rel_schema.byte_array_data(item) or "" for item in items]
+        self.data = data = bytes.fromhex("".join(raw_data))
+        self.offsets = array("I", [0])
+        self.offsets.extend(accumulate(len(text) // 2 for text in raw_data))
+
+        bounds = list(zip(self.offsets, self.offsets[1:]))
+        self.variations = array("B", [data[start] if end > start else 0 for start, end in bounds])
+        self.container_indexes = array("i", [data[start + 1] | data[start + 2] << 8 if end - start >= 3 else -1 for start, end in bounds]) # -1 if the context has none
+
+        # each container is looked up once, `container_path_ids` index into `container_paths` (-1 if the container is missing)
+        self.container_paths: list[str | None] = []
+        path_ids = {-1: -1}
+        for container_index in sorted(set(self.container_indexes) - {-1}):
+            container = speech_index.get("Container", str(container_index), True)
+            path_ids[container_index] = -1 if container == None else len(self.container_paths)
+            if container != None:
+                self.container_paths.append(rel_schema.container_hash(container))
+        self.container_path_ids = array("i", map(path_ids.__getitem__, self.container_indexes))
+
+        # every item is also indexed under its `"hash_FFFFFFFF"` alias, which is the hash of its name
+        prefix_length = len(hash_string_prefix)
+        self.rows: dict[int, int] = {int(name[prefix_length:], 16): rows[id(item)] for name, item in byte_arrays.items() if name.startswith(hash_string_prefix)}
+
+        self.build_time_ms = delta_time_ms(start_time)
+
+    def __len__(self):
+        return len(self.variations)
+
+    def row(self, name: str) -> int | None:
+        """Row of a context by name or `"hash_FFFFFFFF"` string, found like `TypeIndex.get("ByteArray", name, True)` would"""
+        hash = parse_hash_string(name)
+        return self.rows.get(joaat(name) if hash == None else hash)
+
+    def context(self, name: str) -> SpeechContext | None:
+        row = self.row(name)
+        return None if row == None else SpeechContext(self, row)
+
+    def variation_group(self, name: str) -> VariationGroup | None:
+        row = self.row(name)
+        return None if row == None else VariationGroup(self, row)
+
 class SpeechContext:
-    container_index = None
+    """View of a `SpeechTable` row as a speech context: its variation count and container"""
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: SpeechTable, row: int):
+        self.table = table
+        self.row = row
 
-    def __init__(self, el: _Element):
-        data = bytes.fromhex(el.find("RawData").text)
-        self.num_variations = struct.unpack("B", data[0:1])[0]
+    @property
+    def num_variations(self) -> int:
+        return self.table.variations[self.row]
 
-        if len(data) >= 3:
-            self.container_index = struct.unpack("<H", data[1:3])[0]
+    @property
+    def container_index(self) -> int | None:
+        container_index = self.table.container_indexes[self.row]
+        return None if container_index < 0 else container_index
+
+    @property
+    def container_path(self) -> str | None:
+        path_id = self.table.container_path_ids[self.row]
+        return None if path_id < 0 else self.table.container_paths[path_id]
 
 class VariationGroup:
-    def __init__(self, el: _Element):
-        data = bytes.fromhex(el.find("RawData").text)
-        self.num_variations = struct.unpack("B", data[0:1])[0]
-        self.variations = list(data[1 : 1 + self.num_variations])
-        print(self.variations)
\ No newline at end of file
+    """View of a `SpeechTable` row as a variation group: a count followed by that many variation bytes"""
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: SpeechTable, row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def num_variations(self) -> int:
+        return self.table.variations[self.row]
+
+    @property
+    def variations(self) -> list[int]:
+        start = self.table.offsets[self.row] + 1
+        return list(self.table.data[start:start + self.num_variations])
\ No newline at end of file